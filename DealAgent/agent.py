@@ -1,128 +1,71 @@
-import os
-import httpx
-from typing import Any, Dict
-
-try:
-    # Preferred in newer versions
-    from google.adk import Agent  # type: ignore
-except Exception:
-    # Fallback for older package layouts
-    from google.adk.agents import Agent  # type: ignore
-
-# Sales Agent FastAPI URL
-SALES_AGENT_URL = os.getenv("SALES_AGENT_API_URL", "http://127.0.0.1:8000")
-
-# Deal Server URL (Node.js Express server)
-DEAL_SERVER_URL = os.getenv("DEAL_SERVER_URL", "http://127.0.0.1:3000")
-
-
-def query_sales_agent(query: str) -> Dict[str, Any]:
-    """
-    Query the Sales Agent with a natural language question.
-    
-    This tool calls the Sales Agent's FastAPI /query endpoint to get answers
-    about customers, discounts, rebates, or any sales-related queries.
-    
-    Args:
-        query: Natural language query (e.g., "Show me customer info for CompanyABC" or "Get customer ID for CompanyABC")
-    
-    Returns:
-        Dictionary with response from the sales agent
-    """
-    try:
-        response = httpx.post(
-            f"{SALES_AGENT_URL}/query",
-            json={"query": query},
-            timeout=30.0
-        )
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        return {
-            "status": "error",
-            "response": f"HTTP {e.response.status_code}: {e.response.text}"
-        }
-    except httpx.RequestError as e:
-        return {
-            "status": "error",
-            "response": f"Request failed: {str(e)}"
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "response": f"Error: {str(e)}"
-        }
-
-
-def get_deal_by_customer_id(customer_id: int) -> Dict[str, Any]:
-    """
-    Get deal data by customer ID from the Deal Server.
-    
-    This tool calls the Deal Server's /api/getdeal/customer/:customer_id endpoint
-    to retrieve deal information (bid details, accounts, terms, etc.) for a given customer.
-    
-    Args:
-        customer_id: The customer ID (integer, e.g., 1, 2, 3)
-    
-    Returns:
-        Dictionary with deal data including bidHead, bidAcct, etc.
-    """
-    try:
-        response = httpx.get(
-            f"{DEAL_SERVER_URL}/api/getdeal/customer/{customer_id}",
-            timeout=10.0
-        )
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        return {
-            "status": "error",
-            "error": f"HTTP {e.response.status_code}: {e.response.text}",
-            "customer_id": customer_id
-        }
-    except httpx.RequestError as e:
-        return {
-            "status": "error",
-            "error": f"Request failed: {str(e)}",
-            "customer_id": customer_id
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "error": f"Error: {str(e)}",
-            "customer_id": customer_id
-        }
-
-
-# Define the Agent explicitly as requested
-agent = Agent(
-    model="gemini-2.0-flash",
-    name='Deal_agent',
-    description="A simple deal agent with data and 1 database tool",
-    instruction=
-"""Your role:
-- Identify the correct customer ID by company name using the customer server url from the sales agent.
+import threading
+from contextvars import ContextVar
+
+from common import telemetry, usage
+from DealAgent import sessions
+
+# Async tools backed by the shared pooled HTTP client
+from DealAgent.tools import (
+    SALES_AGENT_URL,
+    DEAL_SERVER_URL,
+    query_sales_agent,
+    get_deal_by_customer_id,
+    get_deals_by_customer_ids,
+    query_deal_portfolio,
+)
+from DealAgent.customer_resolver import resolve_customer
+
+
+INSTRUCTION = """Your role:
+- Identify the correct customer ID by company name using the local customer resolver (falling back to the sales agent).
 - Use the matched customer’s ID to fetch the corresponding deal data (JSON).
 - Return concise, accurate answers with supporting fields from the data. If something is missing or ambiguous, ask a brief clarifying question.
 - Be helpful and friendly in your responses
 
 Tools you can use:
-1) Sales Agent Query Tool
+1) Customer Resolver
+   - resolve_customer(company_name)
+     Purpose: Resolve a company name to a customer ID directly from the customer database (fast, no LLM call).
+     Required input: company_name (full or partial name, e.g., "CompanyABC", "techcorp")
+     Output: status ("success", "ambiguous", "not_found"), customer_id when resolved, and ranked candidates (customer_id, company_name, match, score)
+
+2) Sales Agent Query Tool
    - query_sales_agent(query)
      Purpose: Query the Sales Agent FastAPI to get customer information, IDs, discounts, rebates, or any sales-related data.
      Required input: query (natural language string, e.g., "Get customer ID for CompanyABC" or "Show me customer info for CompanyABC")
      Output: Response from sales agent with customer data or answers
 
-2) Deal Data (JSON source)
-   - get_deal_by_customer_id(customer_id)
+3) Deal Data (JSON source)
+   - get_deal_by_customer_id(customer_id, fields)
      Purpose: Fetch the deal JSON from Deal Server corresponding to the provided customer ID.
      Required input: customer_id (integer, e.g., 1, 2, 3)
-     Output: Deal JSON with bidHead (bidNum, bidName, owner, dates, status, etc.) and bidAcct (account details, payment terms, etc.)
+     Optional input: fields — only return these fields, relative to bidStart, e.g. "bidHead.bidNum,bidHead.dealStatus,bidAcct[*].payTerm",
+       or a preset: "summary" (key header fields + account numbers), "accounts" (all account fields). Omit for the full deal.
+     Output: Deal JSON with bidHead (bidNum, bidName, owner, dates, status, etc.) and bidAcct (account details, payment terms, etc.); null fields are left out
+   - get_deals_by_customer_ids(customer_ids, fields)
+     Purpose: Fetch the deals for several customers at once (fetched concurrently).
+     Required input: customer_ids (list of integers, e.g., [1, 2, 3])
+     Optional input: fields (same as above, applied to every deal)
+     Output: "deals" mapping customer_id -> deal JSON, and "errors" mapping customer_id -> error message
+
+4) Deal Portfolio Analytics
+   - query_deal_portfolio(table, filters, group_by, metrics, columns, sort, limit)
+     Purpose: Answer questions across all deals (totals, counts, rankings, lists) in one query, without fetching deals one by one.
+     Tables: "deals" (one row per deal: customer_id, bidNum, bidName, owner, reg, dealStatus, estAnnGrs, dates, accountCount, ...)
+       and "accounts" (one row per account: acet, payTerm, payTermCode, ... plus the deal's fields).
+     filters: e.g. "dealStatus=P; reg=16; payTerm>20" (= != > >= < <=, ~ for contains, | for alternatives)
+     group_by: e.g. "owner"; metrics: e.g. "count,sum:estAnnGrs" (count, sum, avg, min, max, nunique)
+     columns: fields to list when not aggregating; sort: e.g. "-sum_estAnnGrs"
+     Output: rows, matched (rows passing the filters), row_count, truncated
 
 Decision & reasoning policy:
-- Always first resolve the customer via query_sales_agent("Get customer ID for [company_name]").
-- If multiple customers match, present a short disambiguation list (id + company_name) and ask the user to choose.
+- Always first resolve the customer via resolve_customer(company_name).
+- Only fall back to query_sales_agent("Get customer ID for [company_name]") if resolve_customer returns an error.
+- If resolve_customer returns "ambiguous" (or multiple customers match), present a short disambiguation list (id + company_name) and ask the user to choose.
 - Once a single customer is identified, call get_deal_by_customer_id with that customer’s id.
+- Request only the fields the question needs: use fields="summary" for overviews, "accounts" for account/payment-term questions, or explicit paths for specific fields.
+- When the question involves several customers (e.g. comparing deals), resolve all of them first, then call get_deals_by_customer_ids once with all ids instead of calling get_deal_by_customer_id repeatedly.
+- For questions about many or all deals (e.g. "total estAnnGrs of pending deals by owner", "accounts with payTerm > 20 in region 16"), call query_deal_portfolio once instead of fetching deals per customer. If it reports an unknown field, retry with one from the listed fields.
 - Never fabricate IDs or deal details; only use tool outputs.
 - If the user already supplies a customer_id, skip name lookup and go straight to fetching the deal.
 
@@ -134,14 +77,99 @@ Output format:
 Examples:
 User: "Find CompanyABC's deal."
 Assistant:
-1) Call query_sales_agent("Get customer ID for CompanyABC")
-2) Extract customer ID from the response
+1) Call resolve_customer("CompanyABC")
+2) Take customer_id from the response
 3) If multiple matches, ask user to pick an id; else:
 4) Call get_deal_by_customer_id(<resolved_id>)
 5) Return a concise summary + the key deal fields .
-""",
-    tools=[query_sales_agent, get_deal_by_customer_id]
+"""
+
+# Model call in progress for the current agent run (set and read by the model callbacks)
+_llm_span: ContextVar = ContextVar("deal_agent_llm_span", default=None)
+
+def before_model(callback_context, llm_request):
+    """Start an llm span for each model call; in a conversation, bound the history and add what is already known."""
+    state = callback_context.state
+    if state.get(sessions.CONVERSATION_KEY):
+        llm_request.contents = sessions.trim_history(llm_request.contents)
+        note = sessions.context_note(state)
+        if note:
+            llm_request.append_instructions([note])
+    _llm_span.set(telemetry.start_span("llm", llm_request.model or "unknown", agent=callback_context.agent_name))
+    return None
+
+def after_model(callback_context, llm_response):
+    """End the llm span and count its tokens once the complete (non-partial) response has arrived."""
+    if llm_response.partial:
+        return None
+    span = _llm_span.get()
+    if span is not None:
+        span.end(llm_response.error_code or None)
+        _llm_span.set(None)
+    metadata = llm_response.usage_metadata
+    usage.record_llm(
+        metadata.prompt_token_count if metadata else None,
+        metadata.candidates_token_count if metadata else None,
+    )
+    return None
+
+def before_tool(tool, args, tool_context):
+    """In a conversation, answer a repeated tool call from what the session already has."""
+    if tool_context.state.get(sessions.CONVERSATION_KEY):
+        return sessions.recall(tool_context.state, tool.name, args)
+    return None
+
+def after_tool(tool, args, tool_context, tool_response):
+    """Count the size of each tool result passed back to the model and remember it in a conversation."""
+    usage.record_tool(tool.name, tool_response)
+    if tool_context.state.get(sessions.CONVERSATION_KEY):
+        sessions.remember(tool_context.state, tool.name, args, tool_response)
+    return None
+
+TOOLS = (
+    resolve_customer, query_sales_agent, get_deal_by_customer_id, get_deals_by_customer_ids,
+    query_deal_portfolio,
 )
 
-# Expose a separate root_agent that points to the Agent instance
-root_agent = agent
+def build_agent():
+    """Construct the DealAgent (google-adk is imported here, on first use)."""
+    try:
+        # Preferred in newer versions
+        from google.adk import Agent  # type: ignore
+    except Exception:
+        # Fallback for older package layouts
+        from google.adk.agents import Agent  # type: ignore
+
+    return Agent(
+        model="gemini-2.0-flash",
+        name='Deal_agent',
+        description=(
+            "Resolves customers by company name and answers questions from their deal data, "
+            "using " + ", ".join(tool.__name__ for tool in TOOLS)
+        ),
+        instruction=INSTRUCTION,
+        tools=[telemetry.traced("tool")(tool) for tool in TOOLS],
+        before_model_callback=before_model,
+        after_model_callback=after_model,
+        before_tool_callback=before_tool,
+        after_tool_callback=after_tool,
+    )
+
+_agent = None
+_agent_lock = threading.Lock()
+
+def get_agent():
+    """Return the process-wide agent, building it on first call."""
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = build_agent()
+    return _agent
+
+def __getattr__(name):
+    # `agent` and `root_agent` (the name ADK tooling looks up) are built on
+    # first access, so importing this module does not load google-adk
+    if name in ("agent", "root_agent"):
+        return get_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -2,14 +2,20 @@
 FastAPI Server for DealAgent
 Exposes DealAgent as HTTP API for UI integration
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 import uvicorn
 import logging
+import asyncio
+import threading
+import json
 import sys
 import os
+import uuid
 from pathlib import Path
 
 # Add the parent directory to Python path
@@ -17,20 +23,75 @@ current_dir = Path(__file__).parent
 project_root = current_dir.parent
 sys.path.append(str(project_root))
 
-# Import the DealAgent
-from DealAgent.agent import agent
+from DealAgent.http_client import close_http_client
+from DealAgent.deal_cache import deal_cache
+from DealAgent.tools import deal_server_backend, sales_agent_backend
+from DealAgent.customer_resolver import CUSTOMER_DB_PATH, get_customer_index
+from DealAgent.sessions import CONVERSATION_KEY, InMemorySessionStore
+from common.query_cache import BYPASS, QueryCache
+from common.admission import AdmissionController, AdmissionRejected
+from common.batch import BATCH_MAX_ITEMS, ndjson, run_batch
+from common import data_watch, telemetry, usage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Runner that drives the agent; each query gets its own short-lived session
+# unless it continues a conversation (session_id).
+# google-adk is imported when the runner is first built, not at module import.
+APP_NAME = "DealAgent"
+USER_ID = "api"
+_runner = None
+_runner_lock = threading.Lock()
+init_error = None
+
+def get_runner():
+    """Build the agent and its runner on first call."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                from DealAgent.agent import get_agent
+                from google.adk.runners import InMemoryRunner
+                _runner = InMemoryRunner(agent=get_agent(), app_name=APP_NAME)
+    return _runner
+
+async def ensure_runner():
+    """Return the runner, building it off the event loop if needed."""
+    if _runner is not None:
+        return _runner
+    try:
+        return await asyncio.to_thread(get_runner)
+    except Exception as e:
+        logger.error(f"Failed to initialize agent: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="Agent is not properly initialized. Please check server logs."
+        )
+
+async def warm_up():
+    """Build the agent in the background so the first query does not wait for it."""
+    global init_error
+    try:
+        await asyncio.to_thread(get_runner)
+        logger.info("DealAgent initialized")
+    except Exception as e:
+        init_error = str(e)
+        logger.error(f"Failed to initialize agent: {init_error}")
+
 # Lifespan context manager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("DealAgent FastAPI application starting")
+    warm_task = asyncio.create_task(warm_up())
+    watch_data_sources()
     yield
+    data_watch.watcher.stop()
+    warm_task.cancel()
     # Shutdown
+    await close_http_client()
     logger.info("DealAgent FastAPI application shutting down")
 
 app = FastAPI(lifespan=lifespan)
@@ -43,8 +104,164 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request/LLM/tool/HTTP spans, GET /metrics and GET /traces/{trace_id}
+telemetry.install(app)
+# GET /data/sources: watched data files and their reloads
+data_watch.install(app)
+
 class QueryRequest(BaseModel):
     query: str
+    # Continue the conversation with this id (created on first use); omit for a one-off query
+    session_id: Optional[str] = Field(default=None, min_length=1, max_length=128, pattern=r"^[A-Za-z0-9_.:-]+$")
+    # Return token and tool-output accounting for this request
+    include_usage: bool = False
+
+class BatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    # Queries run in parallel (capped at BATCH_MAX_CONCURRENCY)
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    include_usage: bool = False
+
+# Opt-in response cache (QUERY_CACHE_ENABLED); dropped when the data behind the answers is reloaded
+SALES_DATA_DIR = project_root / "sales_agent" / "data"
+DEAL_DATA_DIR = current_dir / "data"
+query_cache = QueryCache(invalidate_on=["customers", "sales_data", "deals"])
+
+def watch_data_sources():
+    """
+    Rebuild the customer index in the background when customer.sqlite changes.
+
+    The sales data and deal files are read by other services; a change to
+    them only drops the answers derived from them here, and marks cached
+    deals for revalidation with the deal server.
+    """
+    data_watch.watcher.watch("customers", [CUSTOMER_DB_PATH], get_customer_index)
+    data_watch.watcher.watch("sales_data", [SALES_DATA_DIR])
+    data_watch.watcher.watch("deals", [DEAL_DATA_DIR])
+    data_watch.watcher.start()
+
+data_watch.bus.subscribe(["deals"], lambda topic: deal_cache.expire_all())
+
+# Bounds concurrent agent runs (ADMISSION_* / REQUEST_DEADLINE); cache hits skip it
+admission = AdmissionController()
+
+# Conversations (SESSION_TTL / SESSION_MAX_SESSIONS); history and state live in the runner's session service
+sessions = InMemorySessionStore()
+
+async def delete_adk_session(session_id: str) -> None:
+    runner = await ensure_runner()
+    await runner.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session_id)
+
+async def open_conversation(runner: Any, session_id: str) -> Any:
+    """Return the conversation's ADK session, creating it on the first turn."""
+    for evicted in sessions.drain_evicted():
+        await delete_adk_session(evicted)
+    conversation, created = sessions.open(session_id)
+    session = None
+    if not created:
+        session = await runner.session_service.get_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id
+        )
+    if session is None:
+        session = await runner.session_service.create_session(
+            app_name=APP_NAME, user_id=USER_ID, session_id=session_id, state={CONVERSATION_KEY: True}
+        )
+    return conversation, session
+
+async def iter_agent_events(
+    query: str, streaming: bool = False, session_id: Optional[str] = None
+) -> AsyncIterator[Any]:
+    """
+    Run the agent on a query and yield its events as they are produced.
+
+    Args:
+        query: The user query
+        streaming: Ask the model for partial (streamed) text events
+        session_id: Continue this conversation (its history and known
+            customers and deals) instead of starting a fresh session
+    """
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    from google.genai import types
+
+    runner = await ensure_runner()
+    message = types.Content(role="user", parts=[types.Part(text=query)])
+    run_config = RunConfig(
+        streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE
+    )
+    if session_id is None:
+        session = await runner.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+        try:
+            async for event in runner.run_async(
+                user_id=USER_ID,
+                session_id=session.id,
+                new_message=message,
+                run_config=run_config,
+            ):
+                yield event
+        finally:
+            await runner.session_service.delete_session(
+                app_name=APP_NAME, user_id=USER_ID, session_id=session.id
+            )
+        return
+
+    conversation, session = await open_conversation(runner, session_id)
+    # One turn at a time per conversation, so turns see each other's history
+    async with conversation.lock:
+        conversation.turns += 1
+        async for event in runner.run_async(
+            user_id=USER_ID,
+            session_id=session.id,
+            new_message=message,
+            run_config=run_config,
+        ):
+            yield event
+
+def extract_text(event: Any) -> str:
+    """Return the text parts of an agent event joined together."""
+    content = getattr(event, "content", None)
+    parts = getattr(content, "parts", None) or []
+    return "".join(part.text for part in parts if getattr(part, "text", None))
+
+def describe_event(event: Any) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Translate an agent event into (event name, data) pairs for streaming.
+
+    Event names: tool_call, tool_result, text (partial model output) and
+    final (the final answer).
+    """
+    for call in event.get_function_calls():
+        yield "tool_call", {"id": call.id, "name": call.name, "args": call.args or {}}
+    for result in event.get_function_responses():
+        response = result.response or {}
+        status = response.get("status", "success") if isinstance(response, dict) else "success"
+        yield "tool_result", {"id": result.id, "name": result.name, "status": status}
+    text = extract_text(event)
+    if not text:
+        return
+    if event.partial:
+        yield "text", {"text": text}
+    elif event.is_final_response():
+        yield "final", {"response": text}
+
+async def run_query(query: str, session_id: Optional[str] = None) -> str:
+    """Run the agent to completion and return its final text."""
+    # Keep the last non-empty text produced by the agent
+    response_text = ""
+    async for event in iter_agent_events(query, session_id=session_id):
+        text = extract_text(event)
+        if text:
+            response_text = text
+    return response_text
+
+def format_sse(event_name: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event_name}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def error_status(error_msg: str) -> Tuple[int, str]:
+    """Map an agent error message to an HTTP status code and client-facing detail."""
+    if "503" in error_msg or "overloaded" in error_msg.lower():
+        return 503, "The AI service is currently overloaded. Please try again later."
+    return 500, f"Error processing your request: {error_msg}"
 
 @app.get("/")
 async def root():
@@ -52,18 +269,28 @@ async def root():
         "message": "DealAgent API is running. Use /query endpoint to interact with the agent.",
         "endpoints": {
             "POST /query": "Send a query to the DealAgent",
+            "POST /query/stream": "Send a query and receive agent events as Server-Sent Events",
+            "POST /query/batch": "Send many queries; results stream back as NDJSON in completion order",
+            "POST /sessions": "Start a conversation; pass the returned session_id with follow-up queries",
+            "DELETE /sessions/{session_id}": "End a conversation",
+            "GET /sessions/stats": "Active, expired and evicted conversations",
+            "GET /cache/stats": "Deal cache and query cache counters",
+            "GET /admission/stats": "Concurrency limit, queue depth and wait times",
+            "GET /backends/stats": "Sales Agent and Deal Server replicas: load, circuit state, retries and hedges",
+            "GET /usage/stats": "Token and tool-result size totals per endpoint and tool",
+            "GET /data/sources": "Watched data files and their hot reloads",
+            "GET /metrics": "Prometheus metrics (latency histograms, errors, payload sizes)",
+            "GET /traces/{trace_id}": "Recent spans of a trace (see the X-Trace-Id response header)",
+            "GET /health/live": "Liveness probe",
+            "GET /health/ready": "Readiness probe (agent initialized)",
             "GET /docs": "Interactive API documentation"
         }
     }
 
 @app.post("/query")
-async def handle_query(request: QueryRequest):
+async def handle_query(request: QueryRequest, response: Response):
     """Handle queries to the DealAgent."""
-    if agent is None:
-        raise HTTPException(
-            status_code=500,
-            detail="Agent is not properly initialized. Please check server logs."
-        )
+    await ensure_runner()
     
     try:
         if not request.query.strip():
@@ -74,56 +301,172 @@ async def handle_query(request: QueryRequest):
             
         logger.info(f"Processing query: {request.query}")
         
-        # Use agent's _iter method which accepts query string directly
-        # This is the simplest approach that should work
-        response_text = ""
-        async for event in agent._iter(request.query):
-            # Collect response from different event types
-            try:
-                # Check for various response attributes
-                if hasattr(event, 'response') and event.response:
-                    if isinstance(event.response, str):
-                        response_text = event.response
-                    else:
-                        response_text = str(event.response)
-                elif hasattr(event, 'text') and event.text:
-                    response_text = str(event.text)
-                elif hasattr(event, 'content') and event.content:
-                    response_text = str(event.content)
-                elif hasattr(event, 'message'):
-                    msg = event.message
-                    if hasattr(msg, 'content'):
-                        response_text = str(msg.content)
-                    else:
-                        response_text = str(msg)
-                # Keep the last non-empty response
-            except Exception as e:
-                logger.debug(f"Error processing event: {e}")
-                continue
+        with usage.track("/query") as request_usage:
+            if request.session_id:
+                # Answers depend on the conversation so far; never served from the query cache
+                response_text = await admission.run(lambda: run_query(request.query, request.session_id))
+                cache_status = BYPASS
+            else:
+                response_text, cache_status = await query_cache.get_or_compute(
+                    request.query, lambda: admission.run(lambda: run_query(request.query))
+                )
+        response.headers["X-Cache"] = cache_status
         
         # Use the final response or default message
         if not response_text:
             response_text = "No response generated"
             
         logger.info("Query processed successfully")
-        return {"response": response_text}
+        result = {"response": response_text}
+        if request.session_id:
+            result["session_id"] = request.session_id
+        if request.include_usage:
+            result["usage"] = request_usage.as_dict()
+        return result
         
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        logger.warning(f"Query rejected: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error processing query: {error_msg}")
         
-        status_code = 500
-        detail = f"Error processing your request: {error_msg}"
-        
-        if "503" in error_msg or "overloaded" in error_msg.lower():
-            status_code = 503
-            detail = "The AI service is currently overloaded. Please try again later."
+        status_code, detail = error_status(error_msg)
             
         raise HTTPException(
             status_code=status_code,
             detail=detail
         )
 
+@app.post("/query/stream")
+async def handle_query_stream(request: QueryRequest):
+    """Stream agent events for a query as Server-Sent Events (plus session and usage events when requested)."""
+    await ensure_runner()
+    if not request.query.strip():
+        raise HTTPException(
+            status_code=400,
+            detail="Query cannot be empty"
+        )
+
+    logger.info(f"Streaming query: {request.query}")
+
+    async def event_stream() -> AsyncIterator[str]:
+        # The slot is taken inside the stream, so it is released even if the client leaves before the body starts
+        try:
+            release = await admission.acquire()
+        except AdmissionRejected as e:
+            logger.warning(f"Streaming query not admitted: {e.detail}")
+            yield format_sse("error", {"status_code": e.status_code, "detail": e.detail, "retry_after": e.retry_after})
+            return
+        try:
+            if request.session_id:
+                yield format_sse("session", {"session_id": request.session_id})
+            with usage.track("/query/stream") as request_usage:
+                async for event in iter_agent_events(request.query, streaming=True, session_id=request.session_id):
+                    for event_name, data in describe_event(event):
+                        yield format_sse(event_name, data)
+            if request.include_usage:
+                yield format_sse("usage", request_usage.as_dict())
+            logger.info("Streaming query processed successfully")
+        except Exception as e:
+            error_msg = str(e)
+            logger.error(f"Error streaming query: {error_msg}")
+            status_code, detail = error_status(error_msg)
+            yield format_sse("error", {"status_code": status_code, "detail": detail})
+        finally:
+            release()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def batch_error(e: Exception) -> Tuple[int, str]:
+    """Map an exception from one batch query to a status code and detail."""
+    if isinstance(e, AdmissionRejected):
+        return e.status_code, e.detail
+    logger.error(f"Error processing batch query: {str(e)}")
+    return error_status(str(e))
+
+@app.post("/query/batch")
+async def handle_query_batch(request: BatchRequest):
+    """Run many queries with bounded parallelism and stream one NDJSON line per query as it completes."""
+    await ensure_runner()
+    logger.info(f"Processing batch of {len(request.queries)} queries")
+
+    async def answer(query: str) -> Dict[str, Any]:
+        with usage.track("/query/batch") as request_usage:
+            response_text, cache_status = await query_cache.get_or_compute(
+                query, lambda: admission.run(lambda: run_query(query))
+            )
+        result = {"response": response_text or "No response generated", "cache": cache_status}
+        if request.include_usage:
+            result["usage"] = request_usage.as_dict()
+        return result
+
+    return StreamingResponse(
+        ndjson(run_batch(request.queries, answer, batch_error, request.concurrency)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness: the process is serving requests and initialization has not failed."""
+    if init_error:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": init_error})
+    return {"status": "alive", "pid": os.getpid()}
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness: the agent and runner are built."""
+    if _runner is None:
+        return JSONResponse(status_code=503, content={"status": "starting", "pid": os.getpid()})
+    return {"status": "ready", "pid": os.getpid()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Expose deal cache counters for tuning."""
+    return {"deal_cache": deal_cache.stats(), "query_cache": query_cache.stats()}
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Expose admission control counters and queue wait times."""
+    return admission.stats()
+
+@app.get("/backends/stats")
+async def backend_stats():
+    """Expose replica load, circuit breaker state, retries and hedges per tool backend."""
+    return {"sales_agent": sales_agent_backend.stats(), "deal_server": deal_server_backend.stats()}
+
+@app.post("/sessions")
+async def create_session():
+    """Start a conversation and return its id."""
+    session_id = uuid.uuid4().hex
+    sessions.open(session_id)
+    return {"session_id": session_id, "ttl_seconds": sessions.ttl}
+
+@app.delete("/sessions/{session_id}")
+async def end_session(session_id: str):
+    """End a conversation and drop its history."""
+    if not sessions.close(session_id):
+        raise HTTPException(status_code=404, detail="Session not found (it may have expired)")
+    await delete_adk_session(session_id)
+    return {"session_id": session_id, "status": "deleted"}
+
+@app.get("/sessions/stats")
+async def session_stats():
+    """Expose conversation counts and limits."""
+    return sessions.stats()
+
+@app.get("/usage/stats")
+async def usage_stats():
+    """Expose token and tool-result size totals per endpoint and tool."""
+    return usage.aggregate.stats()
+
 if __name__ == "__main__":
     # Start the FastAPI server
     uvicorn.run(
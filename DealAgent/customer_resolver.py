@@ -0,0 +1,293 @@
+"""
+Deterministic company name -> customer_id resolver
+
+Builds an in-memory index over the customer table in customer.sqlite so the
+agent can resolve company names without a Sales Agent (LLM) round trip.
+Matching is tried in order: exact, prefix, substring, then trigram fuzzy
+matching. Only an exact match or a single prefix match resolves a name; a
+substring or fuzzy match may be a different company, so those are returned
+as candidates to choose from.
+"""
+import bisect
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from common.data_watch import path_signature
+
+# customer.sqlite built by sales_agent/database/setup_db.py
+CUSTOMER_DB_PATH = os.getenv(
+    "CUSTOMER_DB_PATH",
+    str(Path(__file__).parent.parent / "sales_agent" / "database" / "customer.sqlite"),
+)
+
+# Minimum Dice similarity for a fuzzy candidate to be returned
+FUZZY_THRESHOLD = 0.35
+
+# Trailing tokens that do not help tell companies apart
+_LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "ltd", "limited", "corp", "corporation",
+    "co", "plc", "gmbh", "ag", "ab", "sa", "bv", "nv", "pty",
+}
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a company name for matching.
+
+    Lower-cases, strips accents and punctuation, and drops trailing legal
+    suffixes (Inc, LLC, Corp, ...). Spaces are removed so "Company ABC" and
+    "CompanyABC" normalize to the same key.
+    """
+    text = unicodedata.normalize("NFKD", name or "")
+    text = text.encode("ascii", "ignore").decode("ascii").lower().replace("&", " and ")
+    tokens = _NON_ALNUM.sub(" ", text).split()
+    while len(tokens) > 1 and tokens[-1] in _LEGAL_SUFFIXES:
+        tokens.pop()
+    return "".join(tokens)
+
+
+def trigrams(key: str) -> set:
+    """Return the set of padded character trigrams of a normalized key."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CustomerIndex:
+    """
+    In-memory name index over (customer_id, company_name) rows.
+
+    Rows are stored in parallel lists; the exact index maps a normalized key
+    to row numbers, the prefix index is a sorted list of keys, and the
+    trigram index maps each trigram to a compact array of row numbers.
+    """
+
+    def __init__(self, rows: List[Tuple[int, str]]):
+        self.ids: List[int] = []
+        self.names: List[str] = []
+        self.keys: List[str] = []
+        self.exact: Dict[str, List[int]] = {}
+        self.gram_counts = array("H")
+        self.trigram_postings: Dict[str, array] = {}
+
+        for customer_id, company_name in rows:
+            if company_name is None:
+                continue
+            row = len(self.ids)
+            key = normalize_name(str(company_name))
+            self.ids.append(int(customer_id))
+            self.names.append(str(company_name))
+            self.keys.append(key)
+            self.exact.setdefault(key, []).append(row)
+            grams = trigrams(key)
+            self.gram_counts.append(min(len(grams), 65535))
+            for gram in grams:
+                postings = self.trigram_postings.get(gram)
+                if postings is None:
+                    postings = self.trigram_postings[gram] = array("i")
+                postings.append(row)
+
+        self.sorted_keys: List[Tuple[str, int]] = sorted(
+            (key, row) for row, key in enumerate(self.keys)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _candidate(self, row: int, match: str, score: float) -> Dict[str, Any]:
+        return {
+            "customer_id": self.ids[row],
+            "company_name": self.names[row],
+            "match": match,
+            "score": round(score, 3),
+        }
+
+    def _prefix_rows(self, key: str, limit: int) -> List[int]:
+        start = bisect.bisect_left(self.sorted_keys, (key, -1))
+        rows = []
+        for candidate_key, row in self.sorted_keys[start:]:
+            if not candidate_key.startswith(key):
+                break
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def _substring_rows(self, key: str, limit: int) -> List[int]:
+        # Every row containing the key has all of its trigrams, so the rarest one bounds the scan
+        if len(key) < 3:
+            return []
+        postings = [self.trigram_postings.get(key[i:i + 3]) for i in range(len(key) - 2)]
+        if any(p is None for p in postings):
+            return []
+        rows = []
+        for row in min(postings, key=len):
+            if key in self.keys[row]:
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def _fuzzy_rows(self, key: str, limit: int) -> List[Tuple[int, float]]:
+        query_grams = trigrams(key)
+        shared = Counter()
+        for gram in query_grams:
+            postings = self.trigram_postings.get(gram)
+            if postings is not None:
+                shared.update(postings)
+        if not shared:
+            return []
+
+        # Rows sharing the most trigrams are scored with the Dice coefficient;
+        # scoring only the top of the count list keeps large indexes fast.
+        scored = []
+        for row, count in shared.most_common(limit * 20):
+            score = 2.0 * count / (len(query_grams) + self.gram_counts[row])
+            if score >= FUZZY_THRESHOLD:
+                scored.append((row, score))
+        scored.sort(key=lambda item: (-item[1], self.ids[item[0]]))
+        return scored[:limit]
+
+    def search(self, company_name: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Find ranked candidates for a company name.
+
+        Args:
+            company_name: Full or partial company name
+            limit: Maximum number of candidates to return
+
+        Returns:
+            Candidates ordered by score (exact 1.0, prefix 0.8-1.0, substring
+            0.6-0.8, fuzzy < 0.8)
+        """
+        key = normalize_name(company_name)
+        if not key:
+            return []
+
+        results: List[Dict[str, Any]] = []
+        seen = set()
+
+        for row in self.exact.get(key, []):
+            results.append(self._candidate(row, "exact", 1.0))
+            seen.add(row)
+
+        if len(results) < limit:
+            for row in self._prefix_rows(key, limit * 4):
+                if row not in seen:
+                    score = 0.8 + 0.2 * len(key) / len(self.keys[row])
+                    results.append(self._candidate(row, "prefix", score))
+                    seen.add(row)
+
+        if len(results) < limit:
+            for row in self._substring_rows(key, limit * 4):
+                if row not in seen:
+                    score = 0.6 + 0.2 * len(key) / len(self.keys[row])
+                    results.append(self._candidate(row, "substring", score))
+                    seen.add(row)
+
+        if len(results) < limit:
+            for row, score in self._fuzzy_rows(key, limit * 2):
+                if row not in seen:
+                    results.append(self._candidate(row, "fuzzy", 0.8 * score))
+                    seen.add(row)
+
+        results.sort(key=lambda c: (-c["score"], c["customer_id"]))
+        return results[:limit]
+
+    def resolve(self, company_name: str) -> Optional[Dict[str, Any]]:
+        """
+        The customer a name certainly refers to, or None.
+
+        That is its only exact match, or its only prefix match when none is
+        exact. The matches are counted over the whole index, not over the
+        candidates search() returns, so a small limit cannot hide a second one.
+        """
+        key = normalize_name(company_name)
+        if not key:
+            return None
+        exact = self.exact.get(key, [])
+        if exact:
+            return self._candidate(exact[0], "exact", 1.0) if len(exact) == 1 else None
+        prefix = self._prefix_rows(key, 2)
+        if len(prefix) != 1:
+            return None
+        row = prefix[0]
+        return self._candidate(row, "prefix", 0.8 + 0.2 * len(key) / len(self.keys[row]))
+
+
+def _load_rows(db_path: str) -> List[Tuple[int, str]]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute("SELECT Customer_ID, Company_Name FROM customer").fetchall()
+    finally:
+        conn.close()
+
+
+_index: Optional[CustomerIndex] = None
+_index_signature: Optional[Tuple] = None
+_index_lock = threading.Lock()
+
+
+def get_customer_index(db_path: str = CUSTOMER_DB_PATH) -> CustomerIndex:
+    """
+    Return the shared customer index, rebuilding it if customer.sqlite changed.
+
+    The new index is built before it replaces the old one, so lookups keep
+    using the old index meanwhile (the data watcher calls this on a change,
+    off the request path).
+    """
+    global _index, _index_signature
+    signature = path_signature(db_path)
+    if _index is not None and _index_signature == signature:
+        return _index
+    with _index_lock:
+        if _index is None or _index_signature != signature:
+            _index = CustomerIndex(_load_rows(db_path))
+            _index_signature = signature
+    return _index
+
+
+def resolve_customer(company_name: str, limit: int = 5) -> Dict[str, Any]:
+    """
+    Resolve a company name to a customer ID without calling the Sales Agent.
+
+    Args:
+        company_name: Full or partial company name (e.g., "CompanyABC", "techcorp")
+        limit: Maximum number of candidates to return for disambiguation
+
+    Returns:
+        Dictionary with the resolved customer_id (or None when ambiguous or
+        not found) and the ranked candidates
+    """
+    try:
+        index = get_customer_index()
+        candidates = index.search(company_name, limit=limit)
+        resolved = index.resolve(company_name)
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Customer lookup failed: {str(e)}",
+            "company_name": company_name
+        }
+
+    if not candidates:
+        return {
+            "status": "not_found",
+            "customer_id": None,
+            "company_name": company_name,
+            "candidates": []
+        }
+
+    return {
+        "status": "success" if resolved else "ambiguous",
+        "customer_id": resolved["customer_id"] if resolved else None,
+        "company_name": resolved["company_name"] if resolved else company_name,
+        "candidates": candidates
+    }
@@ -0,0 +1,335 @@
+"""
+Portfolio analytics over all stored deals
+
+Every deal in the deal store is flattened into two pandas tables:
+- deals:    one row per deal, with customer_id and the scalar bidHead fields
+            (bidNum, owner, reg, dealStatus, estAnnGrs, ...) plus accountCount
+- accounts: one row per bidAcct entry, with the fields of its deal's row
+            repeated (so accounts can be filtered by region, owner, ...)
+
+Queries filter, group and aggregate these tables with vectorized pandas
+operations, so a portfolio-wide question ("total estAnnGrs of pending deals
+by owner") is one query instead of a deal fetch per customer:
+
+    filters:  "dealStatus=P; reg=16|17; payTerm>20; bidName~crea"
+              (= != > >= < <=, | for any of several values, ~ for contains)
+    group_by: "owner,reg"
+    metrics:  "count,sum:estAnnGrs,avg:payTerm,nunique:acet"
+    columns:  fields returned per row when there is nothing to aggregate
+    sort:     a column or metric name ("sum_estAnnGrs"), "-" for descending
+
+Values stored as text (payTerm "30", reg "16") compare and aggregate as
+numbers when the query uses numbers. The tables are rebuilt when the store
+changes (checked at most every DEAL_ANALYTICS_CHECK_INTERVAL seconds). With
+DEAL_ANALYTICS_PARQUET_DIR set (and pyarrow installed) they are also saved
+as Parquet and loaded from there on restart instead of re-parsing every
+document.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from DealAgent.deal_store import DealStore, StoredDeal, get_deal_store
+
+DEAL_ANALYTICS_PARQUET_DIR = os.getenv("DEAL_ANALYTICS_PARQUET_DIR", "")
+DEAL_ANALYTICS_CHECK_INTERVAL = float(os.getenv("DEAL_ANALYTICS_CHECK_INTERVAL", "5"))
+DEAL_ANALYTICS_MAX_ROWS = int(os.getenv("DEAL_ANALYTICS_MAX_ROWS", "200"))
+
+TABLES = ("deals", "accounts")
+AGGREGATES = {"count": "sum", "sum": "sum", "avg": "mean", "min": "min", "max": "max", "nunique": "nunique"}
+
+# Columns returned per row when a query neither groups nor aggregates
+DEFAULT_COLUMNS = {
+    "deals": ["customer_id", "bidNum", "bidName", "owner", "dealStatus", "estAnnGrs"],
+    "accounts": ["customer_id", "bidNum", "acet", "payTerm"],
+}
+
+_FILTER = re.compile(r"^(?P<field>[A-Za-z_]\w*)\s*(?P<op>==|!=|>=|<=|=|>|<|~)\s*(?P<value>.*)$")
+_FILTER_SEPARATOR = re.compile(r";|\s+and\s+", re.IGNORECASE)
+
+logger = logging.getLogger(__name__)
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _number(value: str) -> Optional[float]:
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def flatten(deals: Iterable[StoredDeal]) -> Tuple[Any, Any]:
+    """Build the deals and accounts tables from stored deal documents."""
+    import pandas as pd
+
+    deal_rows: List[Dict[str, Any]] = []
+    account_rows: List[Dict[str, Any]] = []
+    for stored in deals:
+        document = stored.json()
+        bid = document.get("bidStart", document) if isinstance(document, dict) else {}
+        head = bid.get("bidHead") or {}
+        accounts = [account for account in bid.get("bidAcct") or [] if isinstance(account, dict)]
+        row = {"deal_id": stored.deal_id, "customer_id": stored.customer_id}
+        row.update((key, value) for key, value in head.items() if not isinstance(value, (dict, list)))
+        for account in accounts:
+            account_rows.append({
+                **row,
+                **{key: value for key, value in account.items() if not isinstance(value, (dict, list))},
+            })
+        row["accountCount"] = len(accounts)
+        deal_rows.append(row)
+    return pd.DataFrame(deal_rows), pd.DataFrame(account_rows)
+
+
+class PortfolioTable:
+    """One flattened table plus lazily built numeric and text views of its columns."""
+
+    def __init__(self, name: str, frame):
+        self.name = name
+        self.frame = frame
+        self._numeric: Dict[str, Any] = {}
+        self._text: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def column(self, field: str):
+        if field not in self.frame.columns:
+            raise ValueError(
+                f"Unknown field {field!r} in table {self.name!r}; available: {', '.join(map(str, self.frame.columns))}"
+            )
+        return self.frame[field]
+
+    def numeric(self, field: str):
+        """The column as float64 (text that is not a number becomes NaN)."""
+        import pandas as pd
+
+        with self._lock:
+            if field not in self._numeric:
+                self._numeric[field] = pd.to_numeric(self.column(field), errors="coerce").astype("float64")
+            return self._numeric[field]
+
+    def text(self, field: str):
+        with self._lock:
+            if field not in self._text:
+                self._text[field] = self.column(field).astype("string")
+            return self._text[field]
+
+    def mask(self, condition: str):
+        """Boolean row mask for one filter condition."""
+        match = _FILTER.match(condition.strip())
+        if match is None:
+            raise ValueError(f"Invalid filter {condition!r}; expected e.g. 'dealStatus=P' or 'payTerm>20'")
+        field, op, value = match.group("field"), match.group("op"), match.group("value").strip()
+        if op in (">", ">=", "<", "<="):
+            number = _number(value)
+            if number is None:
+                raise ValueError(f"Filter {condition!r} needs a number")
+            column = self.numeric(field)
+            return {">": column > number, ">=": column >= number, "<": column < number, "<=": column <= number}[op]
+        text = self.text(field)
+        if op == "~":
+            return text.str.contains(value, case=False, regex=False).fillna(False).astype(bool)
+        values = [item.strip() for item in value.split("|")]
+        matched = text.isin(values).fillna(False).astype(bool)
+        numbers = [number for number in map(_number, values) if number is not None]
+        if numbers:
+            # "reg=16" also matches a stored "16" and a numeric 16.0
+            matched = matched | self.numeric(field).isin(numbers)
+        return ~matched if op == "!=" else matched
+
+    def query(
+        self,
+        filters: Optional[str] = None,
+        group_by: Optional[str] = None,
+        metrics: Optional[str] = None,
+        columns: Optional[str] = None,
+        sort: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        import pandas as pd
+
+        frame = self.frame
+        mask = pd.Series(True, index=frame.index)
+        for condition in _FILTER_SEPARATOR.split(filters or ""):
+            if condition.strip():
+                mask &= self.mask(condition)
+        matched = int(mask.sum())
+
+        keys = _split(group_by)
+        specs = _split(metrics) or (["count"] if keys else [])
+        if keys or specs:
+            for key in keys:
+                self.column(key)
+            result = self._aggregate(mask, keys, specs)
+        else:
+            selected = _split(columns) or [name for name in DEFAULT_COLUMNS[self.name] if name in frame.columns]
+            for name in selected:
+                self.column(name)
+            result = frame.loc[mask, selected]
+
+        if sort:
+            descending = sort.startswith("-")
+            name = sort.lstrip("-+")
+            if name not in result.columns:
+                raise ValueError(f"Cannot sort by {name!r}; result columns: {', '.join(map(str, result.columns))}")
+            result = result.sort_values(name, ascending=not descending, na_position="last", kind="stable")
+        elif keys and len(result.columns) > len(keys):
+            result = result.sort_values(result.columns[len(keys)], ascending=False, kind="stable")
+
+        limit = max(1, min(limit or 50, DEAL_ANALYTICS_MAX_ROWS))
+        return {
+            "table": self.name,
+            "matched": matched,
+            "row_count": len(result),
+            "truncated": len(result) > limit,
+            "rows": json.loads(result.head(limit).to_json(orient="records")),
+        }
+
+    def _aggregate(self, mask, keys: List[str], specs: List[str]):
+        import pandas as pd
+
+        work = pd.DataFrame({key: self.frame.loc[mask, key] for key in keys}, index=self.frame.index[mask])
+        aggregations = {}
+        for spec in specs:
+            function, _, field = spec.partition(":")
+            function = function.strip().lower()
+            if function not in AGGREGATES:
+                raise ValueError(f"Unknown metric {spec!r}; use count, sum:, avg:, min:, max: or nunique:<field>")
+            if function == "count":
+                name, values = "count", 1
+            elif not field:
+                raise ValueError(f"Metric {spec!r} needs a field, e.g. {function}:estAnnGrs")
+            else:
+                name = f"{function}_{field}"
+                values = self.column(field)[mask] if function == "nunique" else self.numeric(field)[mask]
+            work[name] = values
+            aggregations[name] = (name, AGGREGATES[function])
+
+        if keys:
+            return work.groupby(keys, dropna=False, sort=False).agg(**aggregations).reset_index()
+        return pd.DataFrame([{name: getattr(work[column], function)() for name, (column, function) in aggregations.items()}])
+
+
+class DealAnalytics:
+    """Flattened deal tables kept in line with the deal store."""
+
+    def __init__(
+        self,
+        store: Callable[[], DealStore] = get_deal_store,
+        parquet_dir: str = DEAL_ANALYTICS_PARQUET_DIR,
+        check_interval: float = DEAL_ANALYTICS_CHECK_INTERVAL,
+    ):
+        self._store = store
+        self.parquet_dir = Path(parquet_dir) if parquet_dir else None
+        self.check_interval = check_interval
+        self._tables: Dict[str, PortfolioTable] = {}
+        self._signature: Optional[List[int]] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.build_ms = 0.0
+        self.source = None
+
+    def tables(self) -> Dict[str, PortfolioTable]:
+        """Current tables, rebuilt first if the store changed since they were built."""
+        now = time.monotonic()
+        if self._tables and now - self._checked_at < self.check_interval:
+            return self._tables
+        with self._lock:
+            if self._tables and now - self._checked_at < self.check_interval:
+                return self._tables
+            signature = self._store().signature()
+            if signature != self._signature or not self._tables:
+                started = time.perf_counter()
+                frames = self._load_parquet(signature)
+                self.source = "parquet" if frames else "store"
+                if frames is None:
+                    frames = flatten(self._store().iter_deals())
+                    self._save_parquet(signature, frames)
+                self._tables = {name: PortfolioTable(name, frame) for name, frame in zip(TABLES, frames)}
+                self._signature = signature
+                self.builds += 1
+                self.build_ms = round((time.perf_counter() - started) * 1000, 1)
+                logger.info(f"Deal analytics tables built from {self.source} in {self.build_ms} ms: "
+                            f"{len(frames[0])} deals, {len(frames[1])} accounts")
+            self._checked_at = now
+            return self._tables
+
+    def refresh(self) -> Dict[str, PortfolioTable]:
+        """Check the store for changes now (e.g. right after an ingest) and rebuild if needed."""
+        self._checked_at = 0.0
+        return self.tables()
+
+    def query(self, table: str = "deals", **query: Any) -> Dict[str, Any]:
+        """Filter/group/aggregate one table (see the module docstring for the syntax)."""
+        if table not in TABLES:
+            raise ValueError(f"Unknown table {table!r}; use one of: {', '.join(TABLES)}")
+        started = time.perf_counter()
+        result = self.tables()[table].query(**query)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 3)
+        return result
+
+    def schema(self) -> Dict[str, Any]:
+        """Row counts and columns of each table."""
+        return {
+            "tables": {
+                name: {"rows": len(table.frame), "columns": [str(column) for column in table.frame.columns]}
+                for name, table in self.tables().items()
+            },
+            "builds": self.builds,
+            "build_ms": self.build_ms,
+            "source": self.source,
+        }
+
+    def _load_parquet(self, signature: List[int]):
+        if self.parquet_dir is None:
+            return None
+        try:
+            import pandas as pd
+
+            saved = json.loads((self.parquet_dir / "signature.json").read_text())
+            if saved != list(signature):
+                return None
+            return tuple(pd.read_parquet(self.parquet_dir / f"{name}.parquet") for name in TABLES)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring deal analytics Parquet files in {self.parquet_dir}: {e}")
+            return None
+
+    def _save_parquet(self, signature: List[int], frames) -> None:
+        if self.parquet_dir is None:
+            return
+        try:
+            self.parquet_dir.mkdir(parents=True, exist_ok=True)
+            for name, frame in zip(TABLES, frames):
+                # Mixed text/number columns are stored as text; queries coerce them again
+                frame = frame.astype({column: "string" for column in frame.columns if frame[column].dtype == object})
+                frame.to_parquet(self.parquet_dir / f"{name}.parquet", index=False)
+            (self.parquet_dir / "signature.json").write_text(json.dumps(list(signature)))
+        except ImportError as e:
+            logger.warning(f"Not saving deal analytics as Parquet (install pyarrow): {e}")
+            self.parquet_dir = None
+        except Exception as e:
+            logger.warning(f"Could not save deal analytics Parquet files to {self.parquet_dir}: {e}")
+
+
+_analytics: Optional[DealAnalytics] = None
+_analytics_lock = threading.Lock()
+
+
+def get_deal_analytics() -> DealAnalytics:
+    """Return the process-wide analytics engine."""
+    global _analytics
+    if _analytics is None:
+        with _analytics_lock:
+            if _analytics is None:
+                _analytics = DealAnalytics()
+    return _analytics
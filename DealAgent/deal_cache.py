@@ -0,0 +1,170 @@
+"""
+In-process TTL/LRU cache for deal payloads
+
+Entries are keyed by customer_id and bounded both by count and by total
+payload size in bytes. Expired entries are kept so they can be revalidated
+with a conditional request (ETag / Last-Modified, which the deal server
+derives from bidHead.lastModDte) instead of being downloaded again.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+DEAL_CACHE_TTL = float(os.getenv("DEAL_CACHE_TTL", "300"))
+DEAL_CACHE_MAX_ENTRIES = int(os.getenv("DEAL_CACHE_MAX_ENTRIES", "1024"))
+DEAL_CACHE_MAX_BYTES = int(os.getenv("DEAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+
+@dataclass
+class CacheEntry:
+    payload: Any
+    size: int
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional request headers for revalidating this entry."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class DealCache:
+    """
+    Bounded LRU cache with a per-entry TTL.
+
+    A TTL of 0 or less disables the cache.
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEAL_CACHE_TTL,
+        max_entries: int = DEAL_CACHE_MAX_ENTRIES,
+        max_bytes: int = DEAL_CACHE_MAX_BYTES,
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Any, CacheEntry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.revalidated = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def lookup(self, key: Any) -> Tuple[Optional[CacheEntry], bool]:
+        """
+        Look up an entry.
+
+        Returns:
+            (entry, fresh). entry is None on a miss; fresh is False when the
+            entry has expired and should be revalidated before use.
+        """
+        if not self.enabled:
+            return None, False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, False
+            self._entries.move_to_end(key)
+            if entry.expires_at > time.monotonic():
+                self.hits += 1
+                return entry, True
+            self.stale += 1
+            return entry, False
+
+    def put(
+        self,
+        key: Any,
+        payload: Any,
+        size: int,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Store a payload, evicting least recently used entries to stay within limits."""
+        if not self.enabled:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old.size
+            # Too large to keep: the previous version is gone too, so it is not served stale
+            if size > self.max_bytes:
+                return
+            self._entries[key] = CacheEntry(
+                payload=payload,
+                size=size,
+                expires_at=time.monotonic() + self.ttl,
+                etag=etag,
+                last_modified=last_modified,
+            )
+            self._bytes += size
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+
+    def refresh(self, key: Any) -> None:
+        """Extend the TTL of an entry the server confirmed as unchanged."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry.expires_at = time.monotonic() + self.ttl
+                self.revalidated += 1
+
+    def expire_all(self) -> None:
+        """Mark every entry as expired, so each is revalidated (a 304 when unchanged) on its next use."""
+        with self._lock:
+            now = time.monotonic()
+            for entry in self._entries.values():
+                entry.expires_at = min(entry.expires_at, now)
+
+    def invalidate(self, key: Any = None) -> None:
+        """Drop one entry, or every entry when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and current size, for tuning the limits."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.stale
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "revalidated": self.revalidated,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.revalidated) / lookups, 4) if lookups else 0.0,
+            }
+
+
+# Process-wide cache used by the deal tools
+deal_cache = DealCache()
@@ -0,0 +1,176 @@
+"""
+Deal API server backed by the indexed deal store
+
+Python replacement for server.js: serves the same routes on port 3000, plus
+lookups by bidNum, origBid and account number (acet). Deals are read from
+the SQLite store (DealAgent/deal_store.py), which is synced with the data
+directory on startup, and returned as the stored JSON text with ETag and
+Last-Modified validators so clients can revalidate with a 304. A ?fields=
+projection (paths or a preset, see DealAgent/projection.py) returns only the
+requested fields, without nulls, as compact JSON. /api/analytics/* runs
+portfolio-wide filter/group/aggregate queries over all deals
+(DealAgent/deal_analytics.py).
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from starlette.exceptions import HTTPException as StarletteHTTPException
+from pydantic import BaseModel
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import asyncio
+import hashlib
+import uvicorn
+import logging
+import sys
+import os
+from pathlib import Path
+
+# Add the parent directory to Python path
+current_dir = Path(__file__).parent
+project_root = current_dir.parent
+sys.path.append(str(project_root))
+
+from DealAgent.deal_store import DEAL_DATA_DIR, StoredDeal, get_deal_store
+from DealAgent.deal_analytics import get_deal_analytics
+from DealAgent.projection import compact_json, parse_fields, project_deal
+from common import data_watch, telemetry
+
+DEAL_SERVER_PORT = int(os.getenv("DEAL_SERVER_PORT", "3000"))
+
+# Legacy /api/getdeal/<n> routes from server.js
+LEGACY_DEALS = {"1000": 1, "2000": 2, "3000": 3}
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup: only new or changed files are parsed
+    stats = get_deal_store().ingest_directory(DEAL_DATA_DIR)
+    logger.info(f"Deal store synced with {DEAL_DATA_DIR}: {stats}")
+    # Build the analytics tables in the background so the first analytics query is fast
+    warm_task = asyncio.create_task(asyncio.to_thread(get_deal_analytics().tables))
+    # Re-ingest changed deal files while serving; the analytics tables follow
+    data_watch.watcher.watch("deals", [DEAL_DATA_DIR], lambda: get_deal_store().ingest_directory(DEAL_DATA_DIR))
+    data_watch.watcher.start()
+    yield
+    data_watch.watcher.stop()
+    warm_task.cancel()
+
+app = FastAPI(lifespan=lifespan)
+telemetry.install(app)
+data_watch.install(app)
+data_watch.bus.subscribe(["deals"], lambda topic: get_deal_analytics().refresh())
+
+@app.exception_handler(StarletteHTTPException)
+async def http_error(request: Request, exc: StarletteHTTPException):
+    error = "Route not found" if exc.status_code == 404 else exc.detail
+    return JSONResponse(status_code=exc.status_code, content={"error": error})
+
+def not_modified(request: Request, deal: StoredDeal, etag: str) -> bool:
+    """Evaluate If-None-Match / If-Modified-Since against a stored deal."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    last_modified = deal.last_modified_http
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def deal_response(request: Request, deal: Optional[StoredDeal], error: str) -> Response:
+    """
+    Serve a stored deal, a 304 when the client copy is current, or a 404.
+
+    Without ?fields= the stored JSON text is returned as-is.
+    """
+    fields = request.query_params.get("fields")
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if deal is None:
+        return JSONResponse(status_code=404, content={"error": error})
+
+    etag = deal.etag
+    if fields is not None:
+        # Each projection is a different representation of the deal
+        digest = hashlib.sha1(fields.encode("utf-8")).hexdigest()[:8]
+        etag = f'{deal.etag[:-1]}-{digest}"'
+    headers = {"ETag": etag}
+    if deal.last_modified_http:
+        headers["Last-Modified"] = deal.last_modified_http
+    if not_modified(request, deal, etag):
+        return Response(status_code=304, headers=headers)
+    if fields is None:
+        body = deal.body
+    else:
+        body = compact_json(project_deal(deal.json(), projection))
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@app.get("/api/getdeal/customer/{customer_id}")
+def get_deal_by_customer(customer_id: str, request: Request):
+    try:
+        customer = int(customer_id)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "Invalid customer_id. Must be a number."})
+    deal = get_deal_store().get("customer_id", customer)
+    return deal_response(request, deal, f"No deal found for customer_id: {customer}")
+
+@app.get("/api/getdeal/bid/{bid_num}")
+def get_deal_by_bid_number(bid_num: str, request: Request):
+    deal = get_deal_store().get("bid_num", bid_num)
+    return deal_response(request, deal, f"No deal found for bidNum: {bid_num}")
+
+@app.get("/api/getdeal/origbid/{orig_bid}")
+def get_deal_by_original_bid(orig_bid: str, request: Request):
+    deal = get_deal_store().get("orig_bid", orig_bid)
+    return deal_response(request, deal, f"No deal found for origBid: {orig_bid}")
+
+@app.get("/api/getdeal/account/{acet}")
+def get_deal_by_account(acet: str, request: Request):
+    deal = get_deal_store().get("acet", acet)
+    return deal_response(request, deal, f"No deal found for account: {acet}")
+
+class AnalyticsQuery(BaseModel):
+    table: str = "deals"
+    filters: Optional[str] = None
+    group_by: Optional[str] = None
+    metrics: Optional[str] = None
+    columns: Optional[str] = None
+    sort: Optional[str] = None
+    limit: Optional[int] = None
+
+@app.get("/api/analytics/schema")
+def analytics_schema():
+    """Columns and row counts of the deals and accounts tables."""
+    return get_deal_analytics().schema()
+
+@app.post("/api/analytics/query")
+def analytics_query(query: AnalyticsQuery):
+    """Filter, group and aggregate all deals in one query."""
+    try:
+        return get_deal_analytics().query(**query.model_dump())
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+@app.get("/api/getdeal/{legacy_id}")
+def get_legacy_deal(legacy_id: str, request: Request):
+    # Legacy endpoints (kept for backward compatibility)
+    if legacy_id not in LEGACY_DEALS:
+        return JSONResponse(status_code=404, content={"error": "Route not found"})
+    deal = get_deal_store().get("customer_id", LEGACY_DEALS[legacy_id])
+    return deal_response(request, deal, f"No deal found for {legacy_id}")
+
+if __name__ == "__main__":
+    uvicorn.run(
+        "DealAgent.deal_server:app",
+        host="0.0.0.0",
+        port=DEAL_SERVER_PORT,
+    )
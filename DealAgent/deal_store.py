@@ -0,0 +1,265 @@
+"""
+Indexed on-disk deal store
+
+Ingests a directory of deal JSON documents (like DealAgent/data/json*.json)
+into SQLite. Each document is stored once as compact JSON text, and JSON1
+extracts the lookup keys into indexed columns: customer_id, bidNum, origBid
+and the account numbers (acet) of every bidAcct entry. Lookups return the
+stored text, so nothing has to be parsed again to serve a deal, and startup
+does not load the corpus into memory.
+
+The customer_id of a document is its top-level "customer_id"/"customerId"
+field when present, otherwise the number in its file name (json1.json -> 1),
+matching the mapping in server.js.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEAL_DATA_DIR = os.getenv("DEAL_DATA_DIR", str(Path(__file__).parent / "data"))
+# Kept outside the data directory, which other components watch for changes
+DEAL_STORE_PATH = os.getenv("DEAL_STORE_PATH", str(Path(__file__).parent / "deals.sqlite"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS deal (
+    deal_id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL UNIQUE,
+    source_mtime INTEGER NOT NULL,
+    source_size INTEGER NOT NULL,
+    customer_id INTEGER,
+    bid_num TEXT,
+    orig_bid TEXT,
+    last_mod TEXT,
+    etag TEXT NOT NULL,
+    body TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_deal_customer_id ON deal (customer_id, last_mod);
+CREATE INDEX IF NOT EXISTS idx_deal_bid_num ON deal (bid_num);
+CREATE INDEX IF NOT EXISTS idx_deal_orig_bid ON deal (orig_bid);
+
+CREATE TABLE IF NOT EXISTS deal_account (
+    acet TEXT NOT NULL,
+    deal_id INTEGER NOT NULL REFERENCES deal (deal_id) ON DELETE CASCADE,
+    PRIMARY KEY (acet, deal_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_deal_account_deal ON deal_account (deal_id);
+"""
+
+# Documents are either {"bidStart": {"bidHead": ..., "bidAcct": [...]}} or the inner object
+_HEAD = "coalesce(json_extract(:body, '$.bidStart.bidHead.{0}'), json_extract(:body, '$.bidHead.{0}'))"
+_ACCOUNTS = """
+INSERT OR IGNORE INTO deal_account (acet, deal_id)
+SELECT json_extract(value, '$.acet'), :deal_id
+FROM json_each(:body, CASE WHEN json_type(:body, '$.bidStart') IS NOT NULL THEN '$.bidStart.bidAcct' ELSE '$.bidAcct' END)
+WHERE json_extract(value, '$.acet') IS NOT NULL
+"""
+
+# Columns that lookups may filter on
+LOOKUP_COLUMNS = {
+    "customer_id": "SELECT {cols} FROM deal WHERE customer_id = ? ORDER BY last_mod DESC, deal_id DESC",
+    "bid_num": "SELECT {cols} FROM deal WHERE bid_num = ? ORDER BY last_mod DESC, deal_id DESC",
+    "orig_bid": "SELECT {cols} FROM deal WHERE orig_bid = ? ORDER BY last_mod DESC, deal_id DESC",
+    "acet": (
+        "SELECT {cols} FROM deal WHERE deal_id IN (SELECT deal_id FROM deal_account WHERE acet = ?) "
+        "ORDER BY last_mod DESC, deal_id DESC"
+    ),
+}
+_ROW_COLUMNS = "deal_id, customer_id, bid_num, orig_bid, last_mod, etag, body"
+_FILE_NUMBER = re.compile(r"(\d+)")
+
+
+@dataclass
+class StoredDeal:
+    deal_id: int
+    customer_id: Optional[int]
+    bid_num: Optional[str]
+    orig_bid: Optional[str]
+    last_mod: Optional[str]
+    etag: str
+    body: str
+
+    @property
+    def last_modified_http(self) -> Optional[str]:
+        """lastModDte as an HTTP Last-Modified date."""
+        if not self.last_mod:
+            return None
+        try:
+            day = datetime.strptime(self.last_mod[:10], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return None
+        return format_datetime(day, usegmt=True)
+
+    def json(self) -> dict:
+        return json.loads(self.body)
+
+
+def _customer_id_for(path: Path, document: dict) -> Optional[int]:
+    for key in ("customer_id", "customerId"):
+        if isinstance(document, dict) and document.get(key) is not None:
+            return int(document[key])
+    match = _FILE_NUMBER.search(path.stem)
+    return int(match.group(1)) if match else None
+
+
+class DealStore:
+    """
+    SQLite-backed deal store with indexed lookups.
+
+    Reads use one connection per thread; ingest uses its own connection and
+    commits in batches, so concurrent readers always see whole documents.
+    """
+
+    def __init__(self, db_path: str = DEAL_STORE_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def ingest_file(self, conn: sqlite3.Connection, path: Path, stat: os.stat_result) -> None:
+        """Insert or replace one deal document (inside the caller's transaction)."""
+        with open(path, "r", encoding="utf-8") as f:
+            document = json.load(f)
+        body = json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:20] + '"'
+        params = {
+            "source": str(path.resolve()),
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "customer_id": _customer_id_for(path, document),
+            "etag": etag,
+            "body": body,
+        }
+        conn.execute("DELETE FROM deal WHERE source = :source", params)
+        cursor = conn.execute(
+            f"""INSERT INTO deal (source, source_mtime, source_size, customer_id,
+                                  bid_num, orig_bid, last_mod, etag, body)
+                VALUES (:source, :mtime, :size, :customer_id,
+                        {_HEAD.format('bidNum')}, {_HEAD.format('origBid')},
+                        {_HEAD.format('lastModDte')}, :etag, :body)""",
+            params,
+        )
+        conn.execute(_ACCOUNTS, {"deal_id": cursor.lastrowid, "body": body})
+
+    def ingest_directory(
+        self, directory: str = DEAL_DATA_DIR, pattern: str = "*.json", batch_size: int = 1000
+    ) -> Dict[str, int]:
+        """
+        Bring the store in line with a directory of deal documents.
+
+        Only new or changed files (by mtime and size) are parsed; documents
+        whose file disappeared are removed.
+
+        Returns:
+            Counts of added/updated, unchanged, removed and failed files
+        """
+        stats = {"ingested": 0, "unchanged": 0, "removed": 0, "failed": 0}
+        with self._write_lock:
+            conn = self._connect()
+            try:
+                known = {
+                    source: (mtime, size)
+                    for source, mtime, size in conn.execute(
+                        "SELECT source, source_mtime, source_size FROM deal"
+                    )
+                }
+                seen = set()
+                pending = 0
+                conn.execute("BEGIN IMMEDIATE")
+                for path in sorted(Path(directory).glob(pattern)):
+                    source = str(path.resolve())
+                    seen.add(source)
+                    stat = path.stat()
+                    if known.get(source) == (stat.st_mtime_ns, stat.st_size):
+                        stats["unchanged"] += 1
+                        continue
+                    try:
+                        self.ingest_file(conn, path, stat)
+                        stats["ingested"] += 1
+                    except (OSError, ValueError) as e:
+                        stats["failed"] += 1
+                        logger.warning("Skipping %s: %s", path, e)
+                        continue
+                    pending += 1
+                    if pending >= batch_size:
+                        conn.execute("COMMIT")
+                        conn.execute("BEGIN IMMEDIATE")
+                        pending = 0
+                removed = [(source,) for source in known if source not in seen]
+                conn.executemany("DELETE FROM deal WHERE source = ?", removed)
+                stats["removed"] = len(removed)
+                conn.execute("COMMIT")
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+        return stats
+
+    def find(self, field: str, value, limit: Optional[int] = None) -> List[StoredDeal]:
+        """All deals whose field (customer_id, bid_num, orig_bid or acet) equals value, newest first."""
+        sql = LOOKUP_COLUMNS[field].format(cols=_ROW_COLUMNS)
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [StoredDeal(*row) for row in self._reader().execute(sql, (value,))]
+
+    def get(self, field: str, value) -> Optional[StoredDeal]:
+        """The newest deal matching a lookup, or None."""
+        deals = self.find(field, value, limit=1)
+        return deals[0] if deals else None
+
+    def iter_deals(self) -> Iterator[StoredDeal]:
+        """Stream every stored deal (used for portfolio-wide processing)."""
+        cursor = self._reader().execute(f"SELECT {_ROW_COLUMNS} FROM deal ORDER BY deal_id")
+        for row in cursor:
+            yield StoredDeal(*row)
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT count(*) FROM deal").fetchone()[0]
+
+    def signature(self) -> List[int]:
+        """Changes whenever documents are added, removed or re-ingested (for derived caches)."""
+        row = self._reader().execute(
+            "SELECT count(*), coalesce(max(deal_id), 0), coalesce(sum(source_mtime), 0) FROM deal"
+        ).fetchone()
+        return list(row)
+
+
+_store: Optional[DealStore] = None
+_store_lock = threading.Lock()
+
+
+def get_deal_store() -> DealStore:
+    """Return the process-wide deal store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = DealStore()
+    return _store
@@ -0,0 +1,280 @@
+"""
+Embedded backend for the MCP server
+
+With MCP_BACKEND=embedded the MCP server answers from the data files
+itself instead of proxying to the Sales Agent (port 8000) and the deal
+server (port 3000):
+- customers are read from customer.sqlite through a small pool of
+  read-only connections, with names resolved by the customer index
+- deals come from the indexed deal store (DealAgent/deal_store.py),
+  synced with DEAL_DATA_DIR at startup, and portfolio queries run on the
+  in-memory deal tables (DealAgent/deal_analytics.py)
+
+The functions mirror DealAgent/tools.py (same names, arguments and result
+shapes), so the MCP tools switch backends without changing their schema.
+Blocking reads run in worker threads, so concurrent MCP clients do not
+wait on each other. The data watcher reloads customers and deals when the
+files change.
+"""
+import asyncio
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from common import data_watch
+from DealAgent.customer_resolver import CUSTOMER_DB_PATH, get_customer_index
+from DealAgent.deal_analytics import get_deal_analytics
+from DealAgent.deal_store import DEAL_DATA_DIR, get_deal_store
+from DealAgent.projection import parse_fields, project_deal
+
+logger = logging.getLogger("embedded")
+
+# Read-only customer.sqlite connections kept open for tool calls
+EMBEDDED_DB_POOL_SIZE = int(os.getenv("EMBEDDED_DB_POOL_SIZE", "4"))
+
+# Deal lookups accepted by find_deal, by argument name
+DEAL_LOOKUPS = {"bid_num": "bid_num", "orig_bid": "orig_bid", "account": "acet"}
+
+
+class ReadOnlyPool:
+    """A fixed number of read-only SQLite connections shared by worker threads."""
+
+    def __init__(self, db_path: str, size: int = EMBEDDED_DB_POOL_SIZE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection, opening one while fewer than `size` exist, else waiting for one."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                self._created += create
+            conn = self._connect() if create else self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self.connection() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+
+_pool: Optional[ReadOnlyPool] = None
+
+
+def get_customer_pool() -> ReadOnlyPool:
+    global _pool
+    if _pool is None:
+        _pool = ReadOnlyPool(CUSTOMER_DB_PATH)
+    return _pool
+
+
+def start() -> None:
+    """Sync the deal store with the data directory, start watching the data files and warm the deal tables."""
+    stats = get_deal_store().ingest_directory(DEAL_DATA_DIR)
+    # Logged to stderr: stdout carries the MCP messages with the stdio transport
+    logger.info(f"Deal store synced with {DEAL_DATA_DIR}: {stats}")
+    data_watch.watcher.watch("customers", [CUSTOMER_DB_PATH], get_customer_index)
+    data_watch.watcher.watch("deals", [DEAL_DATA_DIR], lambda: get_deal_store().ingest_directory(DEAL_DATA_DIR))
+    data_watch.bus.subscribe(["deals"], lambda topic: get_deal_analytics().refresh())
+    data_watch.watcher.start()
+    # Build the portfolio tables off the startup path, so the first query does not wait for them
+    threading.Thread(target=get_deal_analytics().tables, name="analytics-warm", daemon=True).start()
+
+
+def stop() -> None:
+    data_watch.watcher.stop()
+
+
+# -- customers -------------------------------------------------------------
+
+def _customer_records(customer_ids: List[int]) -> List[Dict[str, Any]]:
+    """Customer rows with their per-service discounts and rebate tiers, in the given order."""
+    if not customer_ids:
+        return []
+    placeholders = ",".join("?" * len(customer_ids))
+    params = tuple(customer_ids)
+    pool = get_customer_pool()
+    customers = {
+        row["Customer_ID"]: {**row, "discounts": {}, "rebate_tiers": []}
+        for row in pool.query(
+            "SELECT Customer_ID, Company_Name, Annual_Volume, Discount_Structure, Rebate_Structure "
+            f"FROM customer WHERE Customer_ID IN ({placeholders})", params
+        )
+    }
+    for row in pool.query(
+        f"SELECT Customer_ID, Service_Type, Discount_Rate FROM customer_discount WHERE Customer_ID IN ({placeholders})",
+        params,
+    ):
+        customers[row["Customer_ID"]]["discounts"][row["Service_Type"]] = row["Discount_Rate"]
+    for row in pool.query(
+        "SELECT Customer_ID, Min_Spend, Rebate_Percentage FROM customer_rebate "
+        f"WHERE Customer_ID IN ({placeholders}) ORDER BY Min_Spend",
+        params,
+    ):
+        customers[row["Customer_ID"]]["rebate_tiers"].append(
+            {"min_spend": row["Min_Spend"], "rebate_percentage": row["Rebate_Percentage"]}
+        )
+    return [customers[customer_id] for customer_id in customer_ids if customer_id in customers]
+
+
+def _lookup_customer(customer_id: Optional[int], company_name: Optional[str], limit: int) -> Dict[str, Any]:
+    if customer_id is None and not company_name:
+        return {"status": "error", "error": "Provide customer_id or company_name"}
+    if customer_id is not None:
+        records = _customer_records([customer_id])
+        if not records:
+            return {"status": "not_found", "customer_id": customer_id, "customers": []}
+        return {"status": "success", "customer_id": customer_id, "customers": records}
+
+    index = get_customer_index()
+    candidates = index.search(company_name, limit=limit)
+    if not candidates:
+        return {"status": "not_found", "customer_id": None, "company_name": company_name, "customers": []}
+    resolved = index.resolve(company_name)
+    records = _customer_records([resolved["customer_id"]] if resolved else [c["customer_id"] for c in candidates])
+    return {
+        "status": "success" if resolved else "ambiguous",
+        "customer_id": resolved["customer_id"] if resolved else None,
+        "company_name": company_name,
+        "customers": records,
+    }
+
+
+async def get_customer(
+    customer_id: Optional[int] = None, company_name: Optional[str] = None, limit: int = 5
+) -> Dict[str, Any]:
+    """
+    Customer records by ID or company name, read from customer.sqlite.
+
+    Args:
+        customer_id: Customer ID (takes precedence over company_name)
+        company_name: Full or partial company name, resolved with exact, prefix, substring and fuzzy matching
+        limit: Maximum candidates returned when the name is ambiguous
+
+    Returns:
+        Dictionary with "status" (success, ambiguous or not_found), the resolved
+        "customer_id" and "customers": records with Annual_Volume, the discount and
+        rebate structure text, per-service "discounts" and "rebate_tiers"
+    """
+    try:
+        return await asyncio.to_thread(_lookup_customer, customer_id, company_name, limit)
+    except Exception as e:
+        return {"status": "error", "error": f"Customer lookup failed: {str(e)}"}
+
+
+# -- deals -----------------------------------------------------------------
+
+def _deal(field: str, value: Any, projection, key: str) -> Dict[str, Any]:
+    deal = get_deal_store().get(field, value)
+    if deal is None:
+        return {"status": "error", "error": f"No deal found for {key}: {value}", key: value}
+    return project_deal(deal.json(), projection)
+
+
+async def get_deal_by_customer_id(customer_id: int, fields: Optional[str] = None) -> Dict[str, Any]:
+    """Deal of a customer from the deal store (same result as the proxy tool)."""
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return {"status": "error", "error": str(e), "customer_id": customer_id}
+    try:
+        return await asyncio.to_thread(_deal, "customer_id", customer_id, projection, "customer_id")
+    except Exception as e:
+        return {"status": "error", "error": f"Error: {str(e)}", "customer_id": customer_id}
+
+
+async def get_deals_by_customer_ids(
+    customer_ids: List[int], fields: Optional[str] = None
+) -> Dict[str, Any]:
+    """Deals of several customers from the deal store, in one worker thread."""
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return {"status": "error", "deals": {}, "errors": {str(c): str(e) for c in customer_ids}}
+
+    def fetch_all() -> Dict[str, Dict[str, Any]]:
+        return {
+            str(customer_id): _deal("customer_id", customer_id, projection, "customer_id")
+            for customer_id in dict.fromkeys(customer_ids)
+        }
+
+    try:
+        results = await asyncio.to_thread(fetch_all)
+    except Exception as e:
+        return {"status": "error", "deals": {}, "errors": {str(c): f"Error: {str(e)}" for c in customer_ids}}
+    deals = {key: deal for key, deal in results.items() if deal.get("status") != "error"}
+    errors = {key: deal["error"] for key, deal in results.items() if deal.get("status") == "error"}
+    return {
+        "status": "success" if not errors else ("partial" if deals else "error"),
+        "deals": deals,
+        "errors": errors,
+    }
+
+
+async def find_deal(
+    bid_num: Optional[str] = None,
+    orig_bid: Optional[str] = None,
+    account: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    The newest deal with a bid number, original bid number or account number (acet).
+
+    Args:
+        bid_num: bidHead.bidNum
+        orig_bid: bidHead.origBid
+        account: acet of any bidAcct entry
+        fields: Optional field projection or preset (as for get_deal_by_customer_id)
+    """
+    given = [(key, value) for key, value in (("bid_num", bid_num), ("orig_bid", orig_bid), ("account", account))
+             if value]
+    if len(given) != 1:
+        return {"status": "error", "error": "Provide exactly one of bid_num, orig_bid or account"}
+    key, value = given[0]
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return {"status": "error", "error": str(e), key: value}
+    try:
+        return await asyncio.to_thread(_deal, DEAL_LOOKUPS[key], value, projection, key)
+    except Exception as e:
+        return {"status": "error", "error": f"Error: {str(e)}", key: value}
+
+
+async def query_deal_portfolio(
+    table: str = "deals",
+    filters: Optional[str] = None,
+    group_by: Optional[str] = None,
+    metrics: Optional[str] = None,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Filter/group/aggregate query on the in-process deal tables (same result as the deal server)."""
+    try:
+        return await asyncio.to_thread(
+            get_deal_analytics().query, table, filters=filters, group_by=group_by, metrics=metrics,
+            columns=columns, sort=sort, limit=limit,
+        )
+    except ValueError as e:
+        return {"status": "error", "error": str(e)}
+    except Exception as e:
+        return {"status": "error", "error": f"Error: {str(e)}"}
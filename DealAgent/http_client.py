@@ -0,0 +1,93 @@
+"""
+Shared async HTTP client for DealAgent tool calls
+
+One long-lived httpx.AsyncClient per process so tool calls reuse pooled
+keep-alive connections instead of opening a new TCP connection each time.
+Pool limits and timeouts are configurable through environment variables.
+Every request is traced as a client span and carries its traceparent.
+"""
+import os
+import httpx
+from typing import Optional
+
+from common import telemetry
+
+# Connection pool limits
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+
+# Default timeouts (seconds); individual calls may override the total timeout
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", "10"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class TracingTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport to record a client span per request and propagate the trace."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        url = request.url
+        name = f"{request.method} {url.host}:{url.port}" if url.port else f"{request.method} {url.host}"
+        span = telemetry.start_span("client", name, url=str(url.copy_with(query=None)))
+        telemetry.inject(request.headers, span)
+        length = request.headers.get("content-length")
+        span.add_payload("request", int(length) if length and length.isdigit() else None)
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception as e:
+            span.end(type(e).__name__)
+            raise
+        length = response.headers.get("content-length")
+        span.add_payload("response", int(length) if length and length.isdigit() else None)
+        span.set_attribute("status_code", response.status_code)
+        span.end(str(response.status_code) if response.status_code >= 500 else None)
+        return response
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide async HTTP client, creating it on first use.
+
+    Returns:
+        The shared httpx.AsyncClient
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client = httpx.AsyncClient(
+            transport=TracingTransport(transport),
+            timeout=httpx.Timeout(
+                HTTP_TIMEOUT,
+                connect=HTTP_CONNECT_TIMEOUT,
+                pool=HTTP_POOL_TIMEOUT,
+            ),
+        )
+    return _client
+
+
+def request_timeout(total: float) -> httpx.Timeout:
+    """Build a per-request timeout that keeps the configured connect/pool limits."""
+    return httpx.Timeout(total, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT)
+
+
+async def close_http_client() -> None:
+    """Close the shared client and release its pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
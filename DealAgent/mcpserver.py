@@ -2,15 +2,36 @@
 MCP Server for DealAgent
 Exposes Sales Agent FastAPI endpoints as MCP tools
 
+MCP_BACKEND selects where the tools get their data:
+- proxy (default): the Sales Agent API and the deal server, over HTTP
+- embedded: customer.sqlite and the deal data read in-process
+  (DealAgent/embedded.py), so neither service has to run. query_sales_agent
+  is replaced by the structured get_customer tool, and find_deal is added.
+
+MCP_TRANSPORT is stdio (default), streamable-http or sse; the HTTP
+transports listen on MCP_HOST:MCP_HTTP_PORT and serve concurrent clients
+(MCP_PORT is the Toolbox port).
+
 Installation:
     pip install mcp httpx
 
 Run:
     python DealAgent/mcpserver.py
+    MCP_BACKEND=embedded MCP_TRANSPORT=streamable-http python DealAgent/mcpserver.py
 """
+import asyncio
 import os
-import httpx
-from typing import Any
+import sys
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Optional
+
+# Add the parent directory to Python path
+current_dir = Path(__file__).parent
+project_root = current_dir.parent
+sys.path.append(str(project_root))
+
+from DealAgent.customer_resolver import resolve_customer as _resolve_customer
 
 # Try to import FastMCP from MCP SDK
 try:
@@ -24,16 +45,49 @@ except ImportError:
             "Or try: pip install anthropic-mcp"
         )
 
-# Sales Agent FastAPI URL
-SALES_AGENT_URL = os.getenv("SALES_AGENT_API_URL", "http://127.0.0.1:8000")
-# Deal Server URL
-DEAL_SERVER_URL = os.getenv("DEAL_SERVER_URL", "http://127.0.0.1:3000")
+MCP_BACKEND = os.getenv("MCP_BACKEND", "proxy").lower()
+MCP_TRANSPORT = os.getenv("MCP_TRANSPORT", "stdio")
+MCP_HOST = os.getenv("MCP_HOST", "127.0.0.1")
+MCP_HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", "8002"))
+
+if MCP_BACKEND not in ("proxy", "embedded"):
+    raise ValueError(f"MCP_BACKEND must be proxy or embedded, not {MCP_BACKEND!r}")
+EMBEDDED = MCP_BACKEND == "embedded"
+
+def _tools():
+    # httpx and the deal tools are imported on the first tool call, not at startup
+    if EMBEDDED:
+        from DealAgent import embedded
+        return embedded
+    from DealAgent import tools
+    return tools
+
+# Embedded: load the data and watch it for changes; proxy: close the pooled HTTP client when the server stops
+@asynccontextmanager
+async def lifespan(server):
+    if EMBEDDED:
+        await asyncio.to_thread(_tools().start)
+    try:
+        yield
+    finally:
+        if EMBEDDED:
+            _tools().stop()
+        if "DealAgent.http_client" in sys.modules:
+            await sys.modules["DealAgent.http_client"].close_http_client()
 
 # Initialize FastMCP server
-mcp = FastMCP("DealAgentMCP")
+mcp = FastMCP("DealAgentMCP", lifespan=lifespan, host=MCP_HOST, port=MCP_HTTP_PORT)
 
-@mcp.tool()
-def query_sales_agent(query: str) -> dict[str, Any]:
+def proxy_tool(fn):
+    """Register a tool only in proxy mode."""
+    return fn if EMBEDDED else mcp.tool()(fn)
+
+def embedded_tool(fn):
+    """Register a tool only in embedded mode."""
+    return mcp.tool()(fn) if EMBEDDED else fn
+
+@proxy_tool
+async def query_sales_agent(query: str) -> dict[str, Any]:
     """
     Query the Sales Agent with a natural language question.
     
@@ -47,41 +101,81 @@ def query_sales_agent(query: str) -> dict[str, Any]:
         Dictionary with response from the sales agent
         Example: {"response": "Customer ID: 1, Company: CompanyABC..."}
     """
-    try:
-        response = httpx.post(
-            f"{SALES_AGENT_URL}/query",
-            json={"query": query},
-            timeout=30.0
-        )
-        response.raise_for_status()
-        return response.json()
-    except httpx.HTTPStatusError as e:
-        return {
-            "status": "error",
-            "response": f"HTTP {e.response.status_code}: {e.response.text}"
-        }
-    except httpx.RequestError as e:
-        return {
-            "status": "error",
-            "response": f"Request failed: {str(e)}"
-        }
-    except Exception as e:
-        return {
-            "status": "error",
-            "response": f"Error: {str(e)}"
-        }
+    return await _tools().query_sales_agent(query)
 
 @mcp.tool()
-def get_deal_by_customer_id(customer_id: int) -> dict[str, Any]:
-    """Get deal data by customer ID from Deal Server."""
-    try:
-        response = httpx.get(f"{DEAL_SERVER_URL}/api/getdeal/customer/{customer_id}", timeout=10.0)
-        response.raise_for_status()
-        return response.json()
-    except Exception as e:
-        return {"status": "error", "error": str(e), "customer_id": customer_id}
+async def get_deal_by_customer_id(customer_id: int, fields: Optional[str] = None) -> dict[str, Any]:
+    """
+    Get deal data by customer ID from Deal Server.
+
+    fields optionally limits the result to comma-separated paths relative to
+    bidStart (e.g. "bidHead.bidNum,bidAcct[*].payTerm") or a preset
+    ("summary", "accounts"). Null fields are always left out.
+    """
+    return await _tools().get_deal_by_customer_id(customer_id, fields)
+
+@mcp.tool()
+async def get_deals_by_customer_ids(customer_ids: list[int], fields: Optional[str] = None) -> dict[str, Any]:
+    """Get deal data for several customer IDs concurrently from Deal Server (fields as above)."""
+    return await _tools().get_deals_by_customer_ids(customer_ids, fields)
+
+@mcp.tool()
+async def query_deal_portfolio(
+    table: str = "deals",
+    filters: Optional[str] = None,
+    group_by: Optional[str] = None,
+    metrics: Optional[str] = None,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Filter, group and aggregate all deals in one query on Deal Server.
+
+    table is "deals" (bidHead fields per deal) or "accounts" (bidAcct rows);
+    e.g. filters="dealStatus=P", group_by="owner", metrics="count,sum:estAnnGrs".
+    """
+    return await _tools().query_deal_portfolio(table, filters, group_by, metrics, columns, sort, limit)
+
+@embedded_tool
+async def get_customer(
+    customer_id: Optional[int] = None, company_name: Optional[str] = None, limit: int = 5
+) -> dict[str, Any]:
+    """
+    Get customer records by customer ID or company name from the local customer database.
+
+    Each record has Company_Name, Annual_Volume, the discount and rebate
+    structure, per-service discount rates and the rebate tiers. An ambiguous
+    name returns the candidates' records with status "ambiguous".
+    """
+    return await _tools().get_customer(customer_id, company_name, limit)
+
+@embedded_tool
+async def find_deal(
+    bid_num: Optional[str] = None,
+    orig_bid: Optional[str] = None,
+    account: Optional[str] = None,
+    fields: Optional[str] = None,
+) -> dict[str, Any]:
+    """
+    Get the newest deal with a bid number, original bid number or account number (acet).
+
+    Give exactly one of bid_num, orig_bid or account; fields as for get_deal_by_customer_id.
+    """
+    return await _tools().find_deal(bid_num, orig_bid, account, fields)
+
+@mcp.tool()
+async def resolve_customer(company_name: str, limit: int = 5) -> dict[str, Any]:
+    """
+    Resolve a company name to a customer ID from the local customer database.
+
+    Uses exact, prefix, substring and fuzzy matching; returns ranked
+    candidates when the name is ambiguous.
+    """
+    # In a worker thread: the first call builds the customer index, which would block other clients
+    return await asyncio.to_thread(_resolve_customer, company_name, limit=limit)
 
 if __name__ == "__main__":
     # Run the MCP server
-    mcp.run()
+    mcp.run(transport=MCP_TRANSPORT)
 
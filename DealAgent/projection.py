@@ -0,0 +1,158 @@
+"""
+Field projection for deal documents
+
+Deal documents are mostly null fields, and every tool call sends the whole
+document back to the model. A projection keeps only the requested fields:
+
+    bidHead.bidNum,bidHead.dealStatus,bidAcct[*].payTerm
+
+Paths are relative to bidStart (a leading "bidStart." is accepted too).
+A path segment may carry [*] for every list item or [n] for one item, and
+a path that stops at an object or list keeps all of it. Named presets
+("summary", "accounts", "all") expand to a list of paths.
+
+Null and empty values are always dropped from the result.
+"""
+import json
+import re
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+PRESETS: Dict[str, List[str]] = {
+    "summary": [
+        "bidHead.bidNum",
+        "bidHead.bidName",
+        "bidHead.origBid",
+        "bidHead.dealStatus",
+        "bidHead.dealRsn",
+        "bidHead.owner",
+        "bidHead.cny",
+        "bidHead.sttDte",
+        "bidHead.endDte",
+        "bidHead.lastModDte",
+        "bidHead.estAnnGrs",
+        "bidAcct[*].acet",
+    ],
+    "accounts": [
+        "bidHead.bidNum",
+        "bidAcct[*]",
+    ],
+    # Every field, with nulls and empty values removed
+    "all": [],
+}
+
+_SEGMENT = re.compile(r"^(?P<key>[A-Za-z_][\w-]*)?(?P<indexes>(?:\[(?:\*|\d+)\])*)$")
+_INDEX = re.compile(r"\[(\*|\d+)\]")
+_MISSING = object()
+
+# Trie of requested paths; a value of None means "keep the whole subtree"
+Projection = Optional[Dict[Union[str, int], Any]]
+
+
+def _parse_path(path: str) -> List[Union[str, int]]:
+    """Split "bidAcct[*].payTerm" into ["bidAcct", "*", "payTerm"]."""
+    tokens: List[Union[str, int]] = []
+    for segment in path.split("."):
+        match = _SEGMENT.match(segment)
+        if not segment or match is None or (not match.group("key") and not match.group("indexes")):
+            raise ValueError(f"Invalid field path: {path!r}")
+        if match.group("key"):
+            tokens.append(match.group("key"))
+        for index in _INDEX.findall(match.group("indexes")):
+            tokens.append(index if index == "*" else int(index))
+    if tokens and tokens[0] == "bidStart":
+        tokens = tokens[1:]
+    return tokens
+
+
+def parse_fields(fields: Union[str, Iterable[str], None]) -> Projection:
+    """
+    Build a projection from a comma-separated string or list of paths/presets.
+
+    Returns:
+        The projection trie, or None when every field should be kept
+
+    Raises:
+        ValueError: If a path is malformed
+    """
+    if fields is None:
+        return None
+    names = fields.split(",") if isinstance(fields, str) else list(fields)
+    paths: List[str] = []
+    for name in (name.strip() for name in names):
+        if not name:
+            continue
+        if name.lower() in PRESETS:
+            if not PRESETS[name.lower()]:
+                return None
+            paths.extend(PRESETS[name.lower()])
+        else:
+            paths.append(name)
+    if not paths:
+        return None
+
+    trie: Dict[Union[str, int], Any] = {}
+    for path in paths:
+        tokens = _parse_path(path)
+        if not tokens:
+            return None
+        node = trie
+        for token in tokens[:-1]:
+            child = node.setdefault(token, {})
+            if child is None:
+                break
+            node = child
+        else:
+            node[tokens[-1]] = None
+    return trie
+
+
+def _apply(value: Any, projection: Projection) -> Any:
+    if projection is None:
+        return value
+    if isinstance(value, dict):
+        result = {}
+        for key, sub in projection.items():
+            if isinstance(key, str) and key in value:
+                result[key] = _apply(value[key], sub)
+        return result
+    if isinstance(value, list):
+        if "*" in projection:
+            return [_apply(item, projection["*"]) for item in value]
+        return [
+            _apply(value[index], sub)
+            for index, sub in projection.items()
+            if isinstance(index, int) and -len(value) <= index < len(value)
+        ]
+    return _MISSING
+
+
+def strip_empty(value: Any) -> Any:
+    """Recursively drop None, empty strings, empty lists and empty objects (0 and False are kept)."""
+    if isinstance(value, dict):
+        stripped = {key: strip_empty(item) for key, item in value.items()}
+        return {key: item for key, item in stripped.items() if not _is_empty(item)}
+    if isinstance(value, list):
+        stripped = [strip_empty(item) for item in value]
+        return [item for item in stripped if not _is_empty(item)]
+    return value
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value is _MISSING or value == "" or value == [] or value == {}
+
+
+def project_deal(deal: Any, projection: Projection) -> Any:
+    """
+    Apply a projection to a deal document and drop empty values.
+
+    Documents wrapped in {"bidStart": ...} keep the wrapper; the projection
+    applies to its contents.
+    """
+    if isinstance(deal, dict) and set(deal) == {"bidStart"}:
+        return {"bidStart": strip_empty(_apply(deal["bidStart"], projection))}
+    return strip_empty(_apply(deal, projection))
+
+
+def compact_json(value: Any) -> str:
+    """Serialize without indentation or spaces after separators."""
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
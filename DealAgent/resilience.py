@@ -0,0 +1,367 @@
+"""
+Resilient calls to the tool backends (Sales Agent API, deal server)
+
+A Backend is one service behind one or more base URLs (replicas), e.g.
+SALES_AGENT_API_URL="http://10.0.0.5:8000,http://10.0.0.6:8000". Each
+request goes through:
+
+- Load balancing: the replica with the fewest requests in flight (ties go
+  to fewer recent failures, then the lower recent latency); retries and
+  hedges prefer replicas the call has not tried yet.
+- Circuit breaking: after BREAKER_FAILURES consecutive failures (transport
+  errors or 5xx) a replica is skipped for BREAKER_RESET_SECONDS, then one
+  probe request decides whether it is back. When every replica is open
+  the call fails at once instead of waiting for a timeout.
+- Latency-aware timeouts (GET only): once a backend has HEDGE_MIN_SAMPLES
+  GET latencies, an attempt is cut off at ATTEMPT_TIMEOUT_FACTOR x their
+  p99 (at least ATTEMPT_TIMEOUT_MIN) and retried, instead of using the
+  whole budget.
+- Hedging (GET only): if an attempt has not answered after the backend's
+  p95, a duplicate goes to another replica and the first answer wins; at
+  most HEDGE_MAX_RATIO of the requests are hedged.
+- Retries with full-jitter exponential backoff, while the call's overall
+  timeout allows, waiting at least as long as a Retry-After header asks.
+  A GET is retried on any transport error, 429, 502, 503 and 504. Other
+  methods are retried only when the request cannot have been processed:
+  the connection failed, or the server answered 429 or 503.
+
+A GET may reach the server more than once (a hedge, or a retry after a
+timeout), which is harmless for the deal fetches. A POST (a Sales Agent
+question, a portfolio query) is never sent again once it may have been
+processed, since that would repeat a model run or a query.
+Counters are exported as backend_events_total{backend, event} and
+per-replica state by stats().
+"""
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Set
+
+import httpx
+
+from common import telemetry
+from DealAgent.http_client import get_http_client, request_timeout
+
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.1"))
+RETRY_BACKOFF_MAX = float(os.getenv("RETRY_BACKOFF_MAX", "2"))
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "true").lower() in ("1", "true", "yes")
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", "0.1"))
+ATTEMPT_TIMEOUT_FACTOR = float(os.getenv("ATTEMPT_TIMEOUT_FACTOR", "3"))
+ATTEMPT_TIMEOUT_MIN = float(os.getenv("ATTEMPT_TIMEOUT_MIN", "1"))
+# Recent successful latencies kept per backend for the p95/p99 estimates
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "200"))
+
+# Statuses that mean a GET was not served and may be sent again
+RETRY_STATUSES = {429, 502, 503, 504}
+# Statuses with which a server refuses a request without processing it, so any method may be resent
+REFUSED_STATUSES = {429, 503}
+# Errors raised before the request was sent
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+_events = telemetry.Counter("backend_events_total", "Retries, hedges and circuit breaker events", ("backend", "event"))
+telemetry.METRICS.append(_events)
+
+
+def parse_urls(value: str) -> List[str]:
+    """Comma-separated base URLs, without trailing slashes."""
+    return [url.strip().rstrip("/") for url in value.split(",") if url.strip()]
+
+
+class BackendUnavailable(httpx.TransportError):
+    """Every replica's circuit is open, so the request was not sent."""
+
+
+def retryable(method: str, response: Optional[httpx.Response], error: Optional[Exception]) -> bool:
+    """Whether a failed attempt may be sent again without risking a second side effect."""
+    if method == "GET":
+        return error is not None or response.status_code in RETRY_STATUSES
+    if error is not None:
+        return isinstance(error, UNSENT_ERRORS)
+    return response.status_code in REFUSED_STATUSES
+
+
+def retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds asked for by a Retry-After header (delay-seconds or HTTP-date), or None."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitBreaker:
+    """closed -> open after consecutive failures -> half_open (one probe) -> closed or open."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET_SECONDS):
+        self.threshold = max(1, failures)
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now (claims the probe when half-open)."""
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def success(self) -> None:
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def failure(self) -> bool:
+        """Record a failure; returns True if this opened the circuit."""
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+            self.state = "open"
+            self.opened_at = time.monotonic()
+            self.opens += 1
+            return True
+        return False
+
+    def release(self) -> None:
+        """The request was abandoned (e.g. a hedge lost) without an outcome."""
+        self._probing = False
+
+
+class Replica:
+    def __init__(self, url: str):
+        self.url = url
+        self.breaker = CircuitBreaker()
+        self.outstanding = 0
+        self.requests = 0
+        self.errors = 0
+        # Exponentially weighted latency, for tie-breaking between idle replicas
+        self.ewma: Optional[float] = None
+
+    def observe(self, latency: float) -> None:
+        self.ewma = latency if self.ewma is None else 0.8 * self.ewma + 0.2 * latency
+
+
+class Backend:
+    """One service behind one or more replica URLs."""
+
+    def __init__(self, name: str, urls: List[str], hedge: bool = HEDGE_ENABLED, retries: int = RETRY_ATTEMPTS):
+        if not urls:
+            raise ValueError(f"No URL configured for backend {name}")
+        self.name = name
+        self.replicas = [Replica(url) for url in urls]
+        self.hedge = hedge
+        self.retries = max(0, retries)
+        self._latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._quantiles: Optional[Dict[float, float]] = None
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.retried = 0
+        self.rejected = 0
+
+    # -- latency estimates ---------------------------------------------------
+
+    def _record_latency(self, latency: float) -> None:
+        self._latencies.append(latency)
+        self._quantiles = None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """p50, p95 or p99 latency of recent successful GETs (None until HEDGE_MIN_SAMPLES)."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        if self._quantiles is None:
+            ordered = sorted(self._latencies)
+            self._quantiles = {p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] for p in (0.5, 0.95, 0.99)}
+        return self._quantiles[q]
+
+    def attempt_timeout(self, method: str, remaining: float) -> float:
+        """Timeout of the next attempt; a POST is not cut off, as it could not be retried."""
+        p99 = self.quantile(0.99) if method == "GET" else None
+        if p99 is None:
+            return remaining
+        return min(remaining, max(ATTEMPT_TIMEOUT_MIN, ATTEMPT_TIMEOUT_FACTOR * p99))
+
+    # -- replica selection ----------------------------------------------------
+
+    def _pick(self, tried: Set[Replica]) -> Optional[Replica]:
+        """The least busy replica whose circuit allows a request, untried ones first."""
+        candidates = sorted(
+            self.replicas,
+            key=lambda replica: (
+                replica in tried, replica.outstanding, replica.breaker.failures, replica.ewma or 0.0, random.random()
+            ),
+        )
+        for replica in candidates:
+            if replica.breaker.allow():
+                tried.add(replica)
+                return replica
+        return None
+
+    # -- requests -------------------------------------------------------------
+
+    async def _attempt(self, replica: Replica, method: str, path: str, timeout: float, kwargs: Dict[str, Any]):
+        replica.outstanding += 1
+        replica.requests += 1
+        started = time.perf_counter()
+        try:
+            response = await get_http_client().request(
+                method, replica.url + path, timeout=request_timeout(timeout), **kwargs
+            )
+        except httpx.RequestError:
+            self._failed(replica)
+            raise
+        except BaseException:
+            # Cancelled (a hedge that lost, a client that left): no verdict on the replica
+            replica.breaker.release()
+            raise
+        finally:
+            replica.outstanding -= 1
+        if response.status_code >= 500:
+            self._failed(replica)
+        else:
+            latency = time.perf_counter() - started
+            replica.breaker.success()
+            replica.observe(latency)
+            # The quantiles drive GET timeouts and hedging, so slower POSTs are left out
+            if method == "GET":
+                self._record_latency(latency)
+        return response
+
+    def _failed(self, replica: Replica) -> None:
+        replica.errors += 1
+        if replica.breaker.failure():
+            _events.inc(self.name, "breaker_open")
+
+    async def _send(
+        self, method: str, path: str, timeout: float, kwargs: Dict[str, Any], tried: Set[Replica]
+    ) -> httpx.Response:
+        """One attempt, hedged with a second replica when it runs past the p95."""
+        replica = self._pick(tried)
+        if replica is None:
+            self.rejected += 1
+            _events.inc(self.name, "rejected")
+            raise BackendUnavailable(f"{self.name}: circuit open for every replica")
+        first = asyncio.create_task(self._attempt(replica, method, path, timeout, kwargs))
+        pending = {first}
+        # Whatever ends this call (an answer, an error, the caller's cancellation) cancels the attempts still running
+        try:
+            p95 = self.quantile(0.95) if self.hedge and method == "GET" else None
+            if p95 is None or p95 >= timeout or self.hedges >= HEDGE_MAX_RATIO * self.calls:
+                return await first
+
+            done, pending = await asyncio.wait(pending, timeout=p95)
+            if done:
+                return first.result()
+            # A lone replica is hedged onto itself (a fresh connection still avoids a stuck one)
+            second_replica = self._pick(tried)
+            if second_replica is None:
+                return await first
+            self.hedges += 1
+            _events.inc(self.name, "hedge")
+            second = asyncio.create_task(self._attempt(second_replica, method, path, timeout - p95, kwargs))
+            pending = {first, second}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if not task.exception()), None)
+                if winner is not None and (winner.result().status_code not in RETRY_STATUSES or not pending):
+                    if winner is second:
+                        self.hedge_wins += 1
+                        _events.inc(self.name, "hedge_win")
+                    return winner.result()
+                if not pending:
+                    # Both failed: report the first request's outcome
+                    return first.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def request(self, method: str, path: str, timeout: float, **kwargs: Any) -> httpx.Response:
+        """
+        Send a request to the best replica, with hedging, retries and circuit breaking.
+
+        Args:
+            method: HTTP method (only GETs are hedged, cut off early or resent after a possible delivery)
+            path: Path and query, appended to the replica's base URL
+            timeout: Overall budget in seconds, shared by all attempts
+            **kwargs: Passed to httpx (json, headers, ...)
+
+        Returns:
+            The first response that is not retryable, or the last one once retries run out
+
+        Raises:
+            httpx.RequestError: The last attempt failed without a response
+            BackendUnavailable: Every replica's circuit is open
+        """
+        self.calls += 1
+        deadline = time.monotonic() + timeout
+        attempt = 0
+        tried: Set[Replica] = set()
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                response = await self._send(method, path, self.attempt_timeout(method, remaining), kwargs, tried)
+                error = None
+            except BackendUnavailable:
+                raise
+            except httpx.RequestError as e:
+                response, error = None, e
+
+            retry = retryable(method, response, error)
+            if retry:
+                backoff = random.uniform(0, min(RETRY_BACKOFF_MAX, RETRY_BACKOFF_BASE * 2 ** attempt))
+                # The server's Retry-After is a floor; if it does not fit the budget, give up now
+                backoff = max(backoff, retry_after(response) or 0.0)
+                retry = attempt < self.retries and deadline - time.monotonic() > backoff
+            if not retry:
+                if error is not None:
+                    raise error
+                return response
+            attempt += 1
+            self.retried += 1
+            _events.inc(self.name, "retry")
+            await asyncio.sleep(backoff)
+
+    def stats(self) -> Dict[str, Any]:
+        def ms(value: Optional[float]) -> Optional[float]:
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "calls": self.calls,
+            "retries": self.retried,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "latency_ms": {"p50": ms(self.quantile(0.5)), "p95": ms(self.quantile(0.95)), "p99": ms(self.quantile(0.99))},
+            "replicas": [
+                {
+                    "url": replica.url,
+                    "outstanding": replica.outstanding,
+                    "requests": replica.requests,
+                    "errors": replica.errors,
+                    "circuit": replica.breaker.state,
+                    "circuit_opens": replica.breaker.opens,
+                    "ewma_ms": ms(replica.ewma),
+                }
+                for replica in self.replicas
+            ],
+        }
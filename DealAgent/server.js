@@ -1,24 +1,41 @@
 const express = require("express");
+const fs = require("fs");
 const path = require("path");
 const app = express();
 
 app.use(express.json());
 
-// Load static JSON
-const deal1000 = require("./data/json1.json");
-const deal2000 = require("./data/json2.json");
-const deal3000 = require("./data/json3.json");
-
-// Map customer_id to deal data
+// Map customer_id to deal file
 // customer_id 1 → json1.json (CompanyABC)
 // customer_id 2 → json2.json (TechCorp Solutions)
 // customer_id 3 → json3.json (Global Logistics Inc)
-const customerToDealMap = {
-  1: deal1000,
-  2: deal2000,
-  3: deal3000
+const customerToDealFile = {
+  1: "json1.json",
+  2: "json2.json",
+  3: "json3.json"
 };
 
+// Deal data by customer_id, re-read whenever a file changes (no restart needed).
+// A file that fails to parse (e.g. while it is being written) keeps its previous data.
+const customerToDealMap = {};
+
+function loadDeal(customerId) {
+  const file = path.join(__dirname, "data", customerToDealFile[customerId]);
+  try {
+    customerToDealMap[customerId] = JSON.parse(fs.readFileSync(file, "utf8"));
+  } catch (err) {
+    console.error(`Keeping previous data for ${file}: ${err.message}`);
+  }
+}
+
+for (const customerId of Object.keys(customerToDealFile)) {
+  loadDeal(customerId);
+  fs.watchFile(path.join(__dirname, "data", customerToDealFile[customerId]), { interval: 2000 }, () => {
+    loadDeal(customerId);
+    console.log(`Reloaded deal for customer_id ${customerId}`);
+  });
+}
+
 // ✅ Main endpoint: Get deal by customer ID
 app.get("/api/getdeal/customer/:customer_id", (req, res) => {
   const customerId = parseInt(req.params.customer_id);
@@ -41,15 +58,15 @@ app.get("/api/getdeal/customer/:customer_id", (req, res) => {
 
 // ✅ Legacy endpoints (kept for backward compatibility)
 app.get("/api/getdeal/1000", (req, res) => {
-  res.json(deal1000);
+  res.json(customerToDealMap[1]);
 });
 
 app.get("/api/getdeal/2000", (req, res) => {
-  res.json(deal2000);
+  res.json(customerToDealMap[2]);
 });
 
 app.get("/api/getdeal/3000", (req, res) => {
-  res.json(deal3000);
+  res.json(customerToDealMap[3]);
 });
 
 // 404 fallback
@@ -0,0 +1,242 @@
+"""
+Conversation sessions for the DealAgent API
+
+A query that carries a session_id continues that conversation instead of
+starting a fresh agent run: the ADK session (chat history plus state) is
+kept between turns, and the agent callbacks remember in its state what the
+tools already returned:
+- resolved_customers: normalized company name -> customer_id, company_name
+- fetched_deals: customer_id -> {fields: deal}, for the last SESSION_MAX_DEALS customers;
+  dropped when the deal files change (the "deals" topic of the data watcher)
+
+Before each model call the model is told which customers and deals are
+already known, so a follow-up ("and what are its payment terms?") does not
+resolve the customer again; a repeated tool call with the same arguments is
+answered from the session instead of running the tool. The history sent to
+the model is cut to the last SESSION_MAX_TURNS user turns.
+
+SessionStore decides how long a conversation lives. InMemorySessionStore
+expires sessions after SESSION_TTL seconds of inactivity and keeps at most
+SESSION_MAX_SESSIONS, dropping the least recently used; the ids it drops are
+handed back through drain_evicted() so the caller can delete the ADK session.
+"""
+import abc
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+
+from common import data_watch
+from DealAgent.customer_resolver import normalize_name
+
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "10"))
+SESSION_MAX_DEALS = int(os.getenv("SESSION_MAX_DEALS", "20"))
+
+# ADK session state keys
+CONVERSATION_KEY = "conversation"
+CUSTOMERS_KEY = "resolved_customers"
+DEALS_KEY = "fetched_deals"
+# Version of the "deals" source the fetched deals were read from
+DEALS_VERSION_KEY = "fetched_deals_version"
+
+
+@dataclass
+class ConversationSession:
+    session_id: str
+    created_at: float
+    last_used: float
+    turns: int = 0
+    # Turns of one conversation run one at a time
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+
+
+class SessionStore(abc.ABC):
+    """
+    Where conversations live and for how long.
+
+    open() returns the session for an id, creating it if needed; ids dropped
+    by the store are returned once by drain_evicted().
+    """
+
+    @abc.abstractmethod
+    def open(self, session_id: str) -> Tuple[ConversationSession, bool]:
+        """Return (session, created) and mark the session as used."""
+
+    @abc.abstractmethod
+    def close(self, session_id: str) -> bool:
+        """End a conversation; False if it did not exist."""
+
+    @abc.abstractmethod
+    def drain_evicted(self) -> List[str]:
+        """Ids of the sessions the store dropped since the last call."""
+
+    @abc.abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Counts and limits, for GET /sessions/stats."""
+
+
+class InMemorySessionStore(SessionStore):
+    """Process-local sessions with an idle TTL and an LRU size bound."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._evicted: List[str] = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _sweep(self, now: float, keep: Optional[str] = None) -> None:
+        # Least recently used first, so expired sessions are at the front; sessions
+        # with a turn running and the session being opened (keep) are never dropped
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_used <= self.ttl:
+                break
+            if session.lock.locked():
+                continue
+            del self._sessions[session_id]
+            self._evicted.append(session_id)
+            self.expired += 1
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if session.lock.locked() or session_id == keep:
+                continue
+            del self._sessions[session_id]
+            self._evicted.append(session_id)
+            self.evicted += 1
+
+    def open(self, session_id: str) -> Tuple[ConversationSession, bool]:
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            session = self._sessions.get(session_id)
+            created = session is None
+            if created:
+                session = self._sessions[session_id] = ConversationSession(session_id, now, now)
+                self.created += 1
+                self._sweep(now, keep=session_id)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session, created
+
+    def close(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def drain_evicted(self) -> List[str]:
+        with self._lock:
+            evicted, self._evicted = self._evicted, []
+            return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "created": self.created,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+# -- per-conversation memory of tool results --------------------------------
+
+def _fields_key(fields: Optional[str]) -> str:
+    return (fields or "all").replace(" ", "")
+
+
+def _known_deals(state: Mapping[str, Any]) -> Dict[str, Any]:
+    """Deals fetched earlier, unless the deal files have changed since."""
+    if state.get(DEALS_VERSION_KEY, 0) != data_watch.bus.version("deals"):
+        return {}
+    return state.get(DEALS_KEY, {})
+
+
+def recall(state: Mapping[str, Any], tool_name: str, args: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """A result this conversation already has for the tool call, or None."""
+    if tool_name == "resolve_customer":
+        known = state.get(CUSTOMERS_KEY, {}).get(normalize_name(args.get("company_name") or ""))
+        if known:
+            return {"status": "success", **known, "candidates": [], "source": "session"}
+    elif tool_name == "get_deal_by_customer_id":
+        deals = _known_deals(state).get(str(args.get("customer_id")), {})
+        return deals.get(_fields_key(args.get("fields")))
+    elif tool_name == "get_deals_by_customer_ids":
+        known = _known_deals(state)
+        key = _fields_key(args.get("fields"))
+        customer_ids = args.get("customer_ids") or []
+        deals = {str(cid): known.get(str(cid), {}).get(key) for cid in customer_ids}
+        if customer_ids and all(deal is not None for deal in deals.values()):
+            return {"deals": deals, "errors": {}}
+    return None
+
+
+def remember(state: Dict[str, Any], tool_name: str, args: Dict[str, Any], result: Any) -> None:
+    """Record a successful tool result in the conversation state."""
+    if not isinstance(result, dict) or result.get("status") == "error" or result.get("source") == "session":
+        return
+    if tool_name == "resolve_customer":
+        if result.get("status") == "success":
+            customers = dict(state.get(CUSTOMERS_KEY, {}))
+            entry = {"customer_id": result["customer_id"], "company_name": result.get("company_name")}
+            customers[normalize_name(args.get("company_name") or "")] = entry
+            customers[normalize_name(result.get("company_name") or "")] = entry
+            customers.pop("", None)
+            state[CUSTOMERS_KEY] = customers
+    elif tool_name == "get_deal_by_customer_id":
+        _remember_deals(state, {str(args.get("customer_id")): result}, args.get("fields"))
+    elif tool_name == "get_deals_by_customer_ids":
+        _remember_deals(state, {str(cid): deal for cid, deal in (result.get("deals") or {}).items()},
+                        args.get("fields"))
+
+
+def _remember_deals(state: Dict[str, Any], deals: Dict[str, Any], fields: Optional[str]) -> None:
+    if not deals:
+        return
+    version = data_watch.bus.version("deals")
+    known = dict(_known_deals(state))
+    key = _fields_key(fields)
+    for customer_id, deal in deals.items():
+        # Re-insert so the most recently fetched customers are kept
+        projections = dict(known.pop(customer_id, {}))
+        projections[key] = deal
+        known[customer_id] = projections
+    while len(known) > SESSION_MAX_DEALS:
+        known.pop(next(iter(known)))
+    state[DEALS_KEY] = known
+    state[DEALS_VERSION_KEY] = version
+
+
+def context_note(state: Mapping[str, Any]) -> Optional[str]:
+    """Instruction text listing what earlier turns of the conversation already established."""
+    customers = {entry["customer_id"]: entry.get("company_name") for entry in state.get(CUSTOMERS_KEY, {}).values()}
+    deals = _known_deals(state)
+    if not customers and not deals:
+        return None
+    lines = ["Known from earlier in this conversation (reuse these; do not look them up again):"]
+    for customer_id, company_name in customers.items():
+        lines.append(f"- {company_name}: customer_id {customer_id}")
+    for customer_id, projections in deals.items():
+        lines.append(f"- deal for customer_id {customer_id} already fetched (fields: {', '.join(projections)})")
+    return "\n".join(lines)
+
+
+def trim_history(contents: Sequence[Any], max_turns: int = SESSION_MAX_TURNS) -> List[Any]:
+    """Keep the contents from the start of the last max_turns user turns."""
+    starts = [
+        i for i, content in enumerate(contents)
+        if content.role == "user" and any(getattr(part, "text", None) for part in content.parts or [])
+    ]
+    if max_turns <= 0 or len(starts) <= max_turns:
+        return list(contents)
+    return list(contents[starts[-max_turns]:])
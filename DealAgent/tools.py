@@ -0,0 +1,251 @@
+"""
+Async tool implementations shared by the DealAgent and the MCP server
+"""
+import asyncio
+import os
+import httpx
+from typing import Any, Dict, List, Optional
+
+from DealAgent.deal_cache import deal_cache
+from DealAgent.projection import parse_fields, project_deal
+from DealAgent.resilience import Backend, parse_urls
+
+# Sales Agent FastAPI URL (comma-separated for several replicas)
+SALES_AGENT_URLS = parse_urls(os.getenv("SALES_AGENT_API_URL", "http://127.0.0.1:8000"))
+SALES_AGENT_URL = SALES_AGENT_URLS[0]
+
+# Deal Server URL (DealAgent/deal_server.py, or the Node.js server.js mock; comma-separated for several replicas)
+DEAL_SERVER_URLS = parse_urls(os.getenv("DEAL_SERVER_URL", "http://127.0.0.1:3000"))
+DEAL_SERVER_URL = DEAL_SERVER_URLS[0]
+
+# Load balancing, retries, hedging and circuit breaking per backend (DealAgent/resilience.py)
+sales_agent_backend = Backend("sales_agent", SALES_AGENT_URLS)
+deal_server_backend = Backend("deal_server", DEAL_SERVER_URLS)
+
+# Maximum number of deal requests in flight for one batch tool call
+DEAL_FETCH_CONCURRENCY = int(os.getenv("DEAL_FETCH_CONCURRENCY", "8"))
+
+
+async def query_sales_agent(query: str) -> Dict[str, Any]:
+    """
+    Query the Sales Agent with a natural language question.
+
+    This tool calls the Sales Agent's FastAPI /query endpoint to get answers
+    about customers, discounts, rebates, or any sales-related queries.
+
+    Args:
+        query: Natural language query (e.g., "Show me customer info for CompanyABC" or "Get customer ID for CompanyABC")
+
+    Returns:
+        Dictionary with response from the sales agent
+    """
+    try:
+        response = await sales_agent_backend.request(
+            "POST",
+            "/query",
+            json={"query": query},
+            timeout=30.0
+        )
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {
+            "status": "error",
+            "response": f"HTTP {e.response.status_code}: {e.response.text}"
+        }
+    except httpx.RequestError as e:
+        return {
+            "status": "error",
+            "response": f"Request failed: {str(e)}"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "response": f"Error: {str(e)}"
+        }
+
+
+async def get_deal_by_customer_id(customer_id: int, fields: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Get deal data by customer ID from the Deal Server.
+
+    This tool calls the Deal Server's /api/getdeal/customer/:customer_id endpoint
+    to retrieve deal information (bid details, accounts, terms, etc.) for a given customer.
+    Deals are served from the in-process deal cache while fresh and revalidated
+    with a conditional request once they expire. Null and empty fields are
+    always left out of the result.
+
+    Args:
+        customer_id: The customer ID (integer, e.g., 1, 2, 3)
+        fields: Optional comma-separated fields to return, relative to bidStart
+            (e.g., "bidHead.bidNum,bidHead.dealStatus,bidAcct[*].payTerm") or a
+            preset: "summary" (key deal header fields and account numbers),
+            "accounts" (all account fields) or "all" (default)
+
+    Returns:
+        Dictionary with deal data including bidHead, bidAcct, etc.
+    """
+    try:
+        projection = parse_fields(fields)
+    except ValueError as e:
+        return {"status": "error", "error": str(e), "customer_id": customer_id}
+
+    deal = await _fetch_deal(customer_id)
+    if isinstance(deal, dict) and deal.get("status") == "error":
+        return deal
+    return project_deal(deal, projection)
+
+
+async def _fetch_deal(customer_id: int) -> Dict[str, Any]:
+    """Full deal document for a customer, through the deal cache."""
+    entry, fresh = deal_cache.lookup(customer_id)
+    if fresh:
+        return entry.payload
+
+    try:
+        response = await deal_server_backend.request(
+            "GET",
+            f"/api/getdeal/customer/{customer_id}",
+            headers=entry.validators() if entry else None,
+            timeout=10.0
+        )
+        if response.status_code == 304 and entry is not None:
+            deal_cache.refresh(customer_id)
+            return entry.payload
+        response.raise_for_status()
+        deal = response.json()
+        deal_cache.put(
+            customer_id,
+            deal,
+            size=len(response.content),
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+        )
+        return deal
+    except httpx.HTTPStatusError as e:
+        return {
+            "status": "error",
+            "error": f"HTTP {e.response.status_code}: {e.response.text}",
+            "customer_id": customer_id
+        }
+    except httpx.RequestError as e:
+        return {
+            "status": "error",
+            "error": f"Request failed: {str(e)}",
+            "customer_id": customer_id
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error: {str(e)}",
+            "customer_id": customer_id
+        }
+
+
+async def get_deals_by_customer_ids(
+    customer_ids: List[int], fields: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Get deal data for several customers in one call.
+
+    Fetches the deals concurrently (bounded by DEAL_FETCH_CONCURRENCY) and
+    returns them together, so comparing customers takes one tool call.
+
+    Args:
+        customer_ids: List of customer IDs (integers, e.g., [1, 2, 3])
+        fields: Optional field projection or preset applied to every deal
+            (same format as get_deal_by_customer_id, e.g., "summary")
+
+    Returns:
+        Dictionary with "deals" (customer_id -> deal JSON) and "errors"
+        (customer_id -> error message) for the IDs that could not be fetched
+    """
+    # Keep the caller's order but fetch each ID only once
+    unique_ids = list(dict.fromkeys(customer_ids))
+    semaphore = asyncio.Semaphore(max(1, DEAL_FETCH_CONCURRENCY))
+
+    async def fetch(customer_id: int) -> Dict[str, Any]:
+        async with semaphore:
+            return await get_deal_by_customer_id(customer_id, fields)
+
+    results = await asyncio.gather(*(fetch(customer_id) for customer_id in unique_ids))
+
+    deals: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    for customer_id, result in zip(unique_ids, results):
+        if isinstance(result, dict) and result.get("status") == "error":
+            errors[str(customer_id)] = result.get("error", "Unknown error")
+        else:
+            deals[str(customer_id)] = result
+
+    return {
+        "status": "success" if not errors else ("partial" if deals else "error"),
+        "deals": deals,
+        "errors": errors
+    }
+
+
+async def query_deal_portfolio(
+    table: str = "deals",
+    filters: Optional[str] = None,
+    group_by: Optional[str] = None,
+    metrics: Optional[str] = None,
+    columns: Optional[str] = None,
+    sort: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Run a filter/group/aggregate query over all deals on the Deal Server.
+
+    Answers portfolio-wide questions (totals, counts, lists across customers)
+    in one call instead of fetching each customer's deal.
+
+    Args:
+        table: "deals" (one row per deal: customer_id plus bidHead fields such as
+            bidNum, bidName, owner, reg, dealStatus, estAnnGrs, and accountCount) or
+            "accounts" (one row per bidAcct entry, e.g. acet, payTerm, payTermCode,
+            with its deal's fields repeated)
+        filters: Conditions separated by ";" using = != > >= < <= (numbers) or ~ (contains),
+            "|" for alternatives, e.g. "dealStatus=P; reg=16|17; payTerm>20"
+        group_by: Comma-separated fields to group by, e.g. "owner"
+        metrics: Comma-separated aggregates: count, sum:<field>, avg:<field>, min:<field>,
+            max:<field>, nunique:<field>, e.g. "count,sum:estAnnGrs"
+        columns: Fields to return per row when not aggregating, e.g. "customer_id,bidNum,acet,payTerm"
+        sort: Column or metric name to sort by (e.g. "sum_estAnnGrs"), prefixed with "-" for descending
+        limit: Maximum rows to return (default 50)
+
+    Returns:
+        Dictionary with "rows", "matched" (rows passing the filters), "row_count"
+        and "truncated"; on a bad query, "status": "error" with the reason and the
+        available fields
+    """
+    query = {
+        "table": table, "filters": filters, "group_by": group_by, "metrics": metrics,
+        "columns": columns, "sort": sort, "limit": limit,
+    }
+    try:
+        response = await deal_server_backend.request(
+            "POST",
+            "/api/analytics/query",
+            json={key: value for key, value in query.items() if value is not None},
+            timeout=30.0
+        )
+        if response.status_code == 400:
+            return {"status": "error", "error": response.json().get("error", response.text)}
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPStatusError as e:
+        return {
+            "status": "error",
+            "error": f"HTTP {e.response.status_code}: {e.response.text}"
+        }
+    except httpx.RequestError as e:
+        return {
+            "status": "error",
+            "error": f"Request failed: {str(e)}"
+        }
+    except Exception as e:
+        return {
+            "status": "error",
+            "error": f"Error: {str(e)}"
+        }
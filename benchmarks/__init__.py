@@ -0,0 +1,4 @@
+"""
+Benchmarks that run offline: cold-start timing (startup.py) and the load
+test with scripted LLMs and local backend stand-ins (load.py).
+"""
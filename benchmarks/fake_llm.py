@@ -0,0 +1,116 @@
+"""
+Scripted stand-ins for Gemini
+
+Both LLMs follow a fixed tool-calling script derived from the query text, so
+every run makes the same tool calls, and wait a fixed latency per model
+call to stand in for model time.
+
+DealAgent (ADK):   resolve_customer -> get_deal_by_customer_id -> answer
+Sales agent (LlamaIndex): get-customer-info -> calculate_pricing -> answer
+
+The company is taken from the end of the query: "... for <company>".
+"""
+import asyncio
+import re
+import time
+import uuid
+from typing import Any, AsyncIterator
+
+from benchmarks.stages import record
+
+_COMPANY = re.compile(r"\bfor\s+(?P<company>.+?)[\s?.!]*$", re.IGNORECASE)
+
+
+def company_from_query(query: str) -> str:
+    match = _COMPANY.search(query or "")
+    return match.group("company") if match else (query or "").strip()
+
+
+def scripted_adk_llm(latency: float):
+    """A google-adk BaseLlm that drives the DealAgent tool script."""
+    from google.adk.models import BaseLlm, LlmResponse
+    from google.genai import types
+
+    def usage(prompt_tokens: int, output_tokens: int):
+        return types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=output_tokens,
+            total_token_count=prompt_tokens + output_tokens,
+        )
+
+    def call(name: str, args: dict) -> Any:
+        part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+        return LlmResponse(content=types.Content(role="model", parts=[part]), usage_metadata=usage(400, 20))
+
+    def answer(text: str) -> Any:
+        part = types.Part(text=text)
+        return LlmResponse(content=types.Content(role="model", parts=[part]), usage_metadata=usage(600, 40))
+
+    class ScriptedAdkLlm(BaseLlm):
+        model: str = "scripted-adk"
+        latency: float = 0.05
+
+        async def generate_content_async(self, llm_request, stream: bool = False) -> AsyncIterator[Any]:
+            started = time.perf_counter()
+            await asyncio.sleep(self.latency)
+            response = self.next_step(llm_request)
+            record("llm", time.perf_counter() - started)
+            yield response
+
+        def next_step(self, llm_request) -> Any:
+            query = ""
+            results = []
+            for content in llm_request.contents:
+                for part in content.parts or []:
+                    if content.role == "user" and part.text and not query:
+                        query = part.text
+                    if part.function_response is not None:
+                        results.append(part.function_response)
+            if not results:
+                return call("resolve_customer", {"company_name": company_from_query(query)})
+            last = results[-1]
+            response = last.response or {}
+            if last.name == "resolve_customer":
+                if response.get("status") == "success":
+                    return call("get_deal_by_customer_id", {
+                        "customer_id": response["customer_id"], "fields": "summary",
+                    })
+                return answer("No matching customer found.")
+            bid = (response.get("bidStart") or {}).get("bidHead") or {}
+            return answer(f"Deal {bid.get('bidNum', 'unknown')} is in status {bid.get('dealStatus', 'unknown')}.")
+
+    return ScriptedAdkLlm(latency=latency)
+
+
+def scripted_llamaindex_llm(latency: float):
+    """A LlamaIndex function-calling LLM that drives the sales agent tool script."""
+    from llama_index.core.base.llms.types import ChatMessage, MessageRole, ToolCallBlock
+    from llama_index.core.llms.mock import MockFunctionCallingLLM
+
+    def tool_call(name: str, kwargs: dict) -> ChatMessage:
+        block = ToolCallBlock(tool_call_id=f"call-{uuid.uuid4().hex[:12]}", tool_name=name, tool_kwargs=kwargs)
+        return ChatMessage(role=MessageRole.ASSISTANT, blocks=[block])
+
+    def next_step(messages) -> ChatMessage:
+        query = next((m.content for m in messages if m.role == MessageRole.USER and m.content), "")
+        company = company_from_query(query)
+        tool_results = [m for m in messages if m.role == MessageRole.TOOL]
+        if not tool_results:
+            return tool_call("get-customer-info", {"company_name": company})
+        if len(tool_results) == 1:
+            return tool_call("calculate_pricing", {"company_name": company, "limit": 5})
+        return ChatMessage(
+            role=MessageRole.ASSISTANT,
+            content=f"{company}: pricing calculated from {len(tool_results)} tool results.",
+        )
+
+    def response_generator(messages, **kwargs):
+        async def generate():
+            started = time.perf_counter()
+            await asyncio.sleep(latency)
+            message = next_step(messages)
+            record("llm", time.perf_counter() - started)
+            yield message
+        return generate()
+
+    return MockFunctionCallingLLM(response_generator=response_generator, is_chat_model=True)
@@ -0,0 +1,374 @@
+"""
+End-to-end load test for the DealAgent API, the Sales Agent API and the MCP server
+
+Everything runs locally with deterministic stand-ins, so no Gemini key,
+Toolbox binary or network access is needed:
+- the agents use the scripted LLM (benchmarks.fake_llm) with a fixed
+  latency per model call (--llm-latency)
+- the sales agent talks to the stub Toolbox server (benchmarks.stub_toolbox)
+- deals are served by DealAgent/deal_server.py from generated deal files
+  (the mcp-embedded target reads them in-process, MCP_BACKEND=embedded)
+- customers come from customer.sqlite, or from a generated database of
+  --customers rows built with setup_db.py
+
+For every target and concurrency level it reports throughput, client
+latency and the server-side stage breakdown (llm, each tool, framework)
+as count/mean/p50/p95/p99/max.
+
+Run from the repository root:
+
+    python -m benchmarks.load                                   # all targets, concurrency 1,4,16
+    python -m benchmarks.load --target dealagent --concurrency 8 --requests 500
+    python -m benchmarks.load --customers 10000 --output load.json
+    python -m benchmarks.load --compare load.json --max-regression 0.2
+
+With --compare the script exits with status 1 when a throughput drops, or a
+client p95 rises, by more than --max-regression against the earlier results.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.serve import DEFAULT_LLM_LATENCY
+from benchmarks.stages import percentiles
+from benchmarks.startup import PROJECT_ROOT, free_port, service_env
+
+TARGETS = ("dealagent", "sales", "mcp", "mcp-embedded")
+
+DEAL_TEMPLATES = sorted((PROJECT_ROOT / "DealAgent" / "data").glob("json*.json"))
+CUSTOMER_DB = PROJECT_ROOT / "sales_agent" / "database" / "customer.sqlite"
+SETUP_DB = PROJECT_ROOT / "sales_agent" / "database" / "setup_db.py"
+
+DEAL_QUERY = "Summarize the deal for {company}"
+SALES_QUERY = "What discounts and rebates apply for {company}"
+
+
+# -- test data -------------------------------------------------------------
+
+def generate_customers(workdir: Path, count: int, seed: int) -> Path:
+    """Write count synthetic customers to a CSV and load it with setup_db.py."""
+    rng = random.Random(seed)
+    csv_path = workdir / "customer.csv"
+    db_path = workdir / "customer.sqlite"
+    with open(csv_path, "w", newline="") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC)
+        writer.writerow(["Customer_ID", "Company_Name", "Annual_Volume", "Discount_Structure", "Rebate_Structure"])
+        for customer_id in range(1, count + 1):
+            ground = rng.choice((30, 35, 40))
+            writer.writerow([
+                customer_id,
+                f"Benchmark Customer {customer_id:06d}",
+                f"${rng.randrange(20_000, 400_000):,}",
+                f"Ground: {ground}% off published rates, 2nd Day Air: {ground + 5}% off, "
+                f"Next Day Air: {ground + 10}% off, International: {ground - 5}% off",
+                "2% of total annual spend if they hit $100K, 3% if they hit $150K",
+            ])
+    subprocess.run(
+        [sys.executable, str(SETUP_DB), "--csv", str(csv_path), "--db", str(db_path)],
+        cwd=workdir, check=True, stdout=subprocess.DEVNULL,
+    )
+    return db_path
+
+
+def read_companies(db_path: Path) -> List[Tuple[int, str]]:
+    import sqlite3
+
+    with sqlite3.connect(f"file:{db_path}?mode=ro", uri=True) as conn:
+        return conn.execute("SELECT Customer_ID, Company_Name FROM customer ORDER BY Customer_ID").fetchall()
+
+
+def generate_deals(deal_dir: Path, customer_ids: List[int]) -> None:
+    """Write one deal per customer, cycling through the sample deals."""
+    deal_dir.mkdir(parents=True, exist_ok=True)
+    templates = [json.loads(path.read_text()) for path in DEAL_TEMPLATES]
+    for customer_id in customer_ids:
+        deal = json.loads(json.dumps(templates[(customer_id - 1) % len(templates)]))
+        head = deal["bidStart"]["bidHead"]
+        head["bidNum"] = f"B{customer_id:09d}"
+        head["origBid"] = f"{customer_id:010d}"
+        (deal_dir / f"deal{customer_id}.json").write_text(json.dumps(deal))
+
+
+# -- processes -------------------------------------------------------------
+
+class Services:
+    """Starts the stubs and servers the selected targets need, and stops them on exit."""
+
+    def __init__(self, workdir: Path, env: Dict[str, str], ready_timeout: float):
+        self.workdir = workdir
+        self.env = env
+        self.ready_timeout = ready_timeout
+        self.processes: List[subprocess.Popen] = []
+
+    def start(self, name: str, args: List[str], ready_url: str, env: Optional[Dict[str, str]] = None) -> None:
+        log = open(self.workdir / f"{name}.log", "w")
+        process = subprocess.Popen(
+            [sys.executable, *args], cwd=PROJECT_ROOT, env={**self.env, **(env or {})},
+            stdout=log, stderr=subprocess.STDOUT,
+        )
+        self.processes.append(process)
+        deadline = time.monotonic() + self.ready_timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} exited during startup; see {log.name}")
+            try:
+                if httpx.get(ready_url, timeout=1).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        raise RuntimeError(f"{name} was not ready after {self.ready_timeout:.0f}s; see {log.name}")
+
+    def stop(self) -> None:
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+@contextmanager
+def running_services(targets: List[str], workdir: Path, db_path: Path, deal_dir: Path,
+                     llm_latency: float, ready_timeout: float) -> Iterator[Dict[str, Any]]:
+    ports = {name: free_port() for name in ("deal_server", "toolbox", "dealagent", "sales")}
+    env = service_env()
+    env.update({
+        "CUSTOMER_DB_PATH": str(db_path),
+        "DEAL_DATA_DIR": str(deal_dir),
+        "DEAL_STORE_PATH": str(workdir / "deals.sqlite"),
+        "DEAL_SERVER_PORT": str(ports["deal_server"]),
+        "DEAL_SERVER_URL": f"http://127.0.0.1:{ports['deal_server']}",
+        "TOOLBOX_URL": f"http://127.0.0.1:{ports['toolbox']}",
+        "SALES_AGENT_API_URL": f"http://127.0.0.1:{ports['sales']}",
+        "BENCH_LLM_LATENCY": str(llm_latency),
+    })
+    services = Services(workdir, env, ready_timeout)
+    bases = {name: f"http://127.0.0.1:{port}" for name, port in ports.items()}
+    try:
+        if {"dealagent", "mcp"} & set(targets):
+            services.start("deal_server", ["DealAgent/deal_server.py"],
+                           f"{bases['deal_server']}/api/getdeal/customer/1")
+        if "sales" in targets:
+            services.start("toolbox", ["-m", "benchmarks.stub_toolbox", "--port", str(ports["toolbox"]),
+                                       "--db", str(db_path)], f"{bases['toolbox']}/health/ready")
+            services.start("sales", ["-m", "benchmarks.serve", "sales", "--port", str(ports["sales"])],
+                           f"{bases['sales']}/health/ready")
+        if "dealagent" in targets:
+            services.start("dealagent", ["-m", "benchmarks.serve", "dealagent", "--port", str(ports["dealagent"])],
+                           f"{bases['dealagent']}/health/ready")
+        yield {"bases": bases, "env": env}
+    finally:
+        services.stop()
+
+
+# -- load generation -------------------------------------------------------
+
+async def drive(concurrency: int, total: int, call: Callable[[int], Any]) -> Dict[str, Any]:
+    """Run total calls with concurrency workers; call(i) returns a status label."""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < total:
+            index = next_index
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                status = await call(index)
+            except Exception as e:
+                status = type(e).__name__
+            if status == "ok":
+                latencies.append(time.perf_counter() - started)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": total,
+        "ok": statuses.get("ok", 0),
+        "errors": total - statuses.get("ok", 0),
+        "statuses": dict(statuses),
+        "duration_seconds": round(elapsed, 3),
+        "throughput_rps": round(statuses.get("ok", 0) / elapsed, 2) if elapsed else 0.0,
+        "latency": {"client": percentiles(latencies)},
+    }
+
+
+async def run_http(base: str, queries: List[str], concurrency: int, total: int, warmup: int) -> Dict[str, Any]:
+    """POST queries to an agent API's /query and collect its stage timings."""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base, timeout=120, limits=limits) as client:
+        async def call(index: int) -> str:
+            response = await client.post("/query", json={"query": queries[index % len(queries)]})
+            return "ok" if response.status_code == 200 else str(response.status_code)
+
+        await drive(concurrency, warmup, call)
+        await client.post("/bench/reset")
+        result = await drive(concurrency, total, call)
+        result["latency"].update((await client.get("/bench/stages")).json())
+    return result
+
+
+async def run_mcp(env: Dict[str, str], companies: List[str], concurrency: int, total: int,
+                  warmup: int) -> Dict[str, Any]:
+    """Call the MCP server's tools over stdio: resolve_customer, then get_deal_by_customer_id."""
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    server = StdioServerParameters(command=sys.executable, args=["DealAgent/mcpserver.py"],
+                                   env=env, cwd=str(PROJECT_ROOT))
+    stages: Dict[str, List[float]] = {}
+
+    async def tool(session: ClientSession, name: str, arguments: dict) -> Optional[dict]:
+        started = time.perf_counter()
+        result = await session.call_tool(name, arguments)
+        stages.setdefault(f"tool:{name}", []).append(time.perf_counter() - started)
+        if result.isError:
+            return None
+        return json.loads(result.content[0].text)
+
+    with open(os.devnull, "w") as errlog:
+        async with stdio_client(server, errlog=errlog) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+
+                async def call(index: int) -> str:
+                    resolved = await tool(session, "resolve_customer",
+                                          {"company_name": companies[index % len(companies)]})
+                    if not resolved or resolved.get("status") != "success":
+                        return "unresolved"
+                    deal = await tool(session, "get_deal_by_customer_id",
+                                      {"customer_id": resolved["customer_id"], "fields": "summary"})
+                    return "ok" if deal and "error" not in deal else "deal_error"
+
+                await drive(concurrency, warmup, call)
+                stages.clear()
+                result = await drive(concurrency, total, call)
+    result["latency"].update({stage: percentiles(samples) for stage, samples in sorted(stages.items())})
+    return result
+
+
+# -- results ---------------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(runs: List[dict], baseline: dict, max_regression: float) -> List[str]:
+    """Descriptions of every throughput or client p95 that regressed beyond the allowed ratio."""
+    previous = {(run["target"], run["concurrency"]): run for run in baseline.get("runs", [])}
+    regressions = []
+    for run in runs:
+        before = previous.get((run["target"], run["concurrency"]))
+        if before is None:
+            continue
+        label = f"{run['target']} c={run['concurrency']}"
+        if before["throughput_rps"] and run["throughput_rps"] < before["throughput_rps"] * (1 - max_regression):
+            regressions.append(f"{label} throughput: {run['throughput_rps']} rps vs baseline {before['throughput_rps']} rps")
+        p95, p95_before = run["latency"]["client"].get("p95_ms"), before["latency"]["client"].get("p95_ms")
+        if p95 is not None and p95_before and p95 > p95_before * (1 + max_regression):
+            regressions.append(f"{label} client p95: {p95}ms vs baseline {p95_before}ms")
+    return regressions
+
+
+def print_run(run: dict) -> None:
+    print(f"{run['target']:<10} c={run['concurrency']:<4} {run['throughput_rps']:>8.1f} rps  "
+          f"ok {run['ok']}/{run['requests']}  statuses {run['statuses']}")
+    for stage, stats in run["latency"].items():
+        if stats.get("count"):
+            print(f"    {stage:<32} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms  "
+                  f"p99 {stats['p99_ms']:>9.2f}ms  (n={stats['count']})")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", choices=TARGETS, action="append", help="Target to load (repeatable; default: all)")
+    parser.add_argument("--concurrency", default="1,4,16", help="Comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=200, help="Measured requests per concurrency level")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests before each level")
+    parser.add_argument("--customers", type=int, default=0,
+                        help="Generate this many customers (default: use sales_agent/database/customer.sqlite)")
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LLM_LATENCY,
+                        help="Seconds each scripted model call takes")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for generated data")
+    parser.add_argument("--ready-timeout", type=float, default=120.0, help="Seconds to wait for each service")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results from a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Allowed throughput drop / p95 increase versus --compare (0.2 = 20%%)")
+    args = parser.parse_args()
+    targets = args.target or list(TARGETS)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="deal-bench-") as tmp:
+        workdir = Path(tmp)
+        db_path = generate_customers(workdir, args.customers, args.seed) if args.customers else CUSTOMER_DB
+        customers = read_companies(db_path)
+        generate_deals(workdir / "deals", [customer_id for customer_id, _ in customers])
+        companies = [name for _, name in customers]
+        with running_services(targets, workdir, db_path, workdir / "deals",
+                              args.llm_latency, args.ready_timeout) as services:
+            for target in targets:
+                for concurrency in levels:
+                    if target in ("mcp", "mcp-embedded"):
+                        env = {**services["env"], "MCP_BACKEND": "proxy" if target == "mcp" else "embedded"}
+                        run = asyncio.run(run_mcp(env, companies, concurrency, args.requests, args.warmup))
+                    else:
+                        query = DEAL_QUERY if target == "dealagent" else SALES_QUERY
+                        queries = [query.format(company=company) for company in companies]
+                        run = asyncio.run(run_http(services["bases"][target], queries, concurrency,
+                                                   args.requests, args.warmup))
+                    run = {"target": target, "concurrency": concurrency, **run}
+                    print_run(run)
+                    runs.append(run)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "customers": len(companies),
+            "args": vars(args),
+        },
+        "runs": runs,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.compare:
+        regressions = compare(runs, json.loads(Path(args.compare).read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Run the DealAgent API or the Sales Agent API with the scripted LLM
+
+The real application module is served unchanged apart from:
+- the Gemini model is replaced by the scripted LLM from benchmarks.fake_llm
+- the agent's tools are wrapped so their time is recorded per stage
+- GET /bench/stages and POST /bench/reset report and clear stage timings
+
+Backends are whatever the usual environment variables point at
+(DEAL_SERVER_URL, TOOLBOX_URL, CUSTOMER_DB_PATH, ...); benchmarks.load
+starts stubs for them.
+
+Run:
+    python -m benchmarks.serve dealagent --port 8001
+    python -m benchmarks.serve sales --port 8000
+"""
+import argparse
+import os
+
+from benchmarks.stages import StageRecorder, timed
+
+DEFAULT_LLM_LATENCY = float(os.getenv("BENCH_LLM_LATENCY", "0.05"))
+
+
+def dealagent_app(llm_latency: float):
+    from benchmarks.fake_llm import scripted_adk_llm
+    from DealAgent import agent as agent_module
+    from DealAgent import api
+
+    # The agent captures its tool functions when it is built
+    for name in ("resolve_customer", "query_sales_agent", "get_deal_by_customer_id", "get_deals_by_customer_ids",
+                 "query_deal_portfolio"):
+        setattr(agent_module, name, timed(f"tool:{name}", getattr(agent_module, name)))
+    agent_module.get_agent().model = scripted_adk_llm(llm_latency)
+
+    StageRecorder().install(api.app)
+    return api.app
+
+
+def sales_app(llm_latency: float):
+    from benchmarks.fake_llm import scripted_llamaindex_llm
+    from sales_agent import fastapi_server as server
+
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    load_agent_framework = server.load_agent_framework
+
+    def scripted_framework():
+        _, Settings, AgentWorkflow, ToolboxClient = load_agent_framework()
+        return (lambda **kwargs: scripted_llamaindex_llm(llm_latency)), Settings, AgentWorkflow, ToolboxClient
+
+    load_toolbox_tools = server.load_toolbox_tools
+
+    async def timed_toolbox_tools(toolbox):
+        tools = await load_toolbox_tools(toolbox)
+        for tool in tools:
+            object.__setattr__(tool, "acall", timed(f"tool:{tool.metadata.name}", tool.acall))
+        return tools
+
+    server.load_agent_framework = scripted_framework
+    server.load_toolbox_tools = timed_toolbox_tools
+    for name in ("load_discount_data", "load_rebate_data", "calculate_pricing"):
+        setattr(server, name, timed(f"tool:{name}", getattr(server, name)))
+
+    StageRecorder().install(server.app)
+    return server.app
+
+
+APPS = {"dealagent": dealagent_app, "sales": sales_app}
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve an agent API with the scripted LLM for benchmarking")
+    parser.add_argument("service", choices=sorted(APPS))
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--llm-latency", type=float, default=DEFAULT_LLM_LATENCY,
+                        help="Seconds each scripted model call takes")
+    args = parser.parse_args()
+    app = APPS[args.service](args.llm_latency)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Per-request stage timing for the benchmark servers
+
+Each benchmarked request gets an accumulator (a contextvar) that the
+scripted LLM and the instrumented tools add their time to. When the request
+finishes, the time not spent in the LLM or in tools is recorded as
+"framework" (agent orchestration, serialization, caching, admission).
+"""
+import functools
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+_current: ContextVar[Optional[Dict[str, float]]] = ContextVar("bench_stages", default=None)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add time to a stage of the current request (no-op outside a request)."""
+    stages = _current.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+def timed(stage: str, fn: Callable) -> Callable:
+    """Wrap a sync or async function so its run time is recorded under a stage."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - started)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            record(stage, time.perf_counter() - started)
+    return wrapper
+
+
+def percentiles(samples: List[float]) -> Dict[str, Any]:
+    """count, mean and nearest-rank p50/p95/p99/max in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": rank(0.50),
+        "p95_ms": rank(0.95),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+class StageRecorder:
+    """Collects per-request stage totals for requests to the given path prefixes."""
+
+    def __init__(self, paths=("/query",)):
+        self.paths = tuple(paths)
+        self._samples: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def middleware(self, app):
+        """ASGI middleware that opens a stage accumulator per matching request."""
+        async def wrapped(scope, receive, send):
+            if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+                return await app(scope, receive, send)
+            stages: Dict[str, float] = {}
+            token = _current.set(stages)
+            started = time.perf_counter()
+            try:
+                await app(scope, receive, send)
+            finally:
+                _current.reset(token)
+                self.add(time.perf_counter() - started, stages)
+        return wrapped
+
+    def add(self, total: float, stages: Dict[str, float]) -> None:
+        accounted = sum(stages.values())
+        with self._lock:
+            self._samples.setdefault("server", []).append(total)
+            self._samples.setdefault("framework", []).append(max(0.0, total - accounted))
+            for stage, seconds in stages.items():
+                self._samples.setdefault(stage, []).append(seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {stage: percentiles(samples) for stage, samples in sorted(self._samples.items())}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def install(self, app) -> None:
+        """Add the middleware and the /bench/stages endpoints to a FastAPI app."""
+        app.add_middleware(_RecorderMiddleware, recorder=self)
+        app.add_api_route("/bench/stages", self.summary, methods=["GET"])
+        app.add_api_route("/bench/reset", self.reset, methods=["POST"])
+
+
+class _RecorderMiddleware:
+    def __init__(self, app, recorder: StageRecorder):
+        self.app = recorder.middleware(app)
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
@@ -0,0 +1,227 @@
+"""
+Cold-start benchmark for the DealAgent API, the Sales Agent API and the MCP server
+
+For each service this measures, in fresh interpreter processes:
+- import time of its module
+- time from process start until it answers /health/live and /health/ready
+  (for the MCP server: until it has answered initialize and tools/list over stdio)
+
+Run from the repository root:
+
+    python benchmarks/startup.py                       # all services, 3 runs each
+    python benchmarks/startup.py --runs 5 --output startup.json
+    python benchmarks/startup.py --baseline startup.json --max-regression 0.25
+
+With --baseline the script exits with status 1 when a median is more than
+--max-regression slower than the baseline, so it can gate a release.
+Readiness of the Sales Agent needs Toolbox and GOOGLE_API_KEY; when they are
+not available its ready time is reported as null after --ready-timeout.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+SERVICES = {
+    "dealagent-api": {"module": "DealAgent.api", "app": "DealAgent.api:app"},
+    "sales-agent-api": {"module": "sales_agent.fastapi_server", "app": "sales_agent.fastapi_server:app"},
+    "mcp-server": {"module": "DealAgent.mcpserver", "script": "DealAgent/mcpserver.py"},
+}
+
+IMPORT_SNIPPET = (
+    "import time, warnings; warnings.simplefilter('ignore'); "
+    "t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+)
+
+
+def service_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get("PYTHONPATH")]))
+    env.setdefault("PYTHONWARNINGS", "ignore")
+    return env
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import(module: str) -> float:
+    """Seconds to import a module in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET.format(module=module)],
+        cwd=PROJECT_ROOT, env=service_env(), capture_output=True, text=True, check=True,
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def _status(url: str) -> Optional[int]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return None
+
+
+def measure_http_startup(app: str, ready_timeout: float) -> Dict[str, Optional[float]]:
+    """Seconds from launching uvicorn until /health/live answers and /health/ready returns 200."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"],
+        cwd=PROJECT_ROOT, env=service_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    live = ready = None
+    try:
+        while time.perf_counter() - started < ready_timeout and process.poll() is None:
+            if live is None and _status(f"{base}/health/live") is not None:
+                live = time.perf_counter() - started
+            if live is not None and _status(f"{base}/health/ready") == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.02)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"live_seconds": live, "ready_seconds": ready}
+
+
+def measure_mcp_startup(script: str, ready_timeout: float) -> Dict[str, Optional[float]]:
+    """Seconds from launching the stdio MCP server until initialize and tools/list are answered."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script],
+        cwd=PROJECT_ROOT, env=service_env(), text=True,
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+    )
+
+    def send(message: dict) -> None:
+        process.stdin.write(json.dumps(message) + "\n")
+        process.stdin.flush()
+
+    def receive(request_id: int) -> dict:
+        while True:
+            line = process.stdout.readline()
+            if not line:
+                raise RuntimeError("MCP server exited before answering")
+            message = json.loads(line)
+            if message.get("id") == request_id:
+                return message
+
+    live = ready = None
+    try:
+        send({
+            "jsonrpc": "2.0", "id": 1, "method": "initialize",
+            "params": {
+                "protocolVersion": "2025-06-18",
+                "capabilities": {},
+                "clientInfo": {"name": "startup-benchmark", "version": "1.0"},
+            },
+        })
+        receive(1)
+        live = time.perf_counter() - started
+        send({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        send({"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        receive(2)
+        ready = time.perf_counter() - started
+    except (RuntimeError, ValueError, OSError):
+        pass
+    finally:
+        process.kill()
+        process.wait()
+    if ready is not None and ready > ready_timeout:
+        ready = None
+    return {"live_seconds": live, "ready_seconds": ready}
+
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    values = [v for v in values if v is not None]
+    return round(statistics.median(values), 4) if values else None
+
+
+def run_service(name: str, runs: int, ready_timeout: float) -> Dict[str, Optional[float]]:
+    service = SERVICES[name]
+    imports, lives, readies = [], [], []
+    for _ in range(runs):
+        imports.append(measure_import(service["module"]))
+        if "app" in service:
+            startup = measure_http_startup(service["app"], ready_timeout)
+        else:
+            startup = measure_mcp_startup(service["script"], ready_timeout)
+        lives.append(startup["live_seconds"])
+        readies.append(startup["ready_seconds"])
+    return {
+        "import_seconds": _median(imports),
+        "live_seconds": _median(lives),
+        "ready_seconds": _median(readies),
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Descriptions of every median that regressed beyond the allowed ratio."""
+    regressions = []
+    for name, metrics in results.items():
+        for metric, value in metrics.items():
+            previous = baseline.get(name, {}).get(metric)
+            if value is None or previous is None:
+                continue
+            if value > previous * (1 + max_regression):
+                regressions.append(f"{name} {metric}: {value:.3f}s vs baseline {previous:.3f}s")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--service", choices=sorted(SERVICES), action="append",
+                        help="Service to measure (repeatable; default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per service (medians are reported)")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for readiness")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results from a previous run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed slowdown versus the baseline (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.service or list(SERVICES):
+        results[name] = run_service(name, args.runs, args.ready_timeout)
+        metrics = results[name]
+        print(
+            f"{name:<16} import {_fmt(metrics['import_seconds'])}  "
+            f"live {_fmt(metrics['live_seconds'])}  ready {_fmt(metrics['ready_seconds'])}"
+        )
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+def _fmt(value: Optional[float]) -> str:
+    return f"{value:7.3f}s" if value is not None else "    n/a "
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+"""
+Stub Toolbox MCP server for benchmarks
+
+Serves the tools in sales_agent/database/tools.yaml over the stateless
+MCP HTTP protocol that toolbox-llamaindex speaks (JSON-RPC POSTs to /mcp/),
+running each tool's SQL statement on a read-only connection to
+customer.sqlite. It stands in for the Toolbox binary so the sales agent can
+be benchmarked on a machine without it.
+
+Run:
+    python -m benchmarks.stub_toolbox --port 5000
+"""
+import argparse
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import yaml
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_TOOLS = PROJECT_ROOT / "sales_agent" / "database" / "tools.yaml"
+DEFAULT_DB = PROJECT_ROOT / "sales_agent" / "database" / "customer.sqlite"
+
+# tools.yaml parameter types -> JSON Schema types
+_JSON_TYPES = {"string": "string", "integer": "integer", "float": "number", "boolean": "boolean"}
+
+
+class ToolboxStub:
+    """The tools of a tools.yaml file, executed against one SQLite database."""
+
+    def __init__(self, tools_path: Path = DEFAULT_TOOLS, db_path: Path = DEFAULT_DB):
+        self.db_path = Path(db_path)
+        with open(tools_path) as f:
+            self.tools: Dict[str, dict] = yaml.safe_load(f).get("tools") or {}
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def list_tools(self) -> List[Dict[str, Any]]:
+        listed = []
+        for name, tool in self.tools.items():
+            parameters = tool.get("parameters") or []
+            listed.append({
+                "name": name,
+                "description": tool.get("description", ""),
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {
+                        p["name"]: {"type": _JSON_TYPES.get(p["type"], "string"), "description": p.get("description", "")}
+                        for p in parameters
+                    },
+                    "required": [p["name"] for p in parameters],
+                },
+            })
+        return listed
+
+    def call_tool(self, name: str, arguments: Dict[str, Any]) -> str:
+        """Run a tool's statement and return its rows as JSON text."""
+        tool = self.tools.get(name)
+        if tool is None:
+            raise KeyError(f"Tool '{name}' not found")
+        values = tuple(arguments.get(p["name"]) for p in tool.get("parameters") or [])
+        rows = self._connection().execute(tool["statement"], values).fetchall()
+        return json.dumps([dict(row) for row in rows]) if rows else "null"
+
+
+def create_app(stub: ToolboxStub) -> FastAPI:
+    app = FastAPI()
+
+    def dispatch(message: dict) -> Optional[dict]:
+        method = message.get("method")
+        params = message.get("params") or {}
+        if "id" not in message:  # notification
+            return None
+        if method == "initialize":
+            result = {
+                "protocolVersion": params.get("protocolVersion"),
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": {"name": "toolbox-stub", "version": "1.0"},
+            }
+        elif method == "tools/list":
+            result = {"tools": stub.list_tools()}
+        elif method == "tools/call":
+            try:
+                text = stub.call_tool(params.get("name"), params.get("arguments") or {})
+                result = {"content": [{"type": "text", "text": text}], "isError": False}
+            except (KeyError, sqlite3.Error) as e:
+                result = {"content": [{"type": "text", "text": str(e)}], "isError": True}
+        else:
+            return {"jsonrpc": "2.0", "id": message["id"], "error": {"code": -32601, "message": f"Unknown method {method}"}}
+        return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+
+    # Plain (sync) handlers run in the threadpool, each thread with its own connection
+    def handle(message: dict):
+        reply = dispatch(message)
+        return Response(status_code=204) if reply is None else JSONResponse(reply)
+
+    @app.post("/mcp/")
+    @app.post("/mcp")
+    def mcp(message: dict):
+        return handle(message)
+
+    @app.post("/mcp/{toolset}")
+    def mcp_toolset(toolset: str, message: dict):
+        return handle(message)
+
+    @app.get("/health/ready")
+    def ready():
+        return {"status": "ready", "tools": len(stub.tools)}
+
+    return app
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Stub Toolbox MCP server over customer.sqlite")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--db", default=str(DEFAULT_DB), help="SQLite database the tools query")
+    parser.add_argument("--tools", default=str(DEFAULT_TOOLS), help="Toolbox tools.yaml")
+    args = parser.parse_args()
+    uvicorn.run(create_app(ToolboxStub(Path(args.tools), Path(args.db))),
+                host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
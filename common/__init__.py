@@ -0,0 +1,3 @@
+"""
+Shared building blocks for the Sales Agent and DealAgent FastAPI servers
+"""
@@ -0,0 +1,192 @@
+"""
+Admission control for LLM-backed endpoints
+
+Bounds the number of agent runs in flight. Requests beyond the limit wait
+in a bounded FIFO queue; when the queue is full they are rejected at once
+with 429, and when they cannot get a slot before their queue timeout they
+are rejected with 503. Both carry a Retry-After estimate derived from
+recent run times. Admitted runs are also bounded by a per-request deadline
+(covering queue wait and execution) so slow runs cannot pile up.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "60"))
+
+# Number of recent queue waits kept for the percentile stats
+_WAIT_SAMPLES = 1024
+
+
+class AdmissionRejected(Exception):
+    """A request was not admitted (status_code 429 or 503) or ran past its deadline (504)."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: Optional[int] = None):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Optional[Dict[str, str]]:
+        return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else None
+
+
+class AdmissionController:
+    """
+    Concurrency limiter with a bounded wait queue and deadlines.
+
+    A max_concurrency of 0 or less disables admission control.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = ADMISSION_MAX_CONCURRENCY,
+        max_queue: int = ADMISSION_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT,
+        deadline: float = REQUEST_DEADLINE,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._waits: "deque[float]" = deque(maxlen=_WAIT_SAMPLES)
+        self._service_time = 0.0
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+        self.deadline_exceeded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_concurrency > 0
+
+    def retry_after(self) -> int:
+        """Seconds until a slot is likely to free up for a new request."""
+        service_time = self._service_time or 1.0
+        rounds = (self.waiting + 1) / max(1, self.max_concurrency)
+        return max(1, math.ceil(service_time * rounds))
+
+    async def acquire(self, timeout: Optional[float] = None) -> Callable[[], None]:
+        """
+        Wait for a slot.
+
+        Args:
+            timeout: Maximum queue wait; defaults to queue_timeout
+
+        Returns:
+            A callable that releases the slot (call exactly once)
+
+        Raises:
+            AdmissionRejected: 429 when the queue is full, 503 on queue timeout
+        """
+        if not self.enabled:
+            return lambda: None
+        queued_at = time.monotonic()
+        if self._semaphore.locked():
+            if self.waiting >= self.max_queue:
+                self.rejected_queue_full += 1
+                raise AdmissionRejected(
+                    429, "Too many requests in progress. Please retry later.", self.retry_after()
+                )
+            wait = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=max(0.0, wait))
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(
+                    503, "The server is busy. Please retry later.", self.retry_after()
+                )
+            finally:
+                self.waiting -= 1
+        else:
+            await self._semaphore.acquire()
+
+        started_at = time.monotonic()
+        self._waits.append(started_at - queued_at)
+        self.active += 1
+        self.admitted += 1
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if released:
+                return
+            released = True
+            self.active -= 1
+            # Exponentially weighted average run time, for Retry-After
+            elapsed = time.monotonic() - started_at
+            self._service_time = elapsed if not self._service_time else 0.8 * self._service_time + 0.2 * elapsed
+            self._semaphore.release()
+
+        return release
+
+    @asynccontextmanager
+    async def admit(self, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        release = await self.acquire(timeout)
+        try:
+            yield
+        finally:
+            release()
+
+    async def run(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run a computation in a slot, within the request deadline.
+
+        Raises:
+            AdmissionRejected: When not admitted, or 504 when the deadline passes
+        """
+        if self.deadline <= 0:
+            async with self.admit():
+                return await compute()
+
+        started = time.monotonic()
+        async with self.admit(timeout=self.deadline):
+            remaining = self.deadline - (time.monotonic() - started)
+            try:
+                return await asyncio.wait_for(compute(), timeout=max(0.0, remaining))
+            except asyncio.TimeoutError:
+                self.deadline_exceeded += 1
+                raise AdmissionRejected(504, "The request did not complete within its deadline.")
+
+    def stats(self) -> Dict[str, Any]:
+        """Limits, queue depth and wait-time statistics."""
+        waits = sorted(self._waits)
+
+        def percentile(q: float) -> float:
+            if not waits:
+                return 0.0
+            return round(waits[min(len(waits) - 1, int(q * len(waits)))], 4)
+
+        return {
+            "enabled": self.enabled,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "deadline_seconds": self.deadline,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "deadline_exceeded": self.deadline_exceeded,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+            "avg_run_seconds": round(self._service_time, 4),
+        }
@@ -0,0 +1,89 @@
+"""
+Bounded-parallel batch execution for /query/batch endpoints
+
+A batch is a list of queries answered by the same per-query function the
+/query endpoint uses (so the query cache and admission control still
+apply). At most `concurrency` queries run at once, and results are
+yielded in completion order as NDJSON lines, one per query:
+
+    {"index": 3, "query": "...", "status": "ok", "elapsed_ms": 812.4, "response": "...", ...}
+    {"index": 0, "query": "...", "status": "error", "elapsed_ms": 10021.7, "status_code": 503, "detail": "..."}
+
+followed by one summary line:
+
+    {"summary": {"items": 2, "ok": 1, "errors": 1, "elapsed_ms": 10023.0, "concurrency": 4}}
+
+A slow or failing query only affects its own line. If the client
+disconnects, queries that have not finished are cancelled.
+"""
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+async def run_batch(
+    queries: List[str],
+    answer: Callable[[str], Awaitable[Dict[str, Any]]],
+    describe_error: Callable[[Exception], Tuple[int, str]],
+    concurrency: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Answer queries with at most `concurrency` in flight, yielding one result per query as it finishes.
+
+    Args:
+        queries: The queries, reported back by their index
+        answer: Returns the result fields for one query (e.g. response, cache status)
+        describe_error: Maps an exception raised by answer() to (status_code, detail)
+        concurrency: Parallel queries, capped at BATCH_MAX_CONCURRENCY
+    """
+    limit = max(1, min(concurrency or BATCH_MAX_CONCURRENCY, BATCH_MAX_CONCURRENCY))
+    semaphore = asyncio.Semaphore(limit)
+    started = time.perf_counter()
+
+    async def run_item(index: int, query: str) -> Dict[str, Any]:
+        async with semaphore:
+            item_started = time.perf_counter()
+            item = {"index": index, "query": query}
+            if not query.strip():
+                return {**item, "status": "error", "elapsed_ms": 0.0,
+                        "status_code": 400, "detail": "Query cannot be empty"}
+            try:
+                result = await answer(query)
+            except Exception as e:
+                status_code, detail = describe_error(e)
+                return {**item, "status": "error", "elapsed_ms": _elapsed_ms(item_started),
+                        "status_code": status_code, "detail": detail}
+            return {**item, "status": "ok", "elapsed_ms": _elapsed_ms(item_started), **result}
+
+    tasks = [asyncio.create_task(run_item(index, query)) for index, query in enumerate(queries)]
+    ok = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            ok += item["status"] == "ok"
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+    yield {"summary": {
+        "items": len(queries),
+        "ok": ok,
+        "errors": len(queries) - ok,
+        "elapsed_ms": _elapsed_ms(started),
+        "concurrency": limit,
+    }}
+
+
+async def ndjson(items: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Format batch results as newline-delimited JSON."""
+    async for item in items:
+        yield json.dumps(item, default=str) + "\n"
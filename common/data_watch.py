@@ -0,0 +1,228 @@
+"""
+File-watching data layer and invalidation bus
+
+Each process registers the files its in-memory data comes from (CSV tables,
+customer.sqlite, the deal JSON directory) as named sources, each with a
+reload function that rebuilds only what depends on that source. A
+background thread polls the sources' file signatures (mtime and size, plus
+the SQLite -wal file, so writes that have not been checkpointed count too)
+every DATA_WATCH_INTERVAL seconds. A source is reloaded once its new
+signature has been seen on two consecutive polls, so files that are still
+being written are not read half-way.
+
+A reload builds the new data next to the old one and swaps it in, so
+requests never wait for a rebuild or see a partial one; if it fails, the
+old data keeps being served and the reload is retried on the next change.
+After a successful reload the source's name is published on the
+invalidation bus, where caches subscribe to drop what they derived from it.
+
+Reload counts are exported as data_reloads_total{source, status} and the
+sources are listed by GET /data/sources.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from common import telemetry
+
+DATA_WATCH_INTERVAL = float(os.getenv("DATA_WATCH_INTERVAL", "2"))
+
+logger = logging.getLogger("data_watch")
+
+_reloads = telemetry.Counter("data_reloads_total", "Reloads of watched data sources", ("source", "status"))
+telemetry.METRICS.append(_reloads)
+
+
+def _file_signature(path: str) -> Tuple:
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return ()
+
+
+def path_signature(path: str) -> Tuple:
+    """(mtime, size) of a file (and of its SQLite -wal file), or of every file in a directory."""
+    path = str(path)
+    try:
+        if os.path.isdir(path):
+            return tuple(sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in os.scandir(path) if entry.is_file()
+            ))
+    except OSError:
+        return ()
+    return _file_signature(path) + _file_signature(path + "-wal")
+
+
+class InvalidationBus:
+    """Publish/subscribe of source names; callbacks run on the publishing thread."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[str], Any]]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics: Iterable[str], callback: Callable[[str], Any]) -> Callable[[], None]:
+        """Call callback(topic) after each of these sources changes; returns an unsubscribe function."""
+        topics = list(topics)
+        with self._lock:
+            for topic in topics:
+                self._subscribers.setdefault(topic, []).append(callback)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                for topic in topics:
+                    if callback in self._subscribers.get(topic, []):
+                        self._subscribers[topic].remove(callback)
+        return unsubscribe
+
+    def publish(self, topic: str) -> None:
+        with self._lock:
+            self._versions[topic] = self._versions.get(topic, 0) + 1
+            callbacks = list(self._subscribers.get(topic, []))
+        for callback in callbacks:
+            try:
+                callback(topic)
+            except Exception as e:
+                logger.error(f"Invalidation subscriber for {topic} failed: {e}")
+
+    def version(self, topic: str) -> int:
+        """Number of times a source has changed in this process."""
+        return self._versions.get(topic, 0)
+
+
+bus = InvalidationBus()
+
+
+class DataSource:
+    def __init__(self, name: str, paths: Iterable[str], reload: Optional[Callable[[], Any]]):
+        self.name = name
+        self.paths = [str(path) for path in paths]
+        self.reload = reload
+        self.signature = self.current_signature()
+        self.pending: Optional[Tuple] = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_reload: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def current_signature(self) -> Tuple:
+        return tuple(path_signature(path) for path in self.paths)
+
+
+class DataWatcher:
+    """Polls registered sources on a daemon thread and reloads the ones that changed."""
+
+    def __init__(self, interval: float = DATA_WATCH_INTERVAL, invalidations: InvalidationBus = bus):
+        self.interval = interval
+        self.bus = invalidations
+        self._sources: Dict[str, DataSource] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def watch(self, name: str, paths: Iterable[str], reload: Optional[Callable[[], Any]] = None) -> None:
+        """
+        Register (or replace) a source.
+
+        Args:
+            name: Source name, published on the bus when it changes
+            paths: Files or directories the source is read from
+            reload: Rebuilds the in-memory data of the source (None: only publish)
+        """
+        with self._lock:
+            self._sources[name] = DataSource(name, paths, reload)
+
+    def check(self) -> List[str]:
+        """Poll every source once; returns the names of the sources reloaded."""
+        with self._lock:
+            sources = list(self._sources.values())
+        reloaded = []
+        for source in sources:
+            signature = source.current_signature()
+            if signature == source.signature:
+                source.pending = None
+                continue
+            if signature != source.pending:
+                # Changed since the last poll: wait until it stops changing
+                source.pending = signature
+                continue
+            if self._reload(source):
+                source.signature = signature
+                source.pending = None
+                reloaded.append(source.name)
+        return reloaded
+
+    def _reload(self, source: DataSource) -> bool:
+        started = time.perf_counter()
+        try:
+            with telemetry.span("data", f"reload:{source.name}"):
+                if source.reload is not None:
+                    source.reload()
+        except Exception as e:
+            source.failures += 1
+            source.last_error = f"{type(e).__name__}: {e}"
+            _reloads.inc(source.name, "error")
+            logger.error(f"Reloading {source.name} failed, keeping the previous data: {e}")
+            return False
+        source.reloads += 1
+        source.last_reload = time.time()
+        source.last_error = None
+        _reloads.inc(source.name, "ok")
+        logger.info(f"Reloaded {source.name} in {(time.perf_counter() - started) * 1000:.1f} ms")
+        self.bus.publish(source.name)
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Data watcher poll failed: {e}")
+
+    def start(self) -> None:
+        """Start polling (no-op if already running or DATA_WATCH_INTERVAL is 0)."""
+        if self.interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="data-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = list(self._sources.values())
+        return {
+            "interval_seconds": self.interval,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "sources": {
+                source.name: {
+                    "paths": source.paths,
+                    "version": self.bus.version(source.name),
+                    "reloads": source.reloads,
+                    "failures": source.failures,
+                    "last_reload": source.last_reload,
+                    "last_error": source.last_error,
+                }
+                for source in sources
+            },
+        }
+
+
+watcher = DataWatcher()
+
+
+def install(app) -> None:
+    """Add GET /data/sources (watched sources and their reload counts) to a FastAPI app."""
+    async def data_sources():
+        return watcher.stats()
+
+    app.add_api_route("/data/sources", data_sources, methods=["GET"])
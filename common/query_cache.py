@@ -0,0 +1,159 @@
+"""
+Single-flight response cache for /query endpoints
+
+Responses are cached by normalized query text with a TTL and LRU eviction.
+Concurrent identical queries share one agent run: the first caller starts
+it and the others wait for the same result. The whole cache is dropped
+whenever one of the data sources it depends on is reloaded (it subscribes
+to those source names on the common.data_watch invalidation bus). The
+entries are guarded by a lock because invalidation runs on the watcher
+thread; in-flight runs belong to the event loop.
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, Tuple
+
+from common.data_watch import bus
+
+QUERY_CACHE_ENABLED = os.getenv("QUERY_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))
+QUERY_CACHE_MAX_ENTRIES = int(os.getenv("QUERY_CACHE_MAX_ENTRIES", "512"))
+
+# Cache statuses returned by get_or_compute (and sent as the X-Cache header)
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+BYPASS = "bypass"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE.sub(" ", query).strip().rstrip("?!. ").casefold()
+
+
+class QueryCache:
+    """
+    TTL/LRU response cache with request coalescing.
+
+    When disabled, get_or_compute simply runs the computation.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = QUERY_CACHE_ENABLED,
+        ttl: float = QUERY_CACHE_TTL,
+        max_entries: int = QUERY_CACHE_MAX_ENTRIES,
+        invalidate_on: Iterable[str] = (),
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        # Bumped by every invalidation; answers computed across one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        bus.subscribe(invalidate_on, lambda topic: self.invalidate())
+
+    def invalidate(self) -> None:
+        """Drop every cached response (in-flight runs are left to finish); safe to call from any thread."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def _store(self, key: str, value: Any, generation: int) -> None:
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, key: str) -> Tuple[bool, Any, int]:
+        """(hit, value, generation) for a key, dropping it if expired."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value, self._generation
+                del self._entries[key]
+            return False, None, self._generation
+
+    def _finish(self, key: str, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even if every caller went away
+            task.exception()
+
+    async def get_or_compute(
+        self, query: str, compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, str]:
+        """
+        Return the cached response for a query, or compute it once.
+
+        Args:
+            query: The raw query text
+            compute: Coroutine factory producing the response on a miss
+
+        Returns:
+            (response, status) where status is HIT, MISS, COALESCED, or
+            BYPASS when the cache is disabled
+        """
+        if not self.enabled:
+            return await compute(), BYPASS
+
+        key = normalize_query(query)
+
+        hit, value, generation = self._lookup(key)
+        if hit:
+            return value, HIT
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), COALESCED
+
+        self.misses += 1
+        # Run as a task so a disconnecting first caller does not cancel the
+        # run that the other callers are waiting on.
+        task = asyncio.ensure_future(compute())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finish(key, done))
+        value = await asyncio.shield(task)
+        self._store(key, value, generation)
+        return value, MISS
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and current size."""
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
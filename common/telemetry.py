@@ -0,0 +1,342 @@
+"""
+Tracing spans and Prometheus metrics for the FastAPI servers
+
+A span is one timed step of a request: the request itself (server), an
+outbound HTTP call (client), a model call (llm), a tool call (tool) or a
+data load (data). Spans carry W3C trace context, so a request that hops
+from DealAgent to the Sales Agent keeps one trace id: clients send the
+current span as a `traceparent` header and the server middleware continues
+the trace it receives.
+
+Every finished span feeds these metrics, served on GET /metrics in the
+Prometheus text format:
+- span_duration_seconds{kind, name, status}   histogram
+- span_errors_total{kind, name, error}         counter
+- payload_bytes{kind, name, direction}         histogram (HTTP bodies)
+
+Recent spans are kept in memory (GET /traces/{trace_id}) and can be logged
+as JSON lines with TRACE_LOG_SPANS. Metrics are per process; scrape every
+worker when running several.
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, MutableMapping, NamedTuple, Optional, Sequence, Tuple
+
+TRACE_LOG_SPANS = os.getenv("TRACE_LOG_SPANS", "false").lower() in ("1", "true", "yes")
+TRACE_BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "4096"))
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Paths that are not traced (probes and the telemetry endpoints themselves)
+_UNTRACED_PREFIXES = ("/metrics", "/health/", "/traces/")
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+logger = logging.getLogger("telemetry")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+
+
+# -- metrics ---------------------------------------------------------------
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: Any, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: Any) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                bounds = [f"{bound:g}" for bound in self.buckets] + ["+Inf"]
+                for bound, count in zip(bounds, series):
+                    le = 'le="' + bound + '"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count:g}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {series[-2]:g}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}")
+        return lines
+
+
+span_duration = Histogram(
+    "span_duration_seconds", "Duration of traced steps", ("kind", "name", "status"), DURATION_BUCKETS
+)
+span_errors = Counter("span_errors_total", "Traced steps that failed", ("kind", "name", "error"))
+payload_bytes = Histogram(
+    "payload_bytes", "HTTP request and response body sizes", ("kind", "name", "direction"), SIZE_BUCKETS
+)
+
+# Additional metrics (e.g. token counters) register here to appear on /metrics
+METRICS: List[Any] = [span_duration, span_errors, payload_bytes]
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# -- spans -----------------------------------------------------------------
+
+_current: ContextVar[Optional["Span"]] = ContextVar("telemetry_span", default=None)
+_finished: "deque[Dict[str, Any]]" = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+class Span:
+    """One timed step; create with span() / start_span() and finish with end()."""
+
+    def __init__(self, kind: str, name: str, parent: Optional[SpanContext] = None, **attributes: Any):
+        self.kind = kind
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.parent_id = parent.span_id if parent else None
+        self.span_id = secrets.token_hex(8)
+        self.attributes = dict(attributes)
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.ended = False
+
+    @property
+    def context(self) -> SpanContext:
+        return SpanContext(self.trace_id, self.span_id)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def add_payload(self, direction: str, size: Optional[int]) -> None:
+        """Record a body size ("request" or "response") for this span's kind and name."""
+        if size is not None:
+            self.attributes[f"{direction}_bytes"] = size
+            payload_bytes.observe(size, self.kind, self.name, direction)
+
+    def end(self, error: Optional[str] = None) -> None:
+        """Finish the span; error is a short label such as an exception type or status code."""
+        if self.ended:
+            return
+        self.ended = True
+        duration = time.perf_counter() - self._started
+        status = "error" if error else "ok"
+        span_duration.observe(duration, self.kind, self.name, status)
+        if error:
+            span_errors.inc(self.kind, self.name, error)
+        record = {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "name": self.name,
+            "start": round(self.start_time, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "status": status,
+            "error": error,
+            "attributes": self.attributes,
+        }
+        _finished.append(record)
+        if TRACE_LOG_SPANS:
+            logger.info(json.dumps(record, default=str))
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def start_span(kind: str, name: str, parent: Optional[SpanContext] = None, **attributes: Any) -> Span:
+    """
+    Start a span without making it current (for steps that begin and end in callbacks).
+
+    The parent defaults to the current span.
+    """
+    if parent is None:
+        current = _current.get()
+        parent = current.context if current else None
+    return Span(kind, name, parent, **attributes)
+
+
+@contextmanager
+def span(kind: str, name: str, parent: Optional[SpanContext] = None, **attributes: Any) -> Iterator[Span]:
+    """Run a block as the current span; an exception marks it failed and propagates."""
+    active = start_span(kind, name, parent, **attributes)
+    token = _current.set(active)
+    error = None
+    try:
+        yield active
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        active.end(error)
+
+
+def traced(kind: str, name: Optional[str] = None) -> Callable[[Callable], Callable]:
+    """Decorator: run a sync or async function inside a span (named after it by default)."""
+    def decorate(fn: Callable) -> Callable:
+        span_name = name or fn.__name__
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(kind, span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def inject(headers: MutableMapping[str, str], active: Optional[Span] = None) -> None:
+    """Add a traceparent header for the given (or current) span."""
+    active = active or _current.get()
+    if active is not None:
+        headers["traceparent"] = active.traceparent
+
+
+def extract(traceparent: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C traceparent header value."""
+    match = _TRACEPARENT.match((traceparent or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+
+def trace(trace_id: str) -> List[Dict[str, Any]]:
+    """Recently finished spans of one trace, oldest first."""
+    return sorted((record for record in list(_finished) if record["trace_id"] == trace_id),
+                  key=lambda record: record["start"])
+
+
+# -- FastAPI integration ---------------------------------------------------
+
+class TelemetryMiddleware:
+    """ASGI middleware: one server span per request, continuing an incoming traceparent."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(_UNTRACED_PREFIXES):
+            return await self.app(scope, receive, send)
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        active = start_span("server", scope["path"], extract(headers.get("traceparent")),
+                            method=scope["method"])
+        token = _current.set(active)
+        status_code = 500
+        response_bytes = 0
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-trace-id", active.trace_id.encode())]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            _current.reset(token)
+            # Name the span after the route template to keep metric labels bounded
+            route = scope.get("route")
+            active.name = f"{scope['method']} {getattr(route, 'path', 'unmatched')}"
+            active.set_attribute("status_code", status_code)
+            if headers.get("content-length", "").isdigit():
+                active.add_payload("request", int(headers["content-length"]))
+            active.add_payload("response", response_bytes)
+            active.end(error or (str(status_code) if status_code >= 500 else None))
+
+
+def install(app) -> None:
+    """Add the tracing middleware plus GET /metrics and GET /traces/{trace_id} to a FastAPI app."""
+    from fastapi import HTTPException
+    from fastapi.responses import PlainTextResponse
+
+    async def metrics():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    async def get_trace(trace_id: str):
+        spans = trace(trace_id)
+        if not spans:
+            raise HTTPException(status_code=404, detail="Trace not found (it may have aged out)")
+        return {"trace_id": trace_id, "spans": spans}
+
+    app.add_middleware(TelemetryMiddleware)
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.add_api_route("/traces/{trace_id}", get_trace, methods=["GET"])
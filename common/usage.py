@@ -0,0 +1,191 @@
+"""
+Per-request token and tool-output accounting
+
+Each agent request runs inside track(endpoint), which holds a RequestUsage
+in a contextvar. The model hooks add prompt/completion tokens and count
+model calls; the tool hooks add the size of every tool result as the model
+receives it (bytes of its text or JSON, plus an estimate of ~4 bytes per
+token). Totals are aggregated per endpoint and per tool, served as JSON by
+GET /usage/stats and as counters on /metrics:
+- llm_calls_total{endpoint}
+- llm_tokens_total{endpoint, type}              type is prompt or completion
+- tool_calls_total{endpoint, tool}
+- tool_result_bytes{endpoint, tool}             histogram
+- tool_result_est_tokens_total{endpoint, tool}
+"""
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from common import telemetry
+
+# Rough size of a token for English text and JSON
+BYTES_PER_TOKEN = 4
+
+_llm_calls = telemetry.Counter("llm_calls_total", "Model calls", ("endpoint",))
+_llm_tokens = telemetry.Counter("llm_tokens_total", "Model tokens", ("endpoint", "type"))
+_tool_calls = telemetry.Counter("tool_calls_total", "Tool calls", ("endpoint", "tool"))
+_tool_bytes = telemetry.Histogram(
+    "tool_result_bytes", "Size of tool results passed to the model", ("endpoint", "tool"), telemetry.SIZE_BUCKETS
+)
+_tool_tokens = telemetry.Counter(
+    "tool_result_est_tokens_total", "Estimated tokens of tool results passed to the model", ("endpoint", "tool")
+)
+telemetry.METRICS.extend([_llm_calls, _llm_tokens, _tool_calls, _tool_bytes, _tool_tokens])
+
+
+def result_size(result: Any) -> int:
+    """Bytes of a tool result as text (strings as-is, anything else as JSON)."""
+    if result is None:
+        return 0
+    if not isinstance(result, str):
+        result = json.dumps(result, default=str)
+    return len(result.encode("utf-8"))
+
+
+def estimate_tokens(size: int) -> int:
+    return -(-size // BYTES_PER_TOKEN)
+
+
+class RequestUsage:
+    """Model and tool usage of one request."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.tools: Dict[str, Dict[str, int]] = {}
+
+    def add_llm(self, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+        prompt_tokens, completion_tokens = prompt_tokens or 0, completion_tokens or 0
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        _llm_calls.inc(self.endpoint)
+        _llm_tokens.inc(self.endpoint, "prompt", amount=prompt_tokens)
+        _llm_tokens.inc(self.endpoint, "completion", amount=completion_tokens)
+        aggregate.add_llm(self.endpoint, prompt_tokens, completion_tokens)
+
+    def add_tool(self, name: str, result: Any) -> int:
+        size = result_size(result)
+        tokens = estimate_tokens(size)
+        tool = self.tools.setdefault(name, {"calls": 0, "bytes": 0, "est_tokens": 0, "max_bytes": 0})
+        tool["calls"] += 1
+        tool["bytes"] += size
+        tool["est_tokens"] += tokens
+        tool["max_bytes"] = max(tool["max_bytes"], size)
+        _tool_calls.inc(self.endpoint, name)
+        _tool_bytes.observe(size, self.endpoint, name)
+        _tool_tokens.inc(self.endpoint, name, amount=tokens)
+        aggregate.add_tool(self.endpoint, name, size, tokens)
+        return size
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "tool_result_bytes": sum(tool["bytes"] for tool in self.tools.values()),
+            "tool_result_est_tokens": sum(tool["est_tokens"] for tool in self.tools.values()),
+            "tools": self.tools,
+        }
+
+
+class UsageAggregate:
+    """Running totals per endpoint and per (endpoint, tool)."""
+
+    def __init__(self):
+        self._endpoints: Dict[str, Dict[str, int]] = {}
+        self._tools: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, endpoint: str) -> Dict[str, int]:
+        return self._endpoints.setdefault(endpoint, {
+            "requests": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "tool_calls": 0, "tool_result_bytes": 0,
+        })
+
+    def add_request(self, endpoint: str) -> None:
+        with self._lock:
+            self._endpoint(endpoint)["requests"] += 1
+
+    def add_llm(self, endpoint: str, prompt_tokens: int, completion_tokens: int) -> None:
+        with self._lock:
+            totals = self._endpoint(endpoint)
+            totals["llm_calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+
+    def add_tool(self, endpoint: str, name: str, size: int, tokens: int) -> None:
+        with self._lock:
+            totals = self._endpoint(endpoint)
+            totals["tool_calls"] += 1
+            totals["tool_result_bytes"] += size
+            tool = self._tools.setdefault(endpoint, {}).setdefault(
+                name, {"calls": 0, "bytes": 0, "est_tokens": 0, "max_bytes": 0}
+            )
+            tool["calls"] += 1
+            tool["bytes"] += size
+            tool["est_tokens"] += tokens
+            tool["max_bytes"] = max(tool["max_bytes"], size)
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals and per-request averages per endpoint, tools sorted by result bytes."""
+        with self._lock:
+            result = {}
+            for endpoint, totals in self._endpoints.items():
+                requests = totals["requests"] or 1
+                tools = sorted(self._tools.get(endpoint, {}).items(), key=lambda item: -item[1]["bytes"])
+                result[endpoint] = {
+                    **totals,
+                    "avg_llm_calls": round(totals["llm_calls"] / requests, 2),
+                    "avg_prompt_tokens": round(totals["prompt_tokens"] / requests, 1),
+                    "avg_completion_tokens": round(totals["completion_tokens"] / requests, 1),
+                    "tools": {
+                        name: {**tool, "avg_bytes": round(tool["bytes"] / tool["calls"])}
+                        for name, tool in tools
+                    },
+                }
+            return result
+
+
+aggregate = UsageAggregate()
+
+_current: ContextVar[Optional[RequestUsage]] = ContextVar("request_usage", default=None)
+
+
+@contextmanager
+def track(endpoint: str) -> Iterator[RequestUsage]:
+    """Account model and tool usage inside the block to a new RequestUsage."""
+    request_usage = RequestUsage(endpoint)
+    aggregate.add_request(endpoint)
+    token = _current.set(request_usage)
+    try:
+        yield request_usage
+    finally:
+        try:
+            _current.reset(token)
+        except ValueError:  # a streaming generator closed from another context
+            pass
+
+
+def current() -> Optional[RequestUsage]:
+    return _current.get()
+
+
+def record_llm(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """Count one model call for the current request (no-op outside track())."""
+    request_usage = _current.get()
+    if request_usage is not None:
+        request_usage.add_llm(prompt_tokens, completion_tokens)
+
+
+def record_tool(name: str, result: Any) -> None:
+    """Count one tool result for the current request (no-op outside track())."""
+    request_usage = _current.get()
+    if request_usage is not None:
+        request_usage.add_tool(name, result)
@@ -1,37 +1,178 @@
 """
 Simple sales agent with LlamaIndex and Gemini
 - Connects to Toolbox (SQLite) via MCP using toolbox-llamaindex minimal client
+
+pandas, LlamaIndex, Gemini and Toolbox are imported on first use, so
+importing this module (e.g. for the tool functions) stays cheap.
 """
-import pandas as pd
 import os
+import sys
 import asyncio
-from llama_index.core import Settings
-from llama_index.llms.google_genai import GoogleGenAI
-from llama_index.core.agent.workflow import AgentWorkflow
-# Toolbox MCP client (minimal usage per toolbox-llamaindex docs)
-try:
-    from toolbox_llamaindex import ToolboxClient  # https://github.com/googleapis/mcp-toolbox-sdk-python/tree/main/packages/toolbox-llamaindex#installation
-except Exception:  # library not installed yet
-    ToolboxClient = None
+import sqlite3
+from typing import Optional
+
+# Add the parent directory to Python path (for the shared common package)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import telemetry
+from common.data_watch import path_signature
+
+def load_agent_framework():
+    """Import the agent framework on first use.
+
+    Returns:
+        (GoogleGenAI, Settings, AgentWorkflow, ToolboxClient); ToolboxClient
+        is None when toolbox-llamaindex is not installed
+    """
+    from llama_index.core import Settings
+    from llama_index.llms.google_genai import GoogleGenAI
+    from llama_index.core.agent.workflow import AgentWorkflow
+    # Toolbox MCP client (minimal usage per toolbox-llamaindex docs)
+    try:
+        from toolbox_llamaindex import ToolboxClient  # https://github.com/googleapis/mcp-toolbox-sdk-python/tree/main/packages/toolbox-llamaindex#installation
+    except Exception:  # library not installed yet
+        ToolboxClient = None
+    return GoogleGenAI, Settings, AgentWorkflow, ToolboxClient
+
+def _pricing():
+    try:
+        from sales_agent import pricing
+    except ImportError:  # running agent.py directly from the sales_agent directory
+        import pricing
+    return pricing
 
 PORT = os.getenv("MCP_PORT", "5000")
 
-# Function tools for CSV data loading
-def load_discount_data():
-    """Load discount.csv data and return summary information."""
-    agent_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(agent_dir, 'data', 'discount.csv')
-    df = pd.read_csv(csv_path)
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+CUSTOMER_DB_PATH = os.getenv(
+    "CUSTOMER_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'customer.sqlite'),
+)
+
+# Parsed tables keyed by path: (file signature, DataFrame). The data watcher
+# calls the loaders when a file changes, so the new table is parsed off the
+# request path and replaces the old one in a single assignment.
+_table_cache = {}
+
+def load_table(filename):
+    """Return a parsed CSV from the data directory, re-reading it only when the file changes."""
+    csv_path = os.path.join(DATA_DIR, filename)
+    signature = path_signature(csv_path)
+    cached = _table_cache.get(csv_path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    import pandas as pd
+    with telemetry.span("data", filename):
+        df = pd.read_csv(csv_path)
+    _table_cache[csv_path] = (signature, df)
+    return df
+
+def load_customer_table():
+    """Return the customer table from customer.sqlite, re-reading it only when the file (or its WAL) changes."""
+    signature = path_signature(CUSTOMER_DB_PATH)
+    cached = _table_cache.get(CUSTOMER_DB_PATH)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+    import pandas as pd
+    conn = sqlite3.connect(f"file:{CUSTOMER_DB_PATH}?mode=ro", uri=True)
+    try:
+        with telemetry.span("data", "customer.sqlite"):
+            df = pd.read_sql_query("SELECT * FROM customer", conn)
+    finally:
+        conn.close()
+    _table_cache[CUSTOMER_DB_PATH] = (signature, df)
+    return df
+
+def _filter_tiers(df, tier=None, annual_volume=None):
+    if tier:
+        df = df[df['Tier'].str.casefold() == tier.strip().casefold()]
+    if annual_volume is not None:
+        df = df[df['Min_Volume'] <= annual_volume]
+    return df
+
+# Function tools for CSV data loading (each call is traced as a tool span)
+@telemetry.traced("tool")
+def load_discount_data(
+    tier: Optional[str] = None,
+    service_type: Optional[str] = None,
+    annual_volume: Optional[float] = None,
+):
+    """Load discount tiers from discount.csv, optionally filtered.
+
+    Args:
+        tier: Only return this tier (e.g. "Gold", "Silver", "Bronze")
+        service_type: Only return this service (e.g. "Ground", "2nd Day Air", "Next Day Air", "International")
+        annual_volume: Only return tiers whose Min_Volume this annual volume reaches
+    """
+    df = _filter_tiers(load_table('discount.csv'), tier, annual_volume)
+    if service_type:
+        df = df[df['Service_Type'].str.casefold() == service_type.strip().casefold()]
     return {"status": "success", "message": f"Loaded {len(df)} discount tiers", "data": df.to_dict('records')}
 
-def load_rebate_data():
-    """Load rebate.csv data and return summary information."""
-    agent_dir = os.path.dirname(os.path.abspath(__file__))
-    csv_path = os.path.join(agent_dir, 'data', 'rebate.csv')
-    df = pd.read_csv(csv_path)
+@telemetry.traced("tool")
+def load_rebate_data(
+    tier: Optional[str] = None,
+    annual_volume: Optional[float] = None,
+):
+    """Load rebate tiers from rebate.csv, optionally filtered.
+
+    Args:
+        tier: Only return this tier (e.g. "Gold", "Silver", "Bronze")
+        annual_volume: Only return tiers whose Min_Volume this annual volume reaches
+    """
+    df = _filter_tiers(load_table('rebate.csv'), tier, annual_volume)
     return {"status": "success", "message": f"Loaded {len(df)} rebate tiers", "data": df.to_dict('records')}
 
+@telemetry.traced("tool")
+def calculate_pricing(
+    customer_id: Optional[int] = None,
+    company_name: Optional[str] = None,
+    annual_volume: Optional[float] = None,
+    limit: int = 50,
+):
+    """Calculate the exact tier, per-service discount rates and capped rebate.
+
+    Price existing customers by customer_id or company_name (their contract
+    Discount_Structure / Rebate_Structure terms apply), quote a hypothetical
+    annual_volume on its own, or pass no arguments to price every customer.
+
+    Args:
+        customer_id: Price this customer
+        company_name: Price customers whose name contains this text
+        annual_volume: Volume to price; with a customer it replaces their Annual_Volume (what-if)
+        limit: Maximum number of priced rows to return
+    """
+    import pandas as pd
+    pricing = _pricing()
+    discounts = load_table('discount.csv')
+    rebates = load_table('rebate.csv')
+    if annual_volume is not None and customer_id is None and not company_name:
+        customers = pd.DataFrame({'Annual_Volume': [annual_volume]})
+    else:
+        customers = load_customer_table()
+        if customer_id is not None:
+            customers = customers[customers['Customer_ID'] == customer_id]
+        if company_name:
+            customers = customers[customers['Company_Name'].str.contains(
+                company_name.strip(), case=False, regex=False, na=False
+            )]
+        if annual_volume is not None:
+            customers = customers.assign(Annual_Volume=annual_volume)
+
+    priced = pricing.price_customers(customers, discounts, rebates)
+    total = len(priced)
+    if limit:
+        priced = priced.head(limit)
+    return {
+        "status": "success",
+        "message": f"Priced {total} customers",
+        "count": total,
+        "data": pricing.to_records(priced),
+    }
+
 async def main():
+    GoogleGenAI, Settings, AgentWorkflow, ToolboxClient = load_agent_framework()
+
     # Connect to Toolbox over MCP (no custom DB tools needed)
     if ToolboxClient is None:
         print("❌ toolbox-llamaindex is not installed. Run: pip install toolbox-llamaindex")
@@ -40,7 +181,7 @@ async def main():
     with ToolboxClient(f"http://127.0.0.1:{PORT}") as toolbox:
         tools = toolbox.load_toolset()
         # Combine CSV tools + Toolbox tool
-        all_tools = tools + [load_discount_data, load_rebate_data]
+        all_tools = tools + [load_discount_data, load_rebate_data, calculate_pricing]
 
         # Configure Gemini (require GOOGLE_API_KEY from environment; no hardcoded default)
         api_key = os.getenv("GOOGLE_API_KEY")
@@ -58,8 +199,9 @@ async def main():
             system_prompt="""You are a helpful sales assistant with access to customer database and sales data.
             You can:
             - Retrieve customer information from the DB
-            - Load discount and rebate CSV data
+            - Load discount and rebate CSV data (pass tier, service_type or annual_volume filters to fetch only the rows you need)
             - Combine them to provide insights to sales queries.
+            - Use calculate_pricing for any discount, rebate or tier calculation instead of doing the arithmetic yourself.
             
             IMPORTANT: When a user asks for customer information, details, or info about a company:
             - Use the get-customer-info tool to get FULL customer information (Customer_ID, Company_Name, Annual_Volume, Discount_Structure, Rebate_Structure)
@@ -1,26 +1,278 @@
 import sqlite3
 import pandas as pd
-import os
+import argparse
+import re
+import sys
+import time
+from functools import lru_cache
+
+try:
+    import resource  # peak RSS reporting (not available on Windows)
+except ImportError:
+    resource = None
 
 # Path to your CSV
 csv_path = "customer.csv"
 # Target database file (will be created automatically)
 db_path = "customer.sqlite"
+# Rows read from the CSV and written per transaction
+CHUNK_SIZE = 50_000
+
+# Base tables; {suffix} is "_staging" while a full reload is being built
+TABLE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customer{suffix} (
+    Customer_ID INTEGER PRIMARY KEY,
+    Company_Name TEXT NOT NULL,
+    Annual_Volume REAL,
+    Discount_Structure TEXT,
+    Rebate_Structure TEXT
+);
+
+-- Per-service discount rates parsed from Discount_Structure
+CREATE TABLE IF NOT EXISTS customer_discount{suffix} (
+    Customer_ID INTEGER NOT NULL REFERENCES customer (Customer_ID) ON DELETE CASCADE,
+    Service_Type TEXT NOT NULL,
+    Discount_Rate REAL NOT NULL,
+    PRIMARY KEY (Customer_ID, Service_Type)
+) WITHOUT ROWID;
+
+-- Rebate thresholds parsed from Rebate_Structure
+CREATE TABLE IF NOT EXISTS customer_rebate{suffix} (
+    Customer_ID INTEGER NOT NULL REFERENCES customer (Customer_ID) ON DELETE CASCADE,
+    Min_Spend REAL NOT NULL,
+    Rebate_Percentage REAL NOT NULL,
+    PRIMARY KEY (Customer_ID, Min_Spend)
+) WITHOUT ROWID;
+"""
+
+# Secondary indexes and the full-text index, created on the live tables
+INDEX_SCHEMA = """
+CREATE INDEX IF NOT EXISTS idx_customer_company_name ON customer (Company_Name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_customer_annual_volume ON customer (Annual_Volume);
+CREATE INDEX IF NOT EXISTS idx_customer_discount_service ON customer_discount (Service_Type, Discount_Rate);
+
+-- Trigram full-text index on Company_Name; serves substring (LIKE '%x%') lookups
+CREATE VIRTUAL TABLE IF NOT EXISTS customer_fts USING fts5 (
+    Company_Name,
+    content = 'customer',
+    content_rowid = 'Customer_ID',
+    tokenize = 'trigram'
+);
+CREATE TRIGGER IF NOT EXISTS customer_fts_insert AFTER INSERT ON customer BEGIN
+    INSERT INTO customer_fts (rowid, Company_Name) VALUES (new.Customer_ID, new.Company_Name);
+END;
+CREATE TRIGGER IF NOT EXISTS customer_fts_delete AFTER DELETE ON customer BEGIN
+    INSERT INTO customer_fts (customer_fts, rowid, Company_Name) VALUES ('delete', old.Customer_ID, old.Company_Name);
+END;
+CREATE TRIGGER IF NOT EXISTS customer_fts_update AFTER UPDATE OF Company_Name ON customer BEGIN
+    INSERT INTO customer_fts (customer_fts, rowid, Company_Name) VALUES ('delete', old.Customer_ID, old.Company_Name);
+    INSERT INTO customer_fts (rowid, Company_Name) VALUES (new.Customer_ID, new.Company_Name);
+END;
+"""
+
+TABLES = ["customer_discount", "customer_rebate", "customer"]
+
+# "$104,500", "$100K", "$1.5M"
+MONEY_RE = re.compile(r"\$?\s*(\d+(?:,\d{3})*(?:\.\d+)?)\s*([KkMm]?)")
+# "Ground: 40% off published rates, 2nd Day Air: 45% off, ..."
+DISCOUNT_RE = re.compile(r"([A-Za-z0-9][A-Za-z0-9 ]*?)\s*:\s*(\d+(?:\.\d+)?)\s*%")
+# "2% of total annual spend if they hit $100K, 3% if they hit $150K"
+REBATE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*%[^,$]*?(\$\s*\d+(?:,\d{3})*(?:\.\d+)?\s*[KkMm]?)")
+MULTIPLIER = {"": 1, "k": 1_000, "m": 1_000_000}
+
+
+def parse_money(value):
+    """Parse an amount such as "$104,500" or "$100K" into a float (None if not parseable)."""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = MONEY_RE.search(str(value))
+    if not match:
+        return None
+    return float(match.group(1).replace(",", "")) * MULTIPLIER[match.group(2).lower()]
+
+
+def parse_volumes(values):
+    """Vectorized parse_money for a whole column; returns a float Series."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    parts = values.astype(str).str.extract(MONEY_RE)
+    amount = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+    return amount * parts[1].str.lower().map(MULTIPLIER).astype(float)
+
+
+# Structure strings repeat across customers, so parsed results are memoized
+@lru_cache(maxsize=65536)
+def parse_discount_structure(text):
+    """Return ((service_type, discount_rate), ...) from a Discount_Structure string."""
+    if not isinstance(text, str):
+        return ()
+    return tuple((service.strip(), float(rate)) for service, rate in DISCOUNT_RE.findall(text))
+
+
+@lru_cache(maxsize=65536)
+def parse_rebate_structure(text):
+    """Return ((min_spend, rebate_percentage), ...) from a Rebate_Structure string."""
+    if not isinstance(text, str):
+        return ()
+    return tuple((parse_money(amount), float(rate)) for rate, amount in REBATE_RE.findall(text))
+
+
+def _text_or_none(values):
+    return [value if isinstance(value, str) else None for value in values]
+
+
+def connect(db_path):
+    """Open the database in WAL mode so readers keep working during a load."""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-65536")
+    return conn
+
+
+def insert_customers(conn, df, suffix="", upsert=False):
+    """Insert (or upsert) normalized customer rows plus their parsed discount/rebate child rows."""
+    ids = df["Customer_ID"].astype(int).tolist()
+    volumes = parse_volumes(df["Annual_Volume"])
+    discount_texts = _text_or_none(df["Discount_Structure"])
+    rebate_texts = _text_or_none(df["Rebate_Structure"])
+    customers = list(zip(
+        ids,
+        df["Company_Name"].astype(str).tolist(),
+        volumes.astype(object).where(volumes.notna(), None).tolist(),
+        discount_texts,
+        rebate_texts,
+    ))
+    discounts, rebates = [], []
+    for customer_id, discount_text, rebate_text in zip(ids, discount_texts, rebate_texts):
+        discounts.extend((customer_id, service, rate) for service, rate in parse_discount_structure(discount_text))
+        rebates.extend((customer_id, spend, rate) for spend, rate in parse_rebate_structure(rebate_text))
+
+    if upsert:
+        conn.executemany(
+            """INSERT INTO customer VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (Customer_ID) DO UPDATE SET
+                   Company_Name = excluded.Company_Name,
+                   Annual_Volume = excluded.Annual_Volume,
+                   Discount_Structure = excluded.Discount_Structure,
+                   Rebate_Structure = excluded.Rebate_Structure""",
+            customers,
+        )
+        id_rows = [(customer_id,) for customer_id in ids]
+        conn.executemany("DELETE FROM customer_discount WHERE Customer_ID = ?", id_rows)
+        conn.executemany("DELETE FROM customer_rebate WHERE Customer_ID = ?", id_rows)
+    else:
+        conn.executemany(f"INSERT INTO customer{suffix} VALUES (?, ?, ?, ?, ?)", customers)
+    conn.executemany(f"INSERT OR REPLACE INTO customer_discount{suffix} VALUES (?, ?, ?)", discounts)
+    conn.executemany(f"INSERT OR REPLACE INTO customer_rebate{suffix} VALUES (?, ?, ?)", rebates)
+    return len(customers), len(discounts), len(rebates)
+
+
+def swap_in_staging(conn):
+    """Replace the live tables with the staging tables in one transaction."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE IF EXISTS customer_fts")
+        for table in TABLES:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
+        for table in TABLES:
+            conn.execute(f"ALTER TABLE {table}_staging RENAME TO {table}")
+        for statement in split_statements(INDEX_SCHEMA):
+            conn.execute(statement)
+        conn.execute("INSERT INTO customer_fts (customer_fts) VALUES ('rebuild')")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def split_statements(script):
+    """Split a schema script into statements (keeps trigger bodies intact)."""
+    statements, buffer = [], ""
+    for line in script.splitlines(keepends=True):
+        if line.strip().startswith("--"):
+            continue
+        buffer += line
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    return statements
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None if unavailable)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def csv_to_sqlite(csv_path, db_path, mode="replace", chunk_size=CHUNK_SIZE):
+    """
+    Stream customer.csv into SQLite in chunks.
+
+    mode="replace" loads into staging tables and swaps them in atomically at
+    the end, so readers never see a half-loaded table. mode="upsert" inserts
+    or updates rows by Customer_ID in place and leaves other rows untouched.
+    """
+    started = time.perf_counter()
+    conn = connect(db_path)
+    suffix = "_staging" if mode == "replace" else ""
+    totals = [0, 0, 0]
+    try:
+        if mode == "replace":
+            for table in TABLES:
+                conn.execute(f"DROP TABLE IF EXISTS {table}_staging")
+        for statement in split_statements(TABLE_SCHEMA.format(suffix=suffix)):
+            conn.execute(statement)
+        if mode == "upsert":
+            for statement in split_statements(INDEX_SCHEMA):
+                conn.execute(statement)
+
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            conn.execute("BEGIN")
+            try:
+                counts = insert_customers(conn, chunk, suffix=suffix, upsert=(mode == "upsert"))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            totals = [total + count for total, count in zip(totals, counts)]
+            elapsed = time.perf_counter() - started
+            print(f"   … {totals[0]:,} rows ({totals[0] / elapsed:,.0f} rows/s)")
+
+        if mode == "replace":
+            swap_in_staging(conn)
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
 
-def csv_to_sqlite(csv_path, db_path):
-    # Load CSV into pandas DataFrame
-    df = pd.read_csv(csv_path)
-    
-    # Create SQLite connection
-    conn = sqlite3.connect(db_path)
-    # Save to table called "customer"
-    df.to_sql("customer", conn, if_exists="replace", index=False)
-    conn.commit()
-    conn.close()
-    print(f"✅ Created SQLite database at: {db_path}")
-    print(f"✅ Table 'customer' created with {len(df)} records.")
+    elapsed = time.perf_counter() - started
+    customers, discounts, rebates = totals
+    peak = peak_rss_mb()
+    print(f"✅ {'Loaded' if mode == 'replace' else 'Upserted'} SQLite database at: {db_path}")
+    print(f"✅ Table 'customer' now has {customers} new or updated records "
+          f"({discounts} discount rates, {rebates} rebate thresholds).")
+    print(f"⏱️  {elapsed:.2f}s, {customers / elapsed if elapsed else 0:,.0f} rows/s, "
+          f"peak RSS {f'{peak:.1f} MB' if peak is not None else 'n/a'}")
+    return {
+        "rows": customers,
+        "seconds": elapsed,
+        "rows_per_second": customers / elapsed if elapsed else 0.0,
+        "peak_rss_mb": peak,
+    }
 
 if __name__ == "__main__":
-    if not os.path.exists("database"):
-        os.makedirs("database")
-    csv_to_sqlite(csv_path, db_path)
+    parser = argparse.ArgumentParser(description="Load customer.csv into customer.sqlite")
+    parser.add_argument("--csv", default=csv_path, help="Source CSV file")
+    parser.add_argument("--db", default=db_path, help="Target SQLite database")
+    parser.add_argument("--mode", choices=["replace", "upsert"], default="replace",
+                        help="replace: full reload with atomic swap; upsert: insert/update by Customer_ID")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per chunk/transaction")
+    args = parser.parse_args()
+    csv_to_sqlite(args.csv, args.db, mode=args.mode, chunk_size=args.chunk_size)
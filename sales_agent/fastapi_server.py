@@ -1,6 +1,9 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Tuple
 import uvicorn
 import logging
 import asyncio
@@ -17,77 +20,271 @@ sys.path.append(str(project_root))
 from sales_agent.agent import (
     load_discount_data, 
     load_rebate_data,
-    ToolboxClient,
-    GoogleGenAI,
-    Settings,
-    AgentWorkflow,
+    calculate_pricing,
+    load_table,
+    load_customer_table,
+    load_agent_framework,
+    CUSTOMER_DB_PATH,
+    DATA_DIR,
     PORT
 )
+from sales_agent.router import IntentRouter
+from common.query_cache import BYPASS, QueryCache
+from common.admission import AdmissionController, AdmissionRejected
+from common.batch import BATCH_MAX_ITEMS, ndjson, run_batch
+from common import data_watch, telemetry, usage
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI()
-
-# Enable CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Toolbox MCP server and how long to wait for it at startup
+TOOLBOX_URL = os.getenv("TOOLBOX_URL", f"http://127.0.0.1:{PORT}")
+TOOLBOX_CONNECT_ATTEMPTS = int(os.getenv("TOOLBOX_CONNECT_ATTEMPTS", "10"))
+TOOLBOX_RETRY_DELAY = float(os.getenv("TOOLBOX_RETRY_DELAY", "0.5"))
 
 class QueryRequest(BaseModel):
     query: str
+    # Return token and tool-output accounting for this request
+    include_usage: bool = False
+
+class BatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=BATCH_MAX_ITEMS)
+    # Queries run in parallel (capped at BATCH_MAX_CONCURRENCY)
+    concurrency: Optional[int] = Field(default=None, ge=1)
+    include_usage: bool = False
+
+class PricingRequest(BaseModel):
+    customer_id: Optional[int] = None
+    company_name: Optional[str] = None
+    annual_volume: Optional[float] = None
+    limit: Optional[int] = None
 
-# Global agent instance
-agent = None
+# Opt-in response cache (QUERY_CACHE_ENABLED); dropped when the data behind the answers is reloaded
+query_cache = QueryCache(invalidate_on=["discount", "rebate", "customers"])
+
+# Answers structured queries (customer lists/lookups, tier tables) without the LLM (INTENT_ROUTER_ENABLED)
+router = IntentRouter(CUSTOMER_DB_PATH)
+
+# Bounds concurrent agent runs (ADMISSION_* / REQUEST_DEADLINE); cache hits skip it
+admission = AdmissionController()
+
+async def run_query(agent, query: str) -> str:
+    """Run the agent on a query and return the response text, counting tool result sizes."""
+    from llama_index.core.agent.workflow import ToolCallResult
+
+    handler = agent.run(query)
+    async for event in handler.stream_events():
+        if isinstance(event, ToolCallResult):
+            usage.record_tool(event.tool_name, event.tool_output.content)
+    response = await handler
+    if hasattr(response, 'response'):
+        return str(response.response)
+    return str(response)
+
+SYSTEM_PROMPT = """You are a helpful sales assistant with access to customer database and sales data.
+            You can:
+            - Retrieve customer information from the DB
+            - Load discount and rebate CSV data (pass tier, service_type or annual_volume filters to fetch only the rows you need)
+            - Combine them to provide insights to sales queries.
+            - Use calculate_pricing for any discount, rebate or tier calculation instead of doing the arithmetic yourself."""
+
+async def load_toolbox_tools(toolbox) -> list:
+    """Load the Toolbox toolset, retrying with backoff while the Toolbox server starts."""
+    delay = TOOLBOX_RETRY_DELAY
+    for attempt in range(1, TOOLBOX_CONNECT_ATTEMPTS + 1):
+        try:
+            return await toolbox.aload_toolset()
+        except Exception as e:
+            if attempt == TOOLBOX_CONNECT_ATTEMPTS:
+                raise
+            logger.warning(
+                f"Toolbox not reachable at {TOOLBOX_URL} (attempt {attempt}/{TOOLBOX_CONNECT_ATTEMPTS}): {e}; "
+                f"retrying in {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10.0)
 
-def initialize_agent():
-    """Initialize the agent with proper error handling"""
-    global agent
+def trace_toolbox_tools(tools: list) -> list:
+    """Run each Toolbox tool call (a SQL statement on the Toolbox server) inside a tool span."""
+    for tool in tools:
+        object.__setattr__(tool, "acall", telemetry.traced("tool", tool.metadata.name)(tool.acall))
+    return tools
+
+_llm_tracing_installed = False
+
+def trace_llm_calls():
+    """Record an llm span (and token usage) for every LlamaIndex chat call, from its start event to its end event."""
+    global _llm_tracing_installed
+    if _llm_tracing_installed:
+        return
+    from llama_index.core.instrumentation import get_dispatcher
+    from llama_index.core.instrumentation.event_handlers import BaseEventHandler
+    from llama_index.core.instrumentation.events.llm import LLMChatEndEvent, LLMChatStartEvent
+    from llama_index.core.instrumentation.events.exception import ExceptionEvent
+
+    # Open llm spans keyed by the LlamaIndex span id of the chat call
+    open_spans = {}
+
+    class LlmSpanHandler(BaseEventHandler):
+        @classmethod
+        def class_name(cls) -> str:
+            return "LlmSpanHandler"
+
+        def handle(self, event, **kwargs):
+            if isinstance(event, LLMChatStartEvent):
+                model = event.model_dict.get("model") or event.model_dict.get("class_name", "unknown")
+                open_spans[event.span_id] = telemetry.start_span("llm", model)
+            elif isinstance(event, (LLMChatEndEvent, ExceptionEvent)):
+                span = open_spans.pop(event.span_id, None)
+                if span is not None:
+                    span.end(type(event.exception).__name__ if isinstance(event, ExceptionEvent) else None)
+                if isinstance(event, LLMChatEndEvent):
+                    # Gemini reports usage in the response's additional_kwargs
+                    counts = event.response.additional_kwargs if event.response is not None else {}
+                    usage.record_llm(counts.get("prompt_tokens"), counts.get("completion_tokens"))
+
+    get_dispatcher().add_event_handler(LlmSpanHandler())
+    _llm_tracing_installed = True
+
+def watch_data_sources():
+    """Re-parse the CSV tables and the customer table in the background when their files change."""
+    data_watch.watcher.watch("discount", [os.path.join(DATA_DIR, "discount.csv")], lambda: load_table("discount.csv"))
+    data_watch.watcher.watch("rebate", [os.path.join(DATA_DIR, "rebate.csv")], lambda: load_table("rebate.csv"))
+    data_watch.watcher.watch("customers", [CUSTOMER_DB_PATH], load_customer_table)
+    data_watch.watcher.start()
+
+def warm_data_tables():
+    """Parse the CSV tables and the customer table once so the first query does not pay for it."""
+    load_table("discount.csv")
+    load_table("rebate.csv")
+    load_customer_table()
+
+async def initialize_agent(app: FastAPI):
+    """Build the agent and store it (and the Toolbox client) on app.state."""
     try:
         # Initialize LLM
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not set")
+
+        # Imported here rather than at module load so the process starts serving quickly
+        GoogleGenAI, Settings, AgentWorkflow, ToolboxClient = await asyncio.to_thread(load_agent_framework)
+        if ToolboxClient is None:
+            raise ImportError("toolbox-llamaindex is not installed. Run: pip install toolbox-llamaindex")
         
         llm = GoogleGenAI(model="gemini-2.5-flash", api_key=api_key)
         Settings.llm = llm
+        trace_llm_calls()
 
-        # Initialize Toolbox
-        toolbox = ToolboxClient(f"http://127.0.0.1:{PORT}")
-        tools = toolbox.load_toolset()
+        # Load the Toolbox tools while the local tables are parsed
+        app.state.toolbox = ToolboxClient(TOOLBOX_URL)
+        tools, _ = await asyncio.gather(
+            load_toolbox_tools(app.state.toolbox),
+            asyncio.to_thread(warm_data_tables),
+        )
         
         # Add CSV tools
-        all_tools = tools + [load_discount_data, load_rebate_data]
+        all_tools = trace_toolbox_tools(tools) + [load_discount_data, load_rebate_data, calculate_pricing]
         
         # Create agent
-        agent = AgentWorkflow.from_tools_or_functions(
+        app.state.agent = AgentWorkflow.from_tools_or_functions(
             tools_or_functions=all_tools,
             llm=llm,
             verbose=True,
-            system_prompt="""You are a helpful sales assistant with access to customer database and sales data.
-            You can:
-            - Retrieve customer information from the DB
-            - Load discount and rebate CSV data
-            - Combine them to provide insights to sales queries."""
+            system_prompt=SYSTEM_PROMPT
         )
-        logger.info("Agent initialized successfully")
-        return agent
+        logger.info(f"Agent initialized successfully (pid {os.getpid()})")
+    except asyncio.CancelledError:
+        raise
     except Exception as e:
+        app.state.init_error = str(e)
         logger.error(f"Failed to initialize agent: {str(e)}")
-        raise
 
-# Initialize agent at startup
-@app.on_event("startup")
-async def startup_event():
+# Per-process startup and shutdown: every uvicorn/gunicorn worker builds its own
+# agent and Toolbox client in the background, so liveness answers immediately and
+# readiness turns green once the agent is usable.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.agent = None
+    app.state.toolbox = None
+    app.state.init_error = None
+    init_task = asyncio.create_task(initialize_agent(app))
+    watch_data_sources()
+    yield
+    data_watch.watcher.stop()
+    init_task.cancel()
     try:
-        initialize_agent()
-    except Exception as e:
-        logger.error(f"Startup error: {str(e)}")
-        raise
+        await init_task
+    except asyncio.CancelledError:
+        pass
+    if app.state.toolbox is not None:
+        await asyncio.to_thread(app.state.toolbox.close)
+        app.state.toolbox = None
+    app.state.agent = None
+    logger.info("Sales Agent application shutting down")
+
+app = FastAPI(lifespan=lifespan)
+
+# Enable CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# Request/LLM/tool/data spans, GET /metrics and GET /traces/{trace_id}
+telemetry.install(app)
+# GET /data/sources: watched data files and their reloads
+data_watch.install(app)
+
+def get_agent(request: Request):
+    """Return the initialized agent, or fail with 503 while it is starting up."""
+    agent = request.app.state.agent
+    if agent is None:
+        if request.app.state.init_error:
+            raise HTTPException(
+                status_code=500,
+                detail="Agent is not properly initialized. Please check server logs."
+            )
+        raise HTTPException(
+            status_code=503,
+            detail="Agent is still starting up. Please retry shortly.",
+            headers={"Retry-After": "1"},
+        )
+    return agent
+
+async def answer_query(query: str, http_request: Request) -> Tuple[str, str, str]:
+    """
+    Answer a query from the intent router, or else the agent (through the query cache and admission).
+
+    Returns:
+        (response text, route: the intent or "agent", cache status)
+    """
+    routed = await asyncio.to_thread(router.route, query)
+    if routed is not None:
+        usage.record_tool(routed.tool, routed.data)
+        return routed.response, routed.intent, BYPASS
+    agent = get_agent(http_request)
+    response_text, cache_status = await query_cache.get_or_compute(
+        query, lambda: admission.run(lambda: run_query(agent, query))
+    )
+    return response_text, "agent", cache_status
+
+@app.get("/health/live")
+async def liveness(request: Request):
+    """Liveness: the process is serving requests and initialization has not failed."""
+    if request.app.state.init_error:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": request.app.state.init_error})
+    return {"status": "alive", "pid": os.getpid()}
+
+@app.get("/health/ready")
+async def readiness(request: Request):
+    """Readiness: the agent and Toolbox tools are loaded."""
+    if request.app.state.agent is None:
+        return JSONResponse(status_code=503, content={"status": "starting", "pid": os.getpid()})
+    return {"status": "ready", "pid": os.getpid()}
 
 @app.get("/")
 async def root():
@@ -95,18 +292,64 @@ async def root():
         "message": "Sales Agent API is running. Use /query endpoint to interact with the agent.",
         "endpoints": {
             "POST /query": "Send a query to the agent",
+            "POST /query/batch": "Send many queries; results stream back as NDJSON in completion order",
+            "POST /pricing": "Calculate tier, discounts and capped rebate for customers or a volume",
+            "GET /cache/stats": "Query cache counters",
+            "GET /router/stats": "Queries answered by the intent router, per intent, and agent fallbacks",
+            "GET /admission/stats": "Concurrency limit, queue depth and wait times",
+            "GET /usage/stats": "Token and tool-result size totals per endpoint and tool",
+            "GET /data/sources": "Watched data files and their hot reloads",
+            "GET /metrics": "Prometheus metrics (latency histograms, errors, payload sizes)",
+            "GET /traces/{trace_id}": "Recent spans of a trace (see the X-Trace-Id response header)",
+            "GET /health/live": "Liveness probe",
+            "GET /health/ready": "Readiness probe (agent initialized)",
             "GET /docs": "Interactive API documentation"
         }
     }
 
-@app.post("/query")
-async def handle_query(request: QueryRequest):
-    if agent is None:
+@app.get("/cache/stats")
+async def cache_stats():
+    """Expose query cache counters for tuning."""
+    return {"query_cache": query_cache.stats()}
+
+@app.get("/router/stats")
+async def router_stats():
+    """Expose how many queries the intent router answered without the agent."""
+    return router.stats()
+
+@app.get("/admission/stats")
+async def admission_stats():
+    """Expose admission control counters and queue wait times."""
+    return admission.stats()
+
+@app.get("/usage/stats")
+async def usage_stats():
+    """Expose token and tool-result size totals per endpoint and tool."""
+    return usage.aggregate.stats()
+
+@app.post("/pricing")
+async def handle_pricing(request: PricingRequest):
+    """Calculate pricing without going through the LLM."""
+    try:
+        result = await asyncio.to_thread(
+            calculate_pricing,
+            customer_id=request.customer_id,
+            company_name=request.company_name,
+            annual_volume=request.annual_volume,
+            limit=request.limit,
+        )
+    except Exception as e:
+        logger.error(f"Error calculating pricing: {str(e)}")
         raise HTTPException(
             status_code=500,
-            detail="Agent is not properly initialized. Please check server logs."
+            detail=f"Error calculating pricing: {str(e)}"
         )
-    
+    if result["count"] == 0:
+        raise HTTPException(status_code=404, detail="No matching customer found")
+    return result
+
+@app.post("/query")
+async def handle_query(request: QueryRequest, response: Response, http_request: Request):
     try:
         if not request.query.strip():
             raise HTTPException(
@@ -116,18 +359,23 @@ async def handle_query(request: QueryRequest):
             
         logger.info(f"Processing query: {request.query}")
         
-        # Process the query directly with the agent
-        response = await agent.run(request.query)
-        
-        # Handle the response
-        if hasattr(response, 'response'):
-            response_text = str(response.response)
-        else:
-            response_text = str(response)
+        # Process the query with the intent router, the response cache or the agent
+        with usage.track("/query") as request_usage:
+            response_text, route, cache_status = await answer_query(request.query, http_request)
+        response.headers["X-Cache"] = cache_status
+        response.headers["X-Route"] = route
             
-        logger.info("Query processed successfully")
-        return {"response": response_text}
+        logger.info(f"Query processed successfully (route: {route})")
+        result = {"response": response_text, "route": route}
+        if request.include_usage:
+            result["usage"] = request_usage.as_dict()
+        return result
         
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        logger.warning(f"Query rejected: {e.detail}")
+        raise HTTPException(status_code=e.status_code, detail=e.detail, headers=e.headers)
     except Exception as e:
         error_msg = str(e)
         logger.error(f"Error processing query: {error_msg}")
@@ -144,11 +392,42 @@ async def handle_query(request: QueryRequest):
             detail=detail
         )
 
+def batch_error(e: Exception) -> Tuple[int, str]:
+    """Map an exception from one batch query to a status code and detail."""
+    if isinstance(e, (AdmissionRejected, HTTPException)):
+        return e.status_code, e.detail
+    error_msg = str(e)
+    logger.error(f"Error processing batch query: {error_msg}")
+    if "503" in error_msg or "overloaded" in error_msg.lower():
+        return 503, "The AI service is currently overloaded. Please try again later."
+    return 500, f"Error processing your request: {error_msg}"
+
+@app.post("/query/batch")
+async def handle_query_batch(request: BatchRequest, http_request: Request):
+    """Run many queries with bounded parallelism and stream one NDJSON line per query as it completes."""
+    logger.info(f"Processing batch of {len(request.queries)} queries")
+
+    async def answer(query: str) -> Dict[str, Any]:
+        with usage.track("/query/batch") as request_usage:
+            response_text, route, cache_status = await answer_query(query, http_request)
+        result = {"response": response_text, "route": route, "cache": cache_status}
+        if request.include_usage:
+            result["usage"] = request_usage.as_dict()
+        return result
+
+    return StreamingResponse(
+        ndjson(run_batch(request.queries, answer, batch_error, request.concurrency)),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"},
+    )
+
 if __name__ == "__main__":
-    # Start the FastAPI server
+    # Start the FastAPI server; WEB_CONCURRENCY > 1 runs several worker processes
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
     uvicorn.run(
-        "fastapi_server:app",
+        "sales_agent.fastapi_server:app",
         host="0.0.0.0",
-        port=8000,
-        reload=True
+        port=int(os.getenv("SALES_AGENT_PORT", "8000")),
+        workers=workers,
+        reload=workers == 1 and os.getenv("UVICORN_RELOAD", "false").lower() in ("1", "true", "yes"),
     )
\ No newline at end of file
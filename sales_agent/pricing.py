@@ -0,0 +1,145 @@
+"""
+Vectorized pricing engine for discounts and rebates
+
+Computes, for every customer in one pass:
+- the volume tier (highest tier whose Min_Volume the annual volume reaches)
+- the per-service discount rate
+- the applicable rebate percentage and the rebate amount capped at Max_Rebate
+
+Customer-specific terms from the Discount_Structure / Rebate_Structure text
+columns take precedence over the standard tier tables when present.
+"""
+import re
+import numpy as np
+import pandas as pd
+
+# "Ground: 40% off published rates, 2nd Day Air: 45% off, ..."
+_DISCOUNT_PATTERN = r'(?P<service>[A-Za-z0-9][A-Za-z0-9 ]*?)\s*:\s*(?P<rate>\d+(?:\.\d+)?)\s*%'
+# "2% of total annual spend if they hit $100K, 3% if they hit $150K"
+_REBATE_PATTERN = r'(?P<rate>\d+(?:\.\d+)?)\s*%[^,$]*?\$\s*(?P<amount>\d+(?:,\d{3})*(?:\.\d+)?)\s*(?P<unit>[KkMm]?)'
+_UNIT_MULTIPLIER = {'': 1.0, 'k': 1e3, 'm': 1e6}
+
+
+def parse_volume(values):
+    """Convert volumes such as "$104,500" (or plain numbers) to floats."""
+    series = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series):
+        return series.astype(float)
+    cleaned = series.astype(str).str.replace(r'[$,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').astype(float)
+
+
+def service_column(service):
+    """Output column name for a service type, e.g. "2nd Day Air" -> "Discount_2nd_Day_Air"."""
+    return 'Discount_' + re.sub(r'\W+', '_', service.strip()).strip('_')
+
+
+def assign_tiers(volume, discounts):
+    """Return the tier name for each volume (None below the lowest tier)."""
+    thresholds = discounts.groupby('Tier')['Min_Volume'].min().sort_values()
+    position = np.searchsorted(thresholds.to_numpy(dtype=float), volume, side='right') - 1
+    names = thresholds.index.to_numpy(dtype=object)
+    return np.where(position >= 0, names[np.clip(position, 0, None)], None)
+
+
+def _contract_discounts(structures):
+    """Per-service discount rates parsed from Discount_Structure text."""
+    # Structures repeat across customers, so each distinct text is parsed once
+    codes, uniques = pd.factorize(structures.fillna('').astype(str))
+    matches = pd.Series(uniques).str.extractall(_DISCOUNT_PATTERN)
+    if matches.empty:
+        return pd.DataFrame(index=structures.index)
+    matches['rate'] = matches['rate'].astype(float)
+    matches['service'] = matches['service'].map(service_column)
+    matches = matches.reset_index(level='match', drop=True)
+    by_text = matches.pivot_table(index=matches.index, columns='service', values='rate', aggfunc='max')
+    rates = by_text.reindex(codes)
+    rates.index = structures.index
+    return rates
+
+
+def _contract_rebates(structures, volume):
+    """Rebate percentage earned under the Rebate_Structure text (NaN when there is none)."""
+    codes, uniques = pd.factorize(structures.fillna('').astype(str))
+    texts = pd.Series(uniques)
+    has_terms = texts.str.contains('%').to_numpy()[codes]
+    result = pd.Series(np.where(has_terms, 0.0, np.nan), index=structures.index)
+
+    matches = texts.str.extractall(_REBATE_PATTERN)
+    if matches.empty:
+        return result
+    terms = pd.DataFrame({
+        'code': matches.index.get_level_values(0),
+        'threshold': (
+            matches['amount'].str.replace(',', '', regex=False).astype(float)
+            * matches['unit'].str.lower().map(_UNIT_MULTIPLIER)
+        ).to_numpy(),
+        'rate': matches['rate'].astype(float).to_numpy(),
+    })
+    rows = pd.DataFrame({'row': np.arange(len(codes)), 'code': codes, 'volume': volume.to_numpy()})
+    earned = rows.merge(terms, on='code')
+    earned = earned[earned['threshold'] <= earned['volume']]
+    best = earned.groupby('row')['rate'].max()
+    result.iloc[best.index.to_numpy()] = best.to_numpy()
+    return result
+
+
+def price_customers(customers, discounts, rebates, use_contract_terms=True):
+    """
+    Price a whole customer table in one vectorized pass.
+
+    Args:
+        customers: DataFrame with Annual_Volume and optionally Customer_ID,
+            Company_Name, Discount_Structure, Rebate_Structure
+        discounts: discount.csv table (Tier, Min_Volume, Discount_Rate, Service_Type)
+        rebates: rebate.csv table (Tier, Min_Volume, Rebate_Percentage, Max_Rebate)
+        use_contract_terms: Prefer rates parsed from the structure text columns
+
+    Returns:
+        DataFrame with one row per customer: Tier, Discount_<service> columns,
+        Rebate_Percentage, Max_Rebate, Rebate_Amount and Rebate_Capped
+    """
+    customers = customers.reset_index(drop=True)
+    volume = parse_volume(customers['Annual_Volume'])
+
+    result = customers[[c for c in ('Customer_ID', 'Company_Name') if c in customers]].copy()
+    result['Annual_Volume'] = volume
+    result['Tier'] = assign_tiers(volume.to_numpy(dtype=float), discounts)
+
+    # Standard per-service discounts for the assigned tier
+    tier_rates = discounts.pivot_table(
+        index='Tier', columns='Service_Type', values='Discount_Rate', aggfunc='max'
+    )
+    tier_rates.columns = [service_column(c) for c in tier_rates.columns]
+    rates = tier_rates.reindex(result['Tier'].to_numpy()).reset_index(drop=True)
+    if use_contract_terms and 'Discount_Structure' in customers:
+        contract = _contract_discounts(customers['Discount_Structure'])
+        rates = contract.combine_first(rates)
+    result = pd.concat([result, rates], axis=1)
+
+    # Standard rebate row: highest Min_Volume within the tier that the volume reaches
+    ordered = result[['Tier', 'Annual_Volume']].reset_index().dropna()
+    ordered = ordered.astype({'Tier': object}).sort_values('Annual_Volume')
+    rebate_rows = rebates.sort_values('Min_Volume').astype({'Min_Volume': float, 'Tier': object})
+    matched = pd.merge_asof(
+        ordered, rebate_rows, left_on='Annual_Volume', right_on='Min_Volume',
+        by='Tier', direction='backward',
+    ).set_index('index').reindex(result.index)
+
+    percentage = matched['Rebate_Percentage']
+    if use_contract_terms and 'Rebate_Structure' in customers:
+        contract = _contract_rebates(customers['Rebate_Structure'], volume)
+        percentage = contract.combine_first(percentage)
+
+    amount = volume * percentage.fillna(0.0) / 100.0
+    cap = matched['Max_Rebate']
+    result['Rebate_Percentage'] = percentage
+    result['Max_Rebate'] = cap
+    result['Rebate_Amount'] = np.fmin(amount, cap).round(2)
+    result['Rebate_Capped'] = (amount > cap).fillna(False)
+    return result
+
+
+def to_records(df):
+    """DataFrame rows as JSON-friendly dicts (NaN -> None)."""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
@@ -0,0 +1,258 @@
+"""
+Rule-based intent router for the Sales Agent API
+
+Many queries map one-to-one onto a single Toolbox statement or CSV loader.
+The router recognizes these with anchored patterns (the whole query must
+match, so open-ended questions never do) and answers them directly:
+
+    "list all customers"                 -> list-customers
+    "customer info for CompanyABC"       -> get-customer-info
+    "show customer 2"                    -> get-customer-by-id
+    "get customer id for TechCorp"       -> get-customer-id
+    "discount tiers for Gold [on Ground]" -> load_discount_data
+    "rebate tiers [for Silver]"          -> load_rebate_data
+
+The SQL statements are read from the same tools.yaml that Toolbox serves
+and run on a read-only connection to customer.sqlite; the answer is
+templated from the rows. Everything else, and customer lookups that find
+nothing (the agent can still resolve a misspelled name), falls back to the
+agent.
+
+Routed and fallback queries are counted in router_queries_total{route}.
+"""
+import os
+import re
+import sqlite3
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from common import telemetry
+
+INTENT_ROUTER_ENABLED = os.getenv("INTENT_ROUTER_ENABLED", "true").lower() in ("1", "true", "yes")
+TOOLS_FILE = os.getenv(
+    "TOOLS_FILE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "tools.yaml"),
+)
+# Rows listed in a templated answer before it is summarized as "... and N more"
+ROUTER_MAX_ROWS = int(os.getenv("ROUTER_MAX_ROWS", "50"))
+
+_routed = telemetry.Counter("router_queries_total", "Queries by intent router outcome", ("route",))
+telemetry.METRICS.append(_routed)
+
+_VERB = r"(?:(?:list|show|get|give|display|find|fetch|look up|lookup|what is|what are|what's)(?: me)?\s+)?(?:the\s+|our\s+|all\s+)?"
+_RECORD = r"(?:full\s+)?(?:customer\s+)?(?:info|information|details|record|profile|data)"
+_NAME = r"(?P<name>[\w&.,'\- ]+?)"
+_TIER = r"(?P<{}>gold|silver|bronze)(?: tier)?"
+_SERVICE = r"(?P<service>ground|2nd day air|next day air|international)"
+
+_POLITE_PREFIX = re.compile(r"^(?:(?:please|hi|hey|ok|okay)[,!]?\s+)*(?:(?:can|could|would) you\s+)?(?:please\s+)?")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(query: str) -> str:
+    """Lowercase, collapse whitespace, drop trailing punctuation and polite prefixes."""
+    text = _WHITESPACE.sub(" ", query).strip().rstrip("?!. ").lower()
+    return _POLITE_PREFIX.sub("", text)
+
+
+@dataclass
+class RoutedAnswer:
+    intent: str
+    tool: str
+    response: str
+    data: Any
+
+
+def _money(value: Any) -> str:
+    try:
+        return f"${float(value):,.0f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _number(value: Any) -> str:
+    try:
+        return f"{float(value):,.0f}"
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _percent(value: Any) -> str:
+    return f"{float(value):g}%"
+
+
+def _more(total: int) -> List[str]:
+    return [f"... and {total - ROUTER_MAX_ROWS} more"] if total > ROUTER_MAX_ROWS else []
+
+
+class IntentRouter:
+    """Answers structured queries from tools.yaml statements and the CSV loaders."""
+
+    def __init__(self, db_path: str, tools_file: str = TOOLS_FILE, enabled: bool = INTENT_ROUTER_ENABLED):
+        self.db_path = db_path
+        self.tools_file = tools_file
+        self.enabled = enabled
+        self._statements: Optional[Dict[str, str]] = None
+        self._local = threading.local()
+        self.routed: Dict[str, int] = {}
+        self.fallbacks = 0
+        # (intent, patterns, handler), tried in order; patterns match the whole normalized query
+        intents = [
+            ("list_customers", [
+                rf"^{_VERB}customers(?: list)?$",
+                r"^(?:customer list|list of (?:all )?customers)$",
+            ], self._list_customers),
+            ("customer_by_id", [
+                rf"^{_VERB}(?:{_RECORD}\s+(?:for|of|on|about)\s+)?customer(?:\s+id|\s+number|\s+no)?\s*#?\s*"
+                rf"(?P<customer_id>\d+)(?:'s)?(?:\s+{_RECORD})?$",
+            ], self._customer_by_id),
+            ("customer_id", [
+                rf"^{_VERB}customer id (?:for|of) {_NAME}$",
+                rf"^{_VERB}{_NAME}'s customer id$",
+            ], self._customer_id),
+            ("customer_info", [
+                rf"^{_VERB}{_RECORD} (?:for|of|on|about) {_NAME}$",
+                rf"^{_VERB}{_NAME}'s {_RECORD}$",
+            ], self._customer_info),
+            ("discount_tiers", [
+                rf"^{_VERB}(?:{_TIER.format('tier')}\s+)?discounts?(?: tiers?| rates?| table)?"
+                rf"(?:\s+(?:for|of)\s+(?:the\s+)?{_TIER.format('tier2')})?(?:\s+(?:for|on)\s+{_SERVICE})?$",
+            ], self._discount_tiers),
+            ("rebate_tiers", [
+                rf"^{_VERB}(?:{_TIER.format('tier')}\s+)?rebates?(?: tiers?| rates?| table)?"
+                rf"(?:\s+(?:for|of)\s+(?:the\s+)?{_TIER.format('tier2')})?$",
+            ], self._rebate_tiers),
+        ]
+        self._intents: List[Tuple[str, List[re.Pattern], Callable]] = [
+            (intent, [re.compile(pattern) for pattern in patterns], handler)
+            for intent, patterns, handler in intents
+        ]
+
+    # -- data access --------------------------------------------------------
+
+    def statement(self, tool: str) -> str:
+        """The SQL statement of a tools.yaml tool."""
+        if self._statements is None:
+            import yaml
+
+            with open(self.tools_file, encoding="utf-8") as f:
+                tools = yaml.safe_load(f).get("tools") or {}
+            self._statements = {name: spec["statement"] for name, spec in tools.items() if "statement" in spec}
+        return self._statements[tool]
+
+    def run(self, tool: str, *params: Any) -> List[Dict[str, Any]]:
+        """Run a tools.yaml statement on a read-only per-thread connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return [dict(row) for row in conn.execute(self.statement(tool), params)]
+
+    # -- routing ------------------------------------------------------------
+
+    def route(self, query: str) -> Optional[RoutedAnswer]:
+        """Answer the query directly, or return None to let the agent handle it."""
+        if not self.enabled:
+            return None
+        text = normalize(query)
+        for intent, patterns, handler in self._intents:
+            match = next(filter(None, (pattern.match(text) for pattern in patterns)), None)
+            if match is None:
+                continue
+            groups = {key: value.strip() for key, value in match.groupdict().items() if value}
+            with telemetry.span("router", intent):
+                answer = handler(groups)
+            if answer is not None:
+                self.routed[intent] = self.routed.get(intent, 0) + 1
+                _routed.inc(intent)
+                return answer
+            break
+        self.fallbacks += 1
+        _routed.inc("agent")
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": self.enabled, "routed": dict(self.routed), "fallbacks": self.fallbacks}
+
+    # -- intents ------------------------------------------------------------
+
+    def _list_customers(self, groups: Dict[str, str]) -> RoutedAnswer:
+        rows = self.run("list-customers")
+        lines = [f"There are {len(rows)} customers:"]
+        lines += [f"- {row['Customer_ID']}: {row['Company_Name']}" for row in rows[:ROUTER_MAX_ROWS]]
+        return RoutedAnswer("list_customers", "list-customers", "\n".join(lines + _more(len(rows))), rows)
+
+    def _describe_customers(self, rows: List[Dict[str, Any]]) -> str:
+        blocks = []
+        for row in rows[:ROUTER_MAX_ROWS]:
+            blocks.append("\n".join([
+                f"{row['Company_Name']} (Customer ID {row['Customer_ID']})",
+                f"- Annual volume: {_money(row.get('Annual_Volume'))}",
+                f"- Discount structure: {row.get('Discount_Structure') or 'none'}",
+                f"- Rebate structure: {row.get('Rebate_Structure') or 'none'}",
+            ]))
+        header = [f"Found {len(rows)} matching customers:"] if len(rows) > 1 else []
+        return "\n\n".join(header + blocks + _more(len(rows)))
+
+    def _customer_by_id(self, groups: Dict[str, str]) -> Optional[RoutedAnswer]:
+        rows = self.run("get-customer-by-id", int(groups["customer_id"]))
+        if not rows:
+            return None
+        return RoutedAnswer("customer_by_id", "get-customer-by-id", self._describe_customers(rows), rows)
+
+    def _customer_info(self, groups: Dict[str, str]) -> Optional[RoutedAnswer]:
+        rows = self.run("get-customer-info", groups["name"])
+        if not rows:
+            return None
+        return RoutedAnswer("customer_info", "get-customer-info", self._describe_customers(rows), rows)
+
+    def _customer_id(self, groups: Dict[str, str]) -> Optional[RoutedAnswer]:
+        rows = self.run("get-customer-info", groups["name"])
+        if not rows:
+            return None
+        if len(rows) == 1:
+            row = rows[0]
+            response = f"The customer ID for {row['Company_Name']} is {row['Customer_ID']}."
+        else:
+            lines = [f"{len(rows)} customers match \"{groups['name']}\":"]
+            lines += [f"- {row['Customer_ID']}: {row['Company_Name']}" for row in rows[:ROUTER_MAX_ROWS]]
+            response = "\n".join(lines + _more(len(rows)))
+        data = [{"Customer_ID": row["Customer_ID"], "Company_Name": row["Company_Name"]} for row in rows]
+        return RoutedAnswer("customer_id", "get-customer-info", response, data)
+
+    def _discount_tiers(self, groups: Dict[str, str]) -> Optional[RoutedAnswer]:
+        from sales_agent.agent import load_discount_data
+
+        tier = groups.get("tier") or groups.get("tier2")
+        result = load_discount_data(tier=tier, service_type=groups.get("service"))
+        rows = result["data"]
+        if not rows:
+            return None
+        scope = ", ".join(part for part in (
+            tier and tier.title(), groups.get("service") and rows[0]["Service_Type"]
+        ) if part)
+        lines = [f"Discount tiers{f' ({scope})' if scope else ''}:"]
+        lines += [
+            f"- {row['Tier']}, {row['Service_Type']}: {_percent(row['Discount_Rate'])} off "
+            f"from {_number(row['Min_Volume'])} annual volume"
+            for row in rows
+        ]
+        return RoutedAnswer("discount_tiers", "load_discount_data", "\n".join(lines), rows)
+
+    def _rebate_tiers(self, groups: Dict[str, str]) -> Optional[RoutedAnswer]:
+        from sales_agent.agent import load_rebate_data
+
+        tier = groups.get("tier") or groups.get("tier2")
+        result = load_rebate_data(tier=tier)
+        rows = result["data"]
+        if not rows:
+            return None
+        lines = [f"Rebate tiers{f' ({tier.title()})' if tier else ''}:"]
+        lines += [
+            f"- {row['Tier']}: {_percent(row['Rebate_Percentage'])} rebate from {_number(row['Min_Volume'])} "
+            f"annual volume, up to {_money(row['Max_Rebate'])}"
+            for row in rows
+        ]
+        return RoutedAnswer("rebate_tiers", "load_rebate_data", "\n".join(lines), rows)
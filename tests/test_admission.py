@@ -0,0 +1,130 @@
+"""
+Tests for common/admission.py: concurrency limit, bounded queue, timeouts and deadlines
+"""
+import asyncio
+
+import pytest
+
+from common.admission import AdmissionController, AdmissionRejected
+
+
+def test_runs_beyond_the_limit_wait_for_a_slot():
+    controller = AdmissionController(max_concurrency=2, max_queue=10, queue_timeout=5, deadline=0)
+    peak = 0
+
+    async def work():
+        nonlocal peak
+        peak = max(peak, controller.active)
+        await asyncio.sleep(0.01)
+        return controller.active
+
+    async def run():
+        return await asyncio.gather(*(controller.run(work) for _ in range(6)))
+
+    assert all(active <= 2 for active in asyncio.run(run()))
+    assert peak == 2
+    stats = controller.stats()
+    assert (stats["admitted"], stats["active"], stats["waiting"]) == (6, 0, 0)
+    assert stats["wait_seconds"]["max"] > 0
+
+
+def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(max_concurrency=1, max_queue=1, queue_timeout=5)
+
+    async def run():
+        release = await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire()
+        release()
+        (await waiter)()
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 429
+    assert rejected.headers == {"Retry-After": str(rejected.retry_after)}
+    assert controller.stats()["rejected_queue_full"] == 1
+
+
+def test_queue_timeout_is_rejected_with_503():
+    controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.02)
+
+    async def run():
+        release = await controller.acquire()
+        try:
+            with pytest.raises(AdmissionRejected) as rejected:
+                await controller.acquire()
+            return rejected.value
+        finally:
+            release()
+
+    rejected = asyncio.run(run())
+    assert rejected.status_code == 503 and rejected.retry_after >= 1
+    assert controller.waiting == 0
+    assert controller.stats()["rejected_timeout"] == 1
+
+
+def test_run_past_the_deadline_is_rejected_with_504_and_frees_its_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=5, deadline=0.02)
+
+    async def run():
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.run(lambda: asyncio.sleep(1))
+        return rejected.value, await controller.run(lambda: asyncio.sleep(0, "ok"))
+
+    rejected, result = asyncio.run(run())
+    assert rejected.status_code == 504 and rejected.headers is None
+    assert result == "ok"
+    assert controller.stats()["deadline_exceeded"] == 1
+
+
+def test_release_is_idempotent():
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+
+    async def run():
+        release = await controller.acquire()
+        release()
+        release()
+        assert controller.active == 0
+        second = await controller.acquire()
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire()
+        second()
+
+    asyncio.run(run())
+
+
+def test_errors_release_the_slot():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, deadline=0)
+
+    async def fail():
+        raise RuntimeError("model overloaded")
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await controller.run(fail)
+        return await controller.run(lambda: asyncio.sleep(0, "ok"))
+
+    assert asyncio.run(run()) == "ok"
+    assert controller.active == 0
+
+
+def test_retry_after_grows_with_the_queue():
+    controller = AdmissionController(max_concurrency=2)
+    controller._service_time = 3.0
+    assert controller.retry_after() == 2
+    controller.waiting = 5
+    assert controller.retry_after() == 9
+
+
+def test_zero_concurrency_disables_admission_control():
+    controller = AdmissionController(max_concurrency=0, max_queue=0)
+
+    async def run():
+        releases = [await controller.acquire() for _ in range(10)]
+        for release in releases:
+            release()
+
+    asyncio.run(run())
+    assert not controller.enabled and controller.stats()["admitted"] == 0
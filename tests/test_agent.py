@@ -0,0 +1,48 @@
+"""
+Tests for DealAgent/agent.py and deferred imports: the agent is built on first use
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from DealAgent import agent
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def imported_after(module: str, candidates) -> list:
+    """The heavy modules a fresh interpreter has loaded after importing `module`."""
+    code = f"import sys, {module}; print(','.join(m for m in {list(candidates)!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [name for name in output.stdout.strip().split(",") if name]
+
+
+@pytest.mark.parametrize("module, heavy", [
+    ("DealAgent.api", ["google.adk"]),
+    ("DealAgent.agent", ["google.adk"]),
+    ("sales_agent.agent", ["pandas", "llama_index.core", "toolbox_llamaindex"]),
+    ("sales_agent.fastapi_server", ["pandas", "llama_index.core", "toolbox_llamaindex"]),
+])
+def test_heavy_frameworks_are_not_imported_at_startup(module, heavy):
+    assert imported_after(module, heavy) == []
+
+
+def test_agent_is_built_once_on_first_access(monkeypatch):
+    built = []
+    monkeypatch.setattr(agent, "_agent", None)
+    monkeypatch.setattr(agent, "build_agent", lambda: built.append(object()) or built[-1])
+    assert agent.root_agent is agent.get_agent() is built[0]
+    assert len(built) == 1
+
+
+def test_description_names_every_tool():
+    built = agent.build_agent()
+    names = [tool.__name__ for tool in agent.TOOLS]
+    assert names == [
+        "resolve_customer", "query_sales_agent", "get_deal_by_customer_id", "get_deals_by_customer_ids",
+        "query_deal_portfolio",
+    ]
+    assert all(name in built.description for name in names)
+    assert [tool.__name__ for tool in built.tools] == names
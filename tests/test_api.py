@@ -0,0 +1,232 @@
+"""
+Tests for DealAgent/api.py with the agent run replaced by scripted ADK events
+
+The TestClient is used without its lifespan, so no agent is built and no
+data watcher is started.
+"""
+import asyncio
+import json
+from typing import Any, List, Optional
+
+import pytest
+from fastapi.testclient import TestClient
+from google.adk.events import Event
+from google.genai import types
+
+from common.admission import AdmissionController
+from common.query_cache import BYPASS, QueryCache
+from DealAgent import api
+
+
+def model_event(*parts: types.Part, partial: Optional[bool] = None) -> Event:
+    return Event(author="DealAgent", partial=partial, content=types.Content(role="model", parts=list(parts)))
+
+
+def call(name: str, **args: Any) -> types.Part:
+    return types.Part(function_call=types.FunctionCall(id=f"call-{name}", name=name, args=args))
+
+
+def result(name: str, response: Any) -> types.Part:
+    return types.Part(function_response=types.FunctionResponse(id=f"call-{name}", name=name, response=response))
+
+
+def text(value: str) -> types.Part:
+    return types.Part(text=value)
+
+
+SCRIPT = [
+    model_event(call("resolve_customer", company_name="CompanyABC")),
+    model_event(result("resolve_customer", {"status": "success", "customer_id": 1})),
+    model_event(text("CompanyABC's deal "), partial=True),
+    model_event(text("CompanyABC's deal is B1.")),
+]
+
+
+def parse_sse(body: str) -> List[tuple]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+@pytest.fixture
+def agent(monkeypatch):
+    """Replace the agent run; set agent.script to the events to yield (an exception is raised instead)."""
+
+    class ScriptedAgent:
+        script: List[Any] = SCRIPT
+        queries: List[str] = []
+
+    async def iter_agent_events(query, streaming=False, session_id=None):
+        ScriptedAgent.queries.append(query)
+        for event in ScriptedAgent.script:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    async def ensure_runner():
+        return None
+
+    ScriptedAgent.queries = []
+    monkeypatch.setattr(api, "iter_agent_events", iter_agent_events)
+    monkeypatch.setattr(api, "ensure_runner", ensure_runner)
+    return ScriptedAgent
+
+
+@pytest.fixture
+def client(agent, monkeypatch):
+    monkeypatch.setattr(api, "query_cache", QueryCache(enabled=False))
+    return TestClient(api.app)
+
+
+@pytest.fixture
+def busy(monkeypatch):
+    """An admission controller whose only slot is taken and whose queue holds nothing."""
+    controller = AdmissionController(max_concurrency=1, max_queue=0)
+    release = asyncio.run(controller.acquire())
+    monkeypatch.setattr(api, "admission", controller)
+    yield controller
+    release()
+
+
+# -- streaming --------------------------------------------------------------------
+
+def test_describe_event_names():
+    described = [pair for event in SCRIPT for pair in api.describe_event(event)]
+    assert described == [
+        ("tool_call", {"id": "call-resolve_customer", "name": "resolve_customer", "args": {"company_name": "CompanyABC"}}),
+        ("tool_result", {"id": "call-resolve_customer", "name": "resolve_customer", "status": "success"}),
+        ("text", {"text": "CompanyABC's deal "}),
+        ("final", {"response": "CompanyABC's deal is B1."}),
+    ]
+
+
+def test_tool_result_without_status_is_success():
+    event = model_event(result("get_deal_by_customer_id", {"bidStart": {}}))
+    assert list(api.describe_event(event))[0][1]["status"] == "success"
+
+
+def test_format_sse():
+    assert api.format_sse("final", {"response": "ok"}) == 'event: final\ndata: {"response": "ok"}\n\n'
+
+
+def test_stream_sends_agent_events(client):
+    response = client.post("/query/stream", json={"query": "Find CompanyABC's deal"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert [name for name, _ in parse_sse(response.text)] == ["tool_call", "tool_result", "text", "final"]
+
+
+def test_stream_reports_agent_errors_as_an_event(client, agent):
+    agent.script = [SCRIPT[0], RuntimeError("503 UNAVAILABLE: model overloaded")]
+    events = parse_sse(client.post("/query/stream", json={"query": "Find CompanyABC's deal"}).text)
+    assert events[0][0] == "tool_call"
+    assert events[-1] == ("error", {"status_code": 503, "detail": api.error_status("503")[1]})
+
+
+def test_stream_rejects_an_empty_query(client, agent):
+    assert client.post("/query/stream", json={"query": "  "}).status_code == 400
+    assert agent.queries == []
+
+
+# -- admission control ----------------------------------------------------------------
+
+def test_query_answers(client):
+    response = client.post("/query", json={"query": "Find CompanyABC's deal"})
+    assert response.status_code == 200
+    assert response.json() == {"response": "CompanyABC's deal is B1."}
+
+
+def test_query_rejected_when_busy(client, agent, busy):
+    response = client.post("/query", json={"query": "Find CompanyABC's deal"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(busy.retry_after())
+    assert agent.queries == []
+
+
+def test_stream_rejection_is_an_error_event(client, agent, busy):
+    response = client.post("/query/stream", json={"query": "Find CompanyABC's deal"})
+    assert response.status_code == 200
+    [(name, data)] = parse_sse(response.text)
+    assert name == "error"
+    assert data["status_code"] == 429 and data["retry_after"] >= 1
+    assert agent.queries == []
+    assert busy.stats()["rejected_queue_full"] == 1
+
+
+# -- usage accounting ---------------------------------------------------------------
+
+def test_query_usage_is_returned_on_request(client):
+    body = client.post("/query", json={"query": "q", "include_usage": True}).json()
+    assert set(body["usage"]) >= {"llm_calls", "prompt_tokens", "completion_tokens", "tool_result_bytes", "tools"}
+    assert "usage" not in client.post("/query", json={"query": "q"}).json()
+
+
+def test_stream_ends_with_a_usage_event(client):
+    events = parse_sse(client.post("/query/stream", json={"query": "q", "include_usage": True}).text)
+    assert events[-1][0] == "usage"
+    assert events[-2][0] == "final"
+
+
+# -- query cache and sessions ------------------------------------------------------
+
+def test_cache_status_header(client, agent, monkeypatch):
+    assert client.post("/query", json={"query": "q"}).headers["X-Cache"] == BYPASS
+    monkeypatch.setattr(api, "query_cache", QueryCache(enabled=True, ttl=60))
+    statuses = [client.post("/query", json={"query": query}).headers["X-Cache"] for query in ("Deal?", "deal")]
+    assert statuses == ["miss", "hit"]
+    assert len(agent.queries) == 2
+
+
+def test_conversation_turns_bypass_the_cache(client, agent, monkeypatch):
+    monkeypatch.setattr(api, "query_cache", QueryCache(enabled=True, ttl=60))
+    for _ in range(2):
+        response = client.post("/query", json={"query": "and its payment terms?", "session_id": "s-1"})
+        assert response.headers["X-Cache"] == BYPASS
+        assert response.json()["session_id"] == "s-1"
+    assert agent.queries == ["and its payment terms?"] * 2
+
+
+def test_invalid_session_id_is_rejected(client):
+    assert client.post("/query", json={"query": "q", "session_id": "../etc"}).status_code == 422
+
+
+def test_session_lifecycle(client, monkeypatch):
+    deleted = []
+
+    async def delete_adk_session(session_id):
+        deleted.append(session_id)
+
+    monkeypatch.setattr(api, "sessions", api.InMemorySessionStore(ttl=60, max_sessions=10))
+    monkeypatch.setattr(api, "delete_adk_session", delete_adk_session)
+    session_id = client.post("/sessions").json()["session_id"]
+    assert client.get("/sessions/stats").json()["active"] == 1
+    assert client.delete(f"/sessions/{session_id}").json()["status"] == "deleted"
+    assert deleted == [session_id]
+    assert client.delete(f"/sessions/{session_id}").status_code == 404
+
+
+# -- batch ------------------------------------------------------------------------------
+
+def test_batch_streams_one_line_per_query_and_a_summary(client, agent):
+    agent.script = [model_event(text("answer"))]
+    response = client.post("/query/batch", json={"queries": ["a", "b", " "], "concurrency": 2})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    items = sorted(lines[:-1], key=lambda item: item["index"])
+    assert [(item["status"], item.get("response"), item.get("cache")) for item in items] == [
+        ("ok", "answer", BYPASS), ("ok", "answer", BYPASS), ("error", None, None),
+    ]
+    assert lines[-1]["summary"]["ok"] == 2
+    assert sorted(agent.queries) == ["a", "b"]
+
+
+def test_batch_reports_rejected_queries_per_line(client, busy):
+    lines = [json.loads(line) for line in client.post("/query/batch", json={"queries": ["a"]}).text.splitlines()]
+    assert (lines[0]["status"], lines[0]["status_code"]) == ("error", 429)
+
+
+def test_batch_limits(client):
+    assert client.post("/query/batch", json={"queries": []}).status_code == 422
+    assert client.post("/query/batch", json={"queries": ["a"], "concurrency": 0}).status_code == 422
@@ -0,0 +1,94 @@
+"""
+Tests for common/batch.py: bounded parallelism, completion order, per-item errors and cancellation
+"""
+import asyncio
+import json
+
+from common import batch
+
+
+class Answers:
+    """Answers "<seconds>" queries after that many seconds; "fail" raises."""
+
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.finished = []
+
+    async def __call__(self, query):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if query == "fail":
+                raise RuntimeError("503 UNAVAILABLE")
+            await asyncio.sleep(float(query))
+            self.finished.append(query)
+            return {"response": f"answer to {query}"}
+        finally:
+            self.active -= 1
+
+
+def describe_error(e):
+    return 503, str(e)
+
+
+def collect(queries, answers, concurrency=None):
+    async def run():
+        return [item async for item in batch.run_batch(queries, answers, describe_error, concurrency)]
+
+    return asyncio.run(run())
+
+
+def test_results_arrive_in_completion_order_then_a_summary():
+    items = collect(["0.05", "0.0", "0.02"], Answers(), concurrency=3)
+    assert [item["index"] for item in items[:-1]] == [1, 2, 0]
+    assert items[0] == {"index": 1, "query": "0.0", "status": "ok", "elapsed_ms": items[0]["elapsed_ms"],
+                        "response": "answer to 0.0"}
+    summary = items[-1]["summary"]
+    assert (summary["items"], summary["ok"], summary["errors"], summary["concurrency"]) == (3, 3, 0, 3)
+
+
+def test_concurrency_is_bounded_and_capped(monkeypatch):
+    monkeypatch.setattr(batch, "BATCH_MAX_CONCURRENCY", 3)
+    answers = Answers()
+    items = collect(["0.01"] * 8, answers, concurrency=2)
+    assert answers.peak == 2
+    answers = Answers()
+    items = collect(["0.01"] * 8, answers, concurrency=50)
+    assert answers.peak == 3 and items[-1]["summary"]["concurrency"] == 3
+    assert collect(["0.0"], Answers())[-1]["summary"]["concurrency"] == 3
+
+
+def test_errors_and_empty_queries_only_affect_their_own_line():
+    items = {item.get("index"): item for item in collect(["0.0", "fail", " "], Answers())}
+    assert items[0]["status"] == "ok"
+    assert (items[1]["status"], items[1]["status_code"], items[1]["detail"]) == ("error", 503, "503 UNAVAILABLE")
+    assert (items[2]["status_code"], items[2]["detail"]) == (400, "Query cannot be empty")
+    assert items[None]["summary"]["errors"] == 2
+
+
+def test_unfinished_queries_are_cancelled_when_the_reader_leaves():
+    answers = Answers()
+
+    async def run():
+        stream = batch.run_batch(["0.0", "0.2", "0.2"], answers, describe_error, 3)
+        first = await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.3)
+        return first
+
+    assert asyncio.run(run())["index"] == 0
+    assert answers.finished == ["0.0"]
+
+
+def test_ndjson_lines():
+    async def items():
+        yield {"index": 0, "response": "é"}
+        yield {"summary": {"items": 1}}
+
+    async def run():
+        return [line async for line in batch.ndjson(items())]
+
+    lines = asyncio.run(run())
+    assert all(line.endswith("\n") for line in lines)
+    assert [json.loads(line) for line in lines] == [{"index": 0, "response": "é"}, {"summary": {"items": 1}}]
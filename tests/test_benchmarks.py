@@ -0,0 +1,165 @@
+"""
+Tests for the load test helpers in benchmarks/: stage timing, the load driver,
+regression checks, the scripted LLM and the stub Toolbox server
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from benchmarks import fake_llm, load, stages
+from benchmarks.stub_toolbox import ToolboxStub, create_app
+
+
+# -- stage timing ---------------------------------------------------------------
+
+def test_percentiles_use_the_nearest_rank():
+    summary = stages.percentiles([i / 1000 for i in range(1, 101)])
+    assert summary == {"count": 100, "mean_ms": 50.5, "p50_ms": 51.0, "p95_ms": 96.0, "p99_ms": 100.0, "max_ms": 100.0}
+    assert stages.percentiles([]) == {"count": 0}
+
+
+def test_recorder_collects_stages_of_matching_requests():
+    recorder = stages.StageRecorder()
+    app = FastAPI()
+
+    def tool():
+        stages.record("tool:x", 0.5)
+        return "ok"
+
+    @app.post("/query")
+    async def query():
+        stages.record("llm", 0.25)
+        return await asyncio.to_thread(stages.timed("tool:y", lambda: "ok"))
+
+    @app.get("/other")
+    async def other():
+        return tool()
+
+    recorder.install(app)
+    client = TestClient(app)
+    client.post("/query")
+    client.get("/other")
+    summary = client.get("/bench/stages").json()
+    # /other is not recorded; time spent in worker threads still counts for the request
+    assert set(summary) == {"server", "framework", "llm", "tool:y"}
+    assert summary["server"]["count"] == summary["framework"]["count"] == 1
+    assert summary["llm"]["p50_ms"] == 250.0
+    client.post("/bench/reset")
+    assert client.get("/bench/stages").json() == {}
+
+
+def test_timed_records_async_functions_and_failures():
+    collected = {}
+    token = stages._current.set(collected)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    try:
+        with pytest.raises(RuntimeError):
+            asyncio.run(stages.timed("tool:fail", fail)())
+    finally:
+        stages._current.reset(token)
+    assert collected["tool:fail"] >= 0.01
+    stages.record("llm", 1.0)  # no request: ignored
+
+
+# -- load driver and regression checks --------------------------------------------
+
+def test_drive_bounds_concurrency_and_counts_statuses():
+    active, peak = 0, 0
+
+    async def call(index):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.005)
+        active -= 1
+        if index % 5 == 4:
+            raise TimeoutError()
+        return "ok" if index % 5 else "503"
+
+    result = asyncio.run(load.drive(3, 20, call))
+    assert peak == 3
+    assert result["statuses"] == {"ok": 12, "503": 4, "TimeoutError": 4}
+    assert (result["ok"], result["errors"]) == (12, 8)
+    assert result["latency"]["client"]["count"] == 12
+
+
+def run(target, rps, p95, concurrency=4):
+    return {"target": target, "concurrency": concurrency, "throughput_rps": rps, "latency": {"client": {"p95_ms": p95}}}
+
+
+def test_compare_reports_only_regressions_beyond_the_threshold():
+    baseline = {"runs": [run("sales", 100, 50), run("mcp", 100, 50)]}
+    runs = [run("sales", 85, 58), run("mcp", 95, 55), run("dealagent", 1, 999), run("sales", 1, 999, concurrency=16)]
+    assert load.compare(runs, baseline, 0.1) == [
+        "sales c=4 throughput: 85 rps vs baseline 100 rps",
+        "sales c=4 client p95: 58ms vs baseline 50ms",
+    ]
+
+
+# -- scripted LLM -----------------------------------------------------------------
+
+@pytest.mark.parametrize("query, company", [
+    ("Summarize the deal for CompanyABC", "CompanyABC"),
+    ("What discounts apply for TechCorp Solutions?", "TechCorp Solutions"),
+    ("CompanyABC", "CompanyABC"),
+])
+def test_company_from_query(query, company):
+    assert fake_llm.company_from_query(query) == company
+
+
+def test_scripted_adk_llm_follows_the_tool_script():
+    from google.adk.models import LlmRequest
+    from google.genai import types
+
+    llm = fake_llm.scripted_adk_llm(latency=0)
+    contents = [types.Content(role="user", parts=[types.Part(text="Summarize the deal for CompanyABC")])]
+
+    def step(*responses):
+        for name, response in responses:
+            part = types.Part(function_response=types.FunctionResponse(name=name, response=response))
+            contents.append(types.Content(role="user", parts=[part]))
+        return llm.next_step(LlmRequest(contents=list(contents))).content.parts[0]
+
+    first = step()
+    assert (first.function_call.name, first.function_call.args) == ("resolve_customer", {"company_name": "CompanyABC"})
+    second = step(("resolve_customer", {"status": "success", "customer_id": 1}))
+    assert second.function_call.args == {"customer_id": 1, "fields": "summary"}
+    deal = {"bidStart": {"bidHead": {"bidNum": "B1", "dealStatus": "P"}}}
+    assert step(("get_deal_by_customer_id", deal)).text == "Deal B1 is in status P."
+
+
+# -- stub Toolbox ------------------------------------------------------------------
+
+@pytest.fixture
+def toolbox():
+    return TestClient(create_app(ToolboxStub()))
+
+
+def rpc(client, method, **params):
+    return client.post("/mcp/", json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params}).json()
+
+
+def test_stub_lists_the_tools_yaml_tools(toolbox):
+    tools = {tool["name"]: tool for tool in rpc(toolbox, "tools/list")["result"]["tools"]}
+    assert "get-customer-info" in tools
+    assert tools["get-customer-info"]["inputSchema"]["required"] == ["company_name"]
+
+
+def test_stub_runs_tool_statements(toolbox):
+    result = rpc(toolbox, "tools/call", name="get-customer-id", arguments={"company_name": "logistics"})["result"]
+    assert result == {"content": [{"type": "text", "text": '[{"Customer_ID": 3}]'}], "isError": False}
+    empty = rpc(toolbox, "tools/call", name="get-customer-id", arguments={"company_name": "nobody"})["result"]
+    assert empty["content"][0]["text"] == "null"
+
+
+def test_stub_errors(toolbox):
+    assert rpc(toolbox, "tools/call", name="drop-tables", arguments={})["result"]["isError"]
+    assert rpc(toolbox, "resources/list")["error"]["code"] == -32601
+    notification = {"jsonrpc": "2.0", "method": "notifications/initialized"}
+    assert toolbox.post("/mcp/", json=notification).status_code == 204
@@ -0,0 +1,136 @@
+"""
+Tests for DealAgent/customer_resolver.py: name normalization, match classes and the resolution rule
+"""
+import sqlite3
+import time
+
+import pytest
+
+from DealAgent import customer_resolver
+from DealAgent.customer_resolver import CustomerIndex, normalize_name, resolve_customer
+
+ROWS = [
+    (1, "CompanyABC"),
+    (2, "TechCorp Solutions"),
+    (3, "TechCorp Logistics"),
+    (4, "Global Logistics Inc"),
+    (5, "Acme Corp"),
+    (6, "Acme Corp."),
+    (7, "Zenith Freight LLC"),
+]
+
+
+@pytest.fixture
+def index(monkeypatch):
+    index = CustomerIndex(ROWS)
+    monkeypatch.setattr(customer_resolver, "get_customer_index", lambda: index)
+    return index
+
+
+@pytest.mark.parametrize("name, key", [
+    ("CompanyABC", "companyabc"),
+    ("Company ABC", "companyabc"),
+    ("  company-abc! ", "companyabc"),
+    ("Global Logistics Inc", "globallogistics"),
+    ("Global Logistics, Inc.", "globallogistics"),
+    ("Zenith Freight LLC Ltd", "zenithfreight"),
+    ("Société Générale", "societegenerale"),
+    ("A&B", "aandb"),
+    ("Inc", "inc"),
+    ("", ""),
+])
+def test_normalize_name(name, key):
+    assert normalize_name(name) == key
+
+
+def test_exact_match_resolves(index):
+    result = resolve_customer("company abc")
+    assert result["status"] == "success"
+    assert result["customer_id"] == 1
+    assert result["candidates"][0]["match"] == "exact"
+
+
+def test_single_prefix_match_resolves(index):
+    result = resolve_customer("Zenith")
+    assert (result["status"], result["customer_id"]) == ("success", 7)
+    assert result["company_name"] == "Zenith Freight LLC"
+
+
+def test_two_prefix_matches_are_ambiguous(index):
+    result = resolve_customer("techcorp")
+    assert result["status"] == "ambiguous"
+    assert result["customer_id"] is None
+    assert {c["customer_id"] for c in result["candidates"]} == {2, 3}
+
+
+def test_two_prefix_matches_stay_ambiguous_with_limit_1(index):
+    result = resolve_customer("techcorp", limit=1)
+    assert result["status"] == "ambiguous"
+    assert result["customer_id"] is None
+    assert len(result["candidates"]) == 1
+
+
+def test_duplicate_exact_names_stay_ambiguous_with_limit_1(index):
+    result = resolve_customer("Acme Corp", limit=1)
+    assert result["status"] == "ambiguous"
+    assert len(result["candidates"]) == 1
+
+
+def test_substring_match_is_a_candidate_only(index):
+    result = resolve_customer("ABC")
+    assert result["status"] == "ambiguous"
+    assert [(c["customer_id"], c["match"]) for c in result["candidates"]] == [(1, "substring")]
+
+
+def test_fuzzy_match_is_a_candidate_only(index):
+    result = resolve_customer("Compny ABC")
+    assert result["status"] == "ambiguous"
+    assert result["candidates"][0]["customer_id"] == 1
+    assert result["candidates"][0]["match"] == "fuzzy"
+
+
+def test_unknown_name_is_not_found(index):
+    result = resolve_customer("qqqqqq")
+    assert result == {"status": "not_found", "customer_id": None, "company_name": "qqqqqq", "candidates": []}
+
+
+def test_candidates_are_ranked_and_limited(index):
+    # The shorter name that contains the key scores higher
+    candidates = index.search("logistics", limit=5)
+    assert [(c["customer_id"], c["match"]) for c in candidates][:2] == [(4, "substring"), (3, "substring")]
+    candidates = index.search("tech", limit=5)
+    assert [c["match"] for c in candidates] == ["prefix", "prefix"]
+    assert candidates[0]["score"] >= candidates[1]["score"]
+    assert len(index.search("techcorp", limit=1)) == 1
+
+
+def test_lookup_error_is_reported(monkeypatch):
+    def broken():
+        raise sqlite3.OperationalError("no such table: customer")
+
+    monkeypatch.setattr(customer_resolver, "get_customer_index", broken)
+    result = resolve_customer("CompanyABC")
+    assert result["status"] == "error"
+    assert "no such table" in result["error"]
+
+
+def test_index_is_rebuilt_when_the_database_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(customer_resolver, "_index", None)
+    monkeypatch.setattr(customer_resolver, "_index_signature", None)
+    db_path = str(tmp_path / "customer.sqlite")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE customer (Customer_ID INTEGER, Company_Name TEXT)")
+    conn.execute("INSERT INTO customer VALUES (1, 'CompanyABC')")
+    conn.commit()
+
+    first = customer_resolver.get_customer_index(db_path)
+    assert first.resolve("CompanyABC")["customer_id"] == 1
+    assert customer_resolver.get_customer_index(db_path) is first
+
+    time.sleep(0.01)
+    conn.execute("INSERT INTO customer VALUES (2, 'NewCo')")
+    conn.commit()
+    conn.close()
+    second = customer_resolver.get_customer_index(db_path)
+    assert second is not first
+    assert second.resolve("NewCo")["customer_id"] == 2
@@ -0,0 +1,181 @@
+"""
+Tests for common/data_watch.py: file signatures, the invalidation bus, the watcher and its subscribers
+"""
+import asyncio
+import os
+import threading
+
+import pytest
+
+from common import data_watch
+from common.data_watch import DataWatcher, InvalidationBus, path_signature
+from common.query_cache import QueryCache
+
+
+def touch(path, text):
+    """Rewrite a file and move its mtime forward, so the change is seen even on coarse clocks."""
+    path.write_text(text)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+# -- signatures -------------------------------------------------------------------------
+
+def test_file_signature_includes_the_wal_file(tmp_path):
+    db = tmp_path / "customer.sqlite"
+    db.write_text("db")
+    before = path_signature(db)
+    assert len(before) == 2
+    (tmp_path / "customer.sqlite-wal").write_text("pending pages")
+    assert path_signature(db)[:2] == before and len(path_signature(db)) == 4
+
+
+def test_directory_signature_lists_its_files(tmp_path):
+    (tmp_path / "json1.json").write_text("{}")
+    (tmp_path / "nested").mkdir()
+    assert [entry[0] for entry in path_signature(tmp_path)] == ["json1.json"]
+    (tmp_path / "json2.json").write_text("{}")
+    assert [entry[0] for entry in path_signature(tmp_path)] == ["json1.json", "json2.json"]
+
+
+def test_missing_path_has_an_empty_signature(tmp_path):
+    assert path_signature(tmp_path / "missing.csv") == ()
+
+
+# -- bus --------------------------------------------------------------------------------
+
+def test_publish_bumps_the_version_and_calls_subscribers():
+    bus = InvalidationBus()
+    seen = []
+    unsubscribe = bus.subscribe(["deals", "customers"], seen.append)
+    bus.publish("deals")
+    bus.publish("discount")
+    assert seen == ["deals"]
+    assert (bus.version("deals"), bus.version("discount"), bus.version("customers")) == (1, 1, 0)
+    unsubscribe()
+    bus.publish("customers")
+    assert seen == ["deals"] and bus.version("customers") == 1
+
+
+def test_failing_subscriber_does_not_stop_the_others():
+    bus = InvalidationBus()
+    seen = []
+    bus.subscribe(["deals"], lambda topic: 1 / 0)
+    bus.subscribe(["deals"], seen.append)
+    bus.publish("deals")
+    assert seen == ["deals"]
+
+
+# -- watcher ----------------------------------------------------------------------------
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "discount.csv"
+    path.write_text("Tier\nGold\n")
+    return path
+
+
+def test_change_is_reloaded_once_it_is_stable(source):
+    bus = InvalidationBus()
+    reloads = []
+    watcher = DataWatcher(interval=0, invalidations=bus)
+    watcher.watch("discount", [source], lambda: reloads.append(source.read_text()))
+    assert watcher.check() == []
+    touch(source, "Tier\nGold\nSilver\n")
+    assert watcher.check() == []  # first sighting: may still be written
+    assert watcher.check() == ["discount"]
+    assert reloads == ["Tier\nGold\nSilver\n"]
+    assert bus.version("discount") == 1
+    assert watcher.check() == []
+
+
+def test_failed_reload_keeps_the_old_data_and_is_retried(source):
+    bus = InvalidationBus()
+    attempts = []
+
+    def reload():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ValueError("half-written file")
+
+    watcher = DataWatcher(interval=0, invalidations=bus)
+    watcher.watch("discount", [source], reload)
+    touch(source, "Tier\n")
+    watcher.check()
+    assert watcher.check() == []
+    stats = watcher.stats()["sources"]["discount"]
+    assert stats["failures"] == 1 and stats["last_error"] == "ValueError: half-written file"
+    assert bus.version("discount") == 0
+    assert watcher.check() == ["discount"]
+    assert watcher.stats()["sources"]["discount"]["last_error"] is None
+
+
+def test_background_thread_picks_up_changes(source):
+    bus = InvalidationBus()
+    reloaded = threading.Event()
+    bus.subscribe(["discount"], lambda topic: reloaded.set())
+    watcher = DataWatcher(interval=0.01, invalidations=bus)
+    watcher.watch("discount", [source])
+    watcher.start()
+    try:
+        assert watcher.stats()["running"]
+        touch(source, "Tier\nBronze\n")
+        assert reloaded.wait(2)
+    finally:
+        watcher.stop()
+    assert not watcher.stats()["running"]
+
+
+def test_zero_interval_does_not_start_a_thread():
+    watcher = DataWatcher(interval=0)
+    watcher.start()
+    assert not watcher.stats()["running"]
+
+
+# -- subscribers --------------------------------------------------------------------------
+
+def test_query_cache_is_dropped_when_its_source_changes():
+    cache = QueryCache(enabled=True, ttl=60, invalidate_on=["test-query-cache-source"])
+
+    async def answer():
+        return "answer"
+
+    async def run():
+        await cache.get_or_compute("q", answer)
+        first = (await cache.get_or_compute("q", answer))[1]
+        data_watch.bus.publish("test-other-source")
+        second = (await cache.get_or_compute("q", answer))[1]
+        data_watch.bus.publish("test-query-cache-source")
+        return first, second, (await cache.get_or_compute("q", answer))[1]
+
+    assert asyncio.run(run()) == ("hit", "hit", "miss")
+
+
+def test_invalidation_from_the_watcher_thread_during_a_run():
+    cache = QueryCache(enabled=True, ttl=60, invalidate_on=["test-threaded-source"])
+
+    async def slow():
+        publisher = threading.Thread(target=data_watch.bus.publish, args=("test-threaded-source",))
+        publisher.start()
+        await asyncio.to_thread(publisher.join)
+        return "stale"
+
+    async def fresh():
+        return "fresh"
+
+    async def run():
+        assert await cache.get_or_compute("q", slow) == ("stale", "miss")
+        return await cache.get_or_compute("q", fresh)
+
+    assert asyncio.run(run()) == ("fresh", "miss")
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_sources_endpoint():
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    app = FastAPI()
+    data_watch.install(app)
+    sources = TestClient(app).get("/data/sources").json()
+    assert set(sources) == {"interval_seconds", "running", "sources"}
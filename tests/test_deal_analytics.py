@@ -0,0 +1,162 @@
+"""
+Tests for DealAgent/deal_analytics.py: flattening, filters, grouping, metrics and rebuilds
+"""
+import asyncio
+import json
+import logging
+
+import httpx
+import pytest
+
+from DealAgent import deal_server, resilience, tools
+from DealAgent.deal_analytics import DealAnalytics
+from DealAgent.deal_store import DealStore
+from DealAgent.resilience import Backend
+
+DEALS = {
+    1: ({"bidNum": "B1", "owner": "ana", "dealStatus": "P", "reg": "16", "estAnnGrs": 100000, "bidName": "Alpha Freight"},
+        [{"acet": "A1", "payTerm": 30}, {"acet": "A2", "payTerm": 10}]),
+    2: ({"bidNum": "B2", "owner": "ana", "dealStatus": "A", "reg": 17, "estAnnGrs": "250000", "bidName": "Beta"},
+        [{"acet": "A3", "payTerm": 45}]),
+    3: ({"bidNum": "B3", "owner": "bo", "dealStatus": "P", "reg": 16, "estAnnGrs": None, "bidName": "Gamma Freight"},
+        []),
+}
+
+
+def write_deal(directory, customer_id, head, accounts):
+    document = {"bidStart": {"bidHead": head, "bidAcct": accounts}}
+    (directory / f"json{customer_id}.json").write_text(json.dumps(document))
+
+
+@pytest.fixture
+def store(tmp_path):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    for customer_id, (head, accounts) in DEALS.items():
+        write_deal(directory, customer_id, head, accounts)
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    store.ingest_directory(str(directory))
+    store.data_dir = directory
+    return store
+
+
+@pytest.fixture
+def analytics(store):
+    return DealAnalytics(store=lambda: store, parquet_dir="", check_interval=60)
+
+
+def rows(result, *fields):
+    return [tuple(row[field] for field in fields) for row in result["rows"]]
+
+
+def test_tables_are_flattened(analytics):
+    schema = analytics.schema()["tables"]
+    assert schema["deals"]["rows"] == 3 and schema["accounts"]["rows"] == 3
+    assert {"customer_id", "bidNum", "owner", "accountCount"} <= set(schema["deals"]["columns"])
+    assert {"acet", "payTerm", "bidNum"} <= set(schema["accounts"]["columns"])
+
+
+def test_default_columns_when_not_aggregating(analytics):
+    result = analytics.query(filters="owner=ana")
+    assert result["rows"][0] == {"customer_id": 1, "bidNum": "B1", "bidName": "Alpha Freight", "owner": "ana",
+                                 "dealStatus": "P", "estAnnGrs": 100000}
+    assert (result["matched"], result["row_count"], result["truncated"]) == (2, 2, False)
+
+
+@pytest.mark.parametrize("filters, bid_nums", [
+    ("dealStatus=P", ["B1", "B3"]),
+    ("dealStatus == p", []),
+    ("dealStatus!=P", ["B2"]),
+    ("reg=16", ["B1", "B3"]),
+    ("reg=16|17", ["B1", "B2", "B3"]),
+    ("estAnnGrs>150000", ["B2"]),
+    ("estAnnGrs<=100000", ["B1"]),
+    ("bidName~freight", ["B1", "B3"]),
+    ("owner=ana; dealStatus=P", ["B1"]),
+    ("owner=ana and estAnnGrs>=100000", ["B1", "B2"]),
+])
+def test_filters(analytics, filters, bid_nums):
+    result = analytics.query(filters=filters, columns="bidNum", sort="bidNum")
+    assert [row["bidNum"] for row in result["rows"]] == bid_nums
+
+
+def test_group_by_with_metrics_sorted_by_the_first_metric(analytics):
+    result = analytics.query(group_by="owner", metrics="count,sum:estAnnGrs,nunique:dealStatus")
+    assert rows(result, "owner", "count", "sum_estAnnGrs", "nunique_dealStatus") == [
+        ("ana", 2, 350000.0, 2), ("bo", 1, 0.0, 1),
+    ]
+
+
+def test_metrics_without_grouping(analytics):
+    result = analytics.query(table="accounts", metrics="count,avg:payTerm,max:payTerm")
+    assert result["rows"] == [{"count": 3, "avg_payTerm": pytest.approx(85 / 3), "max_payTerm": 45.0}]
+
+
+def test_sort_and_limit(analytics):
+    result = analytics.query(table="accounts", columns="acet,payTerm", sort="-payTerm", limit=2)
+    assert rows(result, "acet") == [("A3",), ("A1",)]
+    assert result["truncated"] and result["row_count"] == 3
+
+
+@pytest.mark.parametrize("query, message", [
+    ({"table": "bids"}, "Unknown table"),
+    ({"filters": "region=16"}, "Unknown field 'region'"),
+    ({"filters": "owner"}, "Invalid filter"),
+    ({"filters": "payTerm>soon"}, "needs a number"),
+    ({"group_by": "region"}, "Unknown field 'region'"),
+    ({"metrics": "median:estAnnGrs"}, "Unknown metric"),
+    ({"metrics": "sum"}, "needs a field"),
+    ({"metrics": "sum:region"}, "Unknown field 'region'"),
+    ({"columns": "bidNum,region"}, "Unknown field 'region'"),
+    ({"group_by": "owner", "sort": "total"}, "Cannot sort by 'total'"),
+])
+def test_invalid_queries_raise(analytics, query, message):
+    with pytest.raises(ValueError, match=message):
+        analytics.query(**query)
+
+
+def test_tables_are_rebuilt_when_the_store_changes(analytics, store):
+    analytics.tables()
+    write_deal(store.data_dir, 4, {"bidNum": "B4", "owner": "cy"}, [])
+    store.ingest_directory(str(store.data_dir))
+    assert analytics.query(filters="owner=cy")["matched"] == 0  # within the check interval
+    assert analytics.builds == 1
+    analytics.refresh()
+    assert analytics.query(filters="owner=cy")["matched"] == 1
+    assert analytics.builds == 2
+
+
+def test_tables_are_built_from_the_store_without_pyarrow(store, tmp_path, caplog):
+    try:
+        import pyarrow  # noqa: F401
+        pytest.skip("pyarrow is installed")
+    except ImportError:
+        pass
+    analytics = DealAnalytics(store=lambda: store, parquet_dir=str(tmp_path / "parquet"), check_interval=60)
+    with caplog.at_level(logging.WARNING, logger="DealAgent.deal_analytics"):
+        assert analytics.query(metrics="count")["rows"] == [{"count": 3}]
+    assert analytics.source == "store" and analytics.parquet_dir is None
+    assert "install pyarrow" in caplog.text
+
+
+# -- deal server endpoint and tool --------------------------------------------------------
+
+@pytest.fixture
+def portfolio_tool(analytics, monkeypatch):
+    """query_deal_portfolio talking to the deal server app in-process."""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=deal_server.app))
+    monkeypatch.setattr(deal_server, "get_deal_analytics", lambda: analytics)
+    monkeypatch.setattr(resilience, "get_http_client", lambda: client)
+    monkeypatch.setattr(tools, "deal_server_backend", Backend("deal_server", ["http://deals"], hedge=False))
+    return tools.query_deal_portfolio
+
+
+def test_tool_runs_the_query_on_the_deal_server(portfolio_tool):
+    result = asyncio.run(portfolio_tool(filters="dealStatus=P", group_by="owner", metrics="count"))
+    assert rows(result, "owner", "count") == [("ana", 1), ("bo", 1)]
+
+
+def test_tool_reports_bad_queries(portfolio_tool):
+    result = asyncio.run(portfolio_tool(filters="region=16"))
+    assert result["status"] == "error"
+    assert "Unknown field 'region'" in result["error"] and "available:" in result["error"]
@@ -0,0 +1,142 @@
+"""
+Tests for DealAgent/deal_cache.py: TTL, LRU bounds and revalidation through the deal tool
+"""
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from DealAgent import resilience, tools
+from DealAgent.deal_cache import DealCache
+from DealAgent.resilience import Backend
+
+
+def test_fresh_entry_is_a_hit():
+    cache = DealCache(ttl=60)
+    cache.put(1, {"deal": 1}, size=10, etag='"v1"')
+    entry, fresh = cache.lookup(1)
+    assert fresh and entry.payload == {"deal": 1}
+    assert cache.stats()["hits"] == 1
+
+
+def test_miss():
+    cache = DealCache(ttl=60)
+    assert cache.lookup(1) == (None, False)
+    assert cache.stats()["misses"] == 1
+
+
+def test_expired_entry_is_kept_for_revalidation():
+    cache = DealCache(ttl=0.01)
+    cache.put(1, "deal", size=4, etag='"v1"', last_modified="Tue, 01 Oct 2024 00:00:00 GMT")
+    time.sleep(0.02)
+    entry, fresh = cache.lookup(1)
+    assert entry is not None and not fresh
+    assert entry.validators() == {"If-None-Match": '"v1"', "If-Modified-Since": "Tue, 01 Oct 2024 00:00:00 GMT"}
+    cache.refresh(1)
+    assert cache.lookup(1)[1]
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_least_recently_used_entry_is_evicted_by_count():
+    cache = DealCache(ttl=60, max_entries=2)
+    cache.put(1, "a", size=1)
+    cache.put(2, "b", size=1)
+    cache.lookup(1)
+    cache.put(3, "c", size=1)
+    assert cache.lookup(2)[0] is None
+    assert cache.lookup(1)[0] is not None and cache.lookup(3)[0] is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_are_evicted_by_total_size():
+    cache = DealCache(ttl=60, max_bytes=100)
+    cache.put(1, "a", size=60)
+    cache.put(2, "b", size=60)
+    assert cache.lookup(1)[0] is None
+    assert cache.stats()["bytes"] == 60
+
+
+def test_replacing_an_entry_updates_the_size():
+    cache = DealCache(ttl=60)
+    cache.put(1, "a", size=60)
+    cache.put(1, "b", size=10)
+    assert cache.stats()["bytes"] == 10
+    assert cache.lookup(1)[0].payload == "b"
+
+
+def test_oversized_payload_drops_the_previous_version():
+    cache = DealCache(ttl=60, max_bytes=100)
+    cache.put(1, "old", size=10)
+    cache.put(1, "new", size=200)
+    assert cache.lookup(1) == (None, False)
+    assert cache.stats()["bytes"] == 0
+
+
+def test_expire_all_marks_entries_stale():
+    cache = DealCache(ttl=60)
+    cache.put(1, "a", size=1)
+    cache.expire_all()
+    entry, fresh = cache.lookup(1)
+    assert entry is not None and not fresh
+
+
+def test_invalidate():
+    cache = DealCache(ttl=60)
+    cache.put(1, "a", size=5)
+    cache.put(2, "b", size=5)
+    cache.invalidate(1)
+    assert cache.lookup(1)[0] is None and cache.stats()["bytes"] == 5
+    cache.invalidate()
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_zero_ttl_disables_the_cache():
+    cache = DealCache(ttl=0)
+    cache.put(1, "a", size=1)
+    assert cache.lookup(1) == (None, False)
+    assert cache.stats()["entries"] == 0
+
+
+# -- revalidation through get_deal_by_customer_id -----------------------------
+
+@pytest.fixture
+def versioned_deal_server(monkeypatch):
+    """A deal server answering 304 to a matching If-None-Match; returns its (If-None-Match, status) log and deal."""
+    exchanges = []
+    current = {"etag": '"v1"', "bidNum": "B1"}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.headers.get("if-none-match") == current["etag"]:
+            exchanges.append((request.headers["if-none-match"], 304))
+            return httpx.Response(304, headers={"ETag": current["etag"]})
+        exchanges.append((request.headers.get("if-none-match"), 200))
+        deal = {"bidStart": {"bidHead": {"bidNum": current["bidNum"]}}}
+        return httpx.Response(200, json=deal, headers={"ETag": current["etag"]})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(resilience, "get_http_client", lambda: client)
+    monkeypatch.setattr(tools, "deal_server_backend", Backend("deal_server", ["http://deals"], hedge=False))
+    monkeypatch.setattr(tools, "deal_cache", DealCache(ttl=60))
+    return exchanges, current
+
+
+def fetch_bid_num() -> str:
+    deal = asyncio.run(tools.get_deal_by_customer_id(1))
+    return deal["bidStart"]["bidHead"]["bidNum"]
+
+
+def test_deal_is_served_from_cache_then_revalidated(versioned_deal_server):
+    exchanges, current = versioned_deal_server
+    assert fetch_bid_num() == "B1"
+    assert fetch_bid_num() == "B1"
+    assert exchanges == [(None, 200)]
+
+    tools.deal_cache.expire_all()
+    assert fetch_bid_num() == "B1"
+    assert exchanges[-1] == ('"v1"', 304)
+
+    current.update(etag='"v2"', bidNum="B2")
+    tools.deal_cache.expire_all()
+    assert fetch_bid_num() == "B2"
+    assert exchanges[-1] == ('"v1"', 200)
@@ -0,0 +1,105 @@
+"""
+Tests for DealAgent/deal_store.py: incremental ingest and indexed lookups
+"""
+import json
+import logging
+import os
+
+import pytest
+
+from DealAgent.deal_store import DealStore
+
+
+def document(bid_num, orig_bid="O1", last_mod="2025-01-01", accounts=(), **top):
+    return {
+        **top,
+        "bidStart": {
+            "bidHead": {"bidNum": bid_num, "origBid": orig_bid, "lastModDte": last_mod},
+            "bidAcct": [{"acet": acet} for acet in accounts],
+        },
+    }
+
+
+def write(directory, name, body):
+    path = directory / name
+    path.write_text(json.dumps(body))
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    directory = tmp_path / "data"
+    directory.mkdir()
+    write(directory, "json1.json", document("B1", accounts=["A1", "A2"]))
+    write(directory, "json2.json", document("B2", orig_bid="O2", accounts=["A2"]))
+    return directory
+
+
+@pytest.fixture
+def store(tmp_path, data_dir):
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    store.ingest_directory(str(data_dir))
+    return store
+
+
+def test_customer_id_comes_from_the_file_name_or_the_document(store, data_dir):
+    write(data_dir, "extra.json", document("B9", customerId=42))
+    store.ingest_directory(str(data_dir))
+    assert store.get("customer_id", 1).bid_num == "B1"
+    assert store.get("customer_id", 42).bid_num == "B9"
+
+
+def test_lookup_by_each_indexed_field(store):
+    assert store.get("bid_num", "B2").customer_id == 2
+    assert store.get("orig_bid", "O2").bid_num == "B2"
+    assert sorted(deal.bid_num for deal in store.find("acet", "A2")) == ["B1", "B2"]
+    assert store.get("bid_num", "missing") is None
+
+
+def test_unknown_lookup_field_is_rejected(store):
+    with pytest.raises(KeyError):
+        store.find("bidName", "x")
+
+
+def test_newest_deal_comes_first(store, data_dir):
+    write(data_dir, "json3.json", document("B3", orig_bid="O1", last_mod="2025-06-01"))
+    store.ingest_directory(str(data_dir))
+    assert [deal.bid_num for deal in store.find("orig_bid", "O1")] == ["B3", "B1"]
+    assert [deal.bid_num for deal in store.find("orig_bid", "O1", limit=1)] == ["B3"]
+
+
+def test_stored_body_round_trips(store):
+    deal = store.get("customer_id", 1)
+    assert deal.json() == document("B1", accounts=["A1", "A2"])
+    assert deal.etag.startswith('"') and deal.etag.endswith('"')
+    assert deal.last_modified_http == "Wed, 01 Jan 2025 00:00:00 GMT"
+
+
+def test_only_changed_files_are_reingested(store, data_dir):
+    assert store.ingest_directory(str(data_dir)) == {"ingested": 0, "unchanged": 2, "removed": 0, "failed": 0}
+    etag = store.get("customer_id", 1).etag
+    path = write(data_dir, "json1.json", document("B1-rev", accounts=["A3"]))
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 1_000_000))
+    assert store.ingest_directory(str(data_dir))["ingested"] == 1
+    deal = store.get("customer_id", 1)
+    assert deal.bid_num == "B1-rev" and deal.etag != etag
+    assert [d.bid_num for d in store.find("acet", "A1")] == []
+    assert store.count() == 2
+
+
+def test_removed_files_are_dropped(store, data_dir):
+    signature = store.signature()
+    (data_dir / "json2.json").unlink()
+    assert store.ingest_directory(str(data_dir))["removed"] == 1
+    assert store.get("customer_id", 2) is None
+    assert store.find("acet", "A2")[0].bid_num == "B1"
+    assert store.signature() != signature
+
+
+def test_malformed_file_is_skipped_and_logged_not_printed(store, data_dir, caplog, capsys):
+    (data_dir / "json3.json").write_text("{not json")
+    with caplog.at_level(logging.WARNING, logger="DealAgent.deal_store"):
+        stats = store.ingest_directory(str(data_dir))
+    assert stats["failed"] == 1 and store.count() == 2
+    assert "json3.json" in caplog.text
+    assert capsys.readouterr().out == ""
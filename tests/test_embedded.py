@@ -0,0 +1,159 @@
+"""
+Tests for DealAgent/embedded.py: the read-only customer pool and the in-process customer and deal tools
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from DealAgent import embedded
+from DealAgent.customer_resolver import CustomerIndex
+from DealAgent.deal_store import DealStore
+from DealAgent.embedded import ReadOnlyPool
+from sales_agent.database import setup_db
+
+CUSTOMERS = [
+    '1,"CompanyABC","$104,500","Ground: 40% off, 2nd Day Air: 45% off","2% of total annual spend if they hit $100K, 3% if they hit $150K"\n',
+    '2,"Acme Corp","$50,000",,\n',
+    '3,"Acme Corp.","$60,000",,\n',
+]
+
+
+@pytest.fixture
+def customer_db(tmp_path, monkeypatch):
+    csv_path = tmp_path / "customer.csv"
+    csv_path.write_text("Customer_ID,Company_Name,Annual_Volume,Discount_Structure,Rebate_Structure\n" + "".join(CUSTOMERS))
+    db_path = str(tmp_path / "customer.sqlite")
+    setup_db.csv_to_sqlite(str(csv_path), db_path)
+    with sqlite3.connect(db_path) as conn:
+        index = CustomerIndex(conn.execute("SELECT Customer_ID, Company_Name FROM customer").fetchall())
+    monkeypatch.setattr(embedded, "_pool", ReadOnlyPool(db_path, size=2))
+    monkeypatch.setattr(embedded, "get_customer_index", lambda: index)
+    return db_path
+
+
+@pytest.fixture
+def deal_store(tmp_path, monkeypatch):
+    directory = tmp_path / "deals"
+    directory.mkdir()
+    for customer_id, acet in ((1, "A1"), (2, "A2")):
+        document = {"bidStart": {
+            "bidHead": {"bidNum": f"B{customer_id}", "origBid": f"O{customer_id}", "dealStatus": "P", "bidName": None},
+            "bidAcct": [{"acet": acet, "payTerm": 30}],
+        }}
+        (directory / f"json{customer_id}.json").write_text(json.dumps(document))
+    store = DealStore(str(tmp_path / "deals.sqlite"))
+    store.ingest_directory(str(directory))
+    monkeypatch.setattr(embedded, "get_deal_store", lambda: store)
+    return store
+
+
+# -- pool -------------------------------------------------------------------------------
+
+def test_pool_connections_are_read_only(customer_db):
+    pool = ReadOnlyPool(customer_db, size=1)
+    with pool.connection() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM customer")
+    assert pool.query("SELECT COUNT(*) AS n FROM customer") == [{"n": 3}]
+
+
+def test_pool_never_opens_more_than_its_size(customer_db):
+    pool = ReadOnlyPool(customer_db, size=2)
+    seen = set()
+    barrier = threading.Barrier(4)
+
+    def borrow():
+        barrier.wait()
+        with pool.connection() as conn:
+            seen.add(id(conn))
+            time.sleep(0.02)
+
+    threads = [threading.Thread(target=borrow) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert pool._created == 2 and len(seen) == 2
+
+
+# -- customers -------------------------------------------------------------------------------
+
+def test_customer_by_id_with_parsed_terms(customer_db):
+    result = asyncio.run(embedded.get_customer(customer_id=1))
+    assert result["status"] == "success"
+    [record] = result["customers"]
+    assert (record["Company_Name"], record["Annual_Volume"]) == ("CompanyABC", 104500.0)
+    assert record["discounts"] == {"Ground": 40.0, "2nd Day Air": 45.0}
+    assert record["rebate_tiers"] == [
+        {"min_spend": 100000.0, "rebate_percentage": 2.0}, {"min_spend": 150000.0, "rebate_percentage": 3.0},
+    ]
+
+
+def test_customer_by_name(customer_db):
+    result = asyncio.run(embedded.get_customer(company_name="company abc"))
+    assert (result["status"], result["customer_id"]) == ("success", 1)
+    assert [record["Customer_ID"] for record in result["customers"]] == [1]
+
+
+def test_ambiguous_name_returns_every_candidate(customer_db):
+    result = asyncio.run(embedded.get_customer(company_name="Acme"))
+    assert (result["status"], result["customer_id"]) == ("ambiguous", None)
+    assert sorted(record["Customer_ID"] for record in result["customers"]) == [2, 3]
+
+
+@pytest.mark.parametrize("args, status", [
+    ({"customer_id": 99}, "not_found"),
+    ({"company_name": "Nobody Ltd"}, "not_found"),
+    ({}, "error"),
+])
+def test_customer_not_found_or_missing_arguments(customer_db, args, status):
+    assert asyncio.run(embedded.get_customer(**args))["status"] == status
+
+
+def test_customer_lookup_errors_are_reported(monkeypatch):
+    monkeypatch.setattr(embedded, "_pool", ReadOnlyPool("/nonexistent/customer.sqlite"))
+    result = asyncio.run(embedded.get_customer(customer_id=1))
+    assert result["status"] == "error" and result["error"].startswith("Customer lookup failed")
+
+
+# -- deals --------------------------------------------------------------------------------------
+
+def test_deal_by_customer_id_is_projected(deal_store):
+    deal = asyncio.run(embedded.get_deal_by_customer_id(1, fields="bidHead"))
+    assert deal == {"bidStart": {"bidHead": {"bidNum": "B1", "origBid": "O1", "dealStatus": "P"}}}
+    missing = asyncio.run(embedded.get_deal_by_customer_id(9))
+    assert missing == {"status": "error", "error": "No deal found for customer_id: 9", "customer_id": 9}
+
+
+def test_batch_of_deals(deal_store):
+    result = asyncio.run(embedded.get_deals_by_customer_ids([2, 9, 2], fields="bidHead.bidNum"))
+    assert result["status"] == "partial"
+    assert result["deals"] == {"2": {"bidStart": {"bidHead": {"bidNum": "B2"}}}}
+    assert list(result["errors"]) == ["9"]
+    invalid = asyncio.run(embedded.get_deals_by_customer_ids([1], fields="bidHead..x"))
+    assert invalid["status"] == "error" and "Invalid field path" in invalid["errors"]["1"]
+
+
+@pytest.mark.parametrize("args, bid_num", [
+    ({"bid_num": "B2"}, "B2"),
+    ({"orig_bid": "O1"}, "B1"),
+    ({"account": "A2"}, "B2"),
+])
+def test_find_deal(deal_store, args, bid_num):
+    deal = asyncio.run(embedded.find_deal(**args, fields="bidHead.bidNum"))
+    assert deal == {"bidStart": {"bidHead": {"bidNum": bid_num}}}
+
+
+@pytest.mark.parametrize("args", [{}, {"bid_num": "B1", "account": "A1"}, {"bid_num": ""}])
+def test_find_deal_needs_exactly_one_key(deal_store, args):
+    result = asyncio.run(embedded.find_deal(**args))
+    assert result == {"status": "error", "error": "Provide exactly one of bid_num, orig_bid or account"}
+
+
+def test_find_deal_errors(deal_store):
+    assert asyncio.run(embedded.find_deal(account="A9"))["error"] == "No deal found for account: A9"
+    assert "Invalid field path" in asyncio.run(embedded.find_deal(bid_num="B1", fields="["))["error"]
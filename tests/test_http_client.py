@@ -0,0 +1,71 @@
+"""
+Tests for DealAgent/http_client.py: one pooled client per process and per-request timeouts and trace propagation
+"""
+import asyncio
+
+import httpx
+
+from common import telemetry
+from DealAgent import http_client
+from DealAgent.http_client import close_http_client, get_http_client, request_timeout
+
+
+def test_client_is_shared_until_closed():
+    async def run():
+        first = get_http_client()
+        assert get_http_client() is first
+        await close_http_client()
+        assert first.is_closed
+        second = get_http_client()
+        assert second is not first
+        await close_http_client()
+
+    asyncio.run(run())
+
+
+def test_closed_client_is_replaced():
+    async def run():
+        first = get_http_client()
+        await first.aclose()
+        second = get_http_client()
+        assert second is not first and not second.is_closed
+        await close_http_client()
+
+    asyncio.run(run())
+
+
+def test_close_without_a_client_is_a_no_op():
+    asyncio.run(close_http_client())
+    assert http_client._client is None
+
+
+def test_request_timeout_keeps_connect_and_pool_limits():
+    timeout = request_timeout(3.5)
+    assert timeout.read == 3.5 and timeout.write == 3.5
+    assert timeout.connect == http_client.HTTP_CONNECT_TIMEOUT
+    assert timeout.pool == http_client.HTTP_POOL_TIMEOUT
+
+
+
+def test_outbound_requests_carry_the_trace():
+    seen = []
+
+    async def handler(request):
+        seen.append(request)
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        client = httpx.AsyncClient(transport=http_client.TracingTransport(httpx.MockTransport(handler)))
+        with telemetry.span("tool", "lookup") as parent:
+            await client.get("http://deals:3000/deal/1")
+        await client.aclose()
+        return parent
+
+    parent = asyncio.run(run())
+    assert "traceparent" in seen[0].headers
+    trace_id, parent_id = telemetry.extract(seen[0].headers["traceparent"])
+    assert trace_id == parent.trace_id and parent_id != parent.span_id
+    client_span = next(span for span in telemetry.trace(trace_id) if span["kind"] == "client")
+    assert client_span["name"] == "GET deals:3000"
+    assert client_span["parent_id"] == parent.span_id
+    assert client_span["attributes"]["status_code"] == 200
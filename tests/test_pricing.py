@@ -0,0 +1,111 @@
+"""
+Tests for sales_agent/pricing.py: tiers, standard and contract discounts, capped rebates
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from sales_agent import agent as sales_agent
+from sales_agent import pricing
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sales_agent", "data")
+DISCOUNTS = pd.read_csv(os.path.join(DATA_DIR, "discount.csv"))
+REBATES = pd.read_csv(os.path.join(DATA_DIR, "rebate.csv"))
+
+
+def price(**columns):
+    return pricing.price_customers(pd.DataFrame(columns), DISCOUNTS, REBATES)
+
+
+def test_parse_volume():
+    assert pricing.parse_volume(["$104,500", "75000", " $1,000 ", "n/a"]).tolist()[:3] == [104500.0, 75000.0, 1000.0]
+    assert pd.isna(pricing.parse_volume(["n/a"])[0])
+    assert pricing.parse_volume([1, 2]).dtype == float
+
+
+@pytest.mark.parametrize("service, column", [
+    ("Ground", "Discount_Ground"),
+    ("2nd Day Air", "Discount_2nd_Day_Air"),
+    (" Next Day Air ", "Discount_Next_Day_Air"),
+])
+def test_service_column(service, column):
+    assert pricing.service_column(service) == column
+
+
+def test_assign_tiers_uses_the_highest_threshold_reached():
+    tiers = pricing.assign_tiers([10000, 25000, 49999, 50000, 99999, 100000, 1e7], DISCOUNTS)
+    assert list(tiers) == [None, "Bronze", "Bronze", "Silver", "Silver", "Gold", "Gold"]
+
+
+def test_standard_discounts_and_rebate():
+    row = price(Annual_Volume=[60000]).iloc[0]
+    assert row["Tier"] == "Silver"
+    assert (row["Discount_Ground"], row["Discount_Next_Day_Air"], row["Discount_International"]) == (30, 40, 25)
+    assert row["Rebate_Percentage"] == 1.5
+    assert row["Rebate_Amount"] == 900.0
+    assert not row["Rebate_Capped"]
+
+
+def test_rebate_uses_the_highest_row_reached_within_the_tier():
+    row = price(Annual_Volume=[80000]).iloc[0]
+    assert (row["Tier"], row["Rebate_Percentage"], row["Max_Rebate"]) == ("Silver", 2.0, 4000)
+
+
+def test_rebate_is_capped():
+    row = price(Annual_Volume=[300000]).iloc[0]
+    assert row["Rebate_Percentage"] == 3.0
+    assert row["Rebate_Amount"] == 7500
+    assert row["Rebate_Capped"]
+
+
+def test_volume_below_every_tier():
+    row = price(Annual_Volume=[1000]).iloc[0]
+    assert row["Tier"] is None
+    assert pd.isna(row["Discount_Ground"]) and pd.isna(row["Rebate_Percentage"])
+    assert row["Rebate_Amount"] == 0
+
+
+def test_contract_terms_take_precedence():
+    row = price(
+        Annual_Volume=["$120,000"],
+        Discount_Structure=["Ground: 42% off published rates, Next Day Air: 55% off"],
+        Rebate_Structure=["2% of total annual spend if they hit $100K, 3% if they hit $150K"],
+    ).iloc[0]
+    assert row["Tier"] == "Gold"
+    assert (row["Discount_Ground"], row["Discount_Next_Day_Air"]) == (42, 55)
+    assert row["Discount_2nd_Day_Air"] == 45  # not in the contract: standard Gold rate
+    assert row["Rebate_Percentage"] == 2.0
+    assert row["Rebate_Amount"] == 2400.0
+
+
+def test_contract_rebate_not_reached_is_zero():
+    row = price(
+        Annual_Volume=[90000],
+        Rebate_Structure=["2% of total annual spend if they hit $100K"],
+    ).iloc[0]
+    assert row["Rebate_Percentage"] == 0.0
+    assert row["Rebate_Amount"] == 0.0
+
+
+def test_contract_terms_can_be_ignored():
+    customers = pd.DataFrame({"Annual_Volume": [60000], "Discount_Structure": ["Ground: 99% off"]})
+    row = pricing.price_customers(customers, DISCOUNTS, REBATES, use_contract_terms=False).iloc[0]
+    assert row["Discount_Ground"] == 30
+
+
+def test_rows_keep_the_customer_order():
+    priced = price(Customer_ID=[3, 1, 2], Annual_Volume=[300000, 1000, 60000])
+    assert priced["Customer_ID"].tolist() == [3, 1, 2]
+    assert priced["Tier"].fillna("-").tolist() == ["Gold", "-", "Silver"]
+
+
+def test_to_records_replaces_nan_with_none():
+    records = pricing.to_records(price(Annual_Volume=[1000]))
+    assert records[0]["Tier"] is None and records[0]["Discount_Ground"] is None
+
+
+def test_calculate_pricing_quotes_a_hypothetical_volume():
+    result = sales_agent.calculate_pricing(annual_volume=60000)
+    assert result["count"] == 1
+    assert result["data"][0]["Tier"] == "Silver"
@@ -0,0 +1,95 @@
+"""
+Tests for DealAgent/projection.py: field paths, presets and empty-value stripping
+"""
+import pytest
+
+from DealAgent.projection import PRESETS, compact_json, parse_fields, project_deal
+
+DEAL = {
+    "bidStart": {
+        "bidHead": {"bidNum": "B1", "bidName": None, "dealStatus": "P", "estAnnGrs": 0, "cny": ""},
+        "bidAcct": [
+            {"acet": "A1", "payTerm": 30, "notes": []},
+            {"acet": "A2", "payTerm": None, "notes": {}},
+        ],
+        "bidComments": [],
+    }
+}
+
+
+def project(fields):
+    return project_deal(DEAL, parse_fields(fields))
+
+
+@pytest.mark.parametrize("fields", [None, "", " , ", "all", "ALL", "bidHead.bidNum,all", "bidStart"])
+def test_fields_that_keep_everything(fields):
+    assert parse_fields(fields) is None
+
+
+def test_string_and_list_forms_are_equivalent():
+    assert parse_fields("bidHead.bidNum, bidAcct[*].acet") == parse_fields(["bidHead.bidNum", "bidAcct[*].acet"])
+
+
+@pytest.mark.parametrize("fields", [
+    "bidHead..bidNum",
+    "bidHead.",
+    "bidAcct[x]",
+    "bidAcct[-1]",
+    "bid Head",
+    "bidHead.1st",
+    "bidAcct[*",
+])
+def test_invalid_paths_raise(fields):
+    with pytest.raises(ValueError, match="Invalid field path"):
+        parse_fields(fields)
+
+
+def test_paths_are_relative_to_bid_start():
+    assert parse_fields("bidStart.bidHead.bidNum") == parse_fields("bidHead.bidNum") == {"bidHead": {"bidNum": None}}
+
+
+def test_wider_path_wins_over_narrower_paths():
+    assert parse_fields("bidHead.bidNum,bidHead") == {"bidHead": None}
+    assert parse_fields("bidHead,bidHead.bidNum") == {"bidHead": None}
+
+
+def test_single_field():
+    assert project("bidHead.bidNum") == {"bidStart": {"bidHead": {"bidNum": "B1"}}}
+
+
+def test_every_list_item():
+    assert project("bidAcct[*].acet") == {"bidStart": {"bidAcct": [{"acet": "A1"}, {"acet": "A2"}]}}
+
+
+def test_one_list_item_and_out_of_range_indexes():
+    assert project("bidAcct[1].acet") == {"bidStart": {"bidAcct": [{"acet": "A2"}]}}
+    assert project("bidAcct[5].acet") == {"bidStart": {}}
+
+
+def test_unknown_fields_are_dropped():
+    assert project("bidHead.nope,missing[*].x") == {"bidStart": {}}
+
+
+def test_path_into_a_scalar_is_dropped():
+    assert project("bidHead.bidNum.value") == {"bidStart": {}}
+
+
+def test_nulls_and_empty_values_are_stripped_but_zero_is_kept():
+    projected = project("all")["bidStart"]
+    assert projected["bidHead"] == {"bidNum": "B1", "dealStatus": "P", "estAnnGrs": 0}
+    assert projected["bidAcct"] == [{"acet": "A1", "payTerm": 30}, {"acet": "A2"}]
+    assert "bidComments" not in projected
+
+
+def test_presets():
+    assert set(project("summary")["bidStart"]) == {"bidHead", "bidAcct"}
+    assert project("accounts")["bidStart"]["bidAcct"][0] == {"acet": "A1", "payTerm": 30}
+    assert all(path.split(".")[0].split("[")[0] in ("bidHead", "bidAcct") for path in PRESETS["summary"])
+
+
+def test_document_without_the_wrapper():
+    assert project_deal(DEAL["bidStart"], parse_fields("bidHead.dealStatus")) == {"bidHead": {"dealStatus": "P"}}
+
+
+def test_compact_json():
+    assert compact_json({"a": [1, "é"]}) == '{"a":[1,"é"]}'
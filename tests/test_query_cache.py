@@ -0,0 +1,137 @@
+"""
+Tests for common/query_cache.py: normalization, TTL/LRU, single-flight and bypass
+"""
+import asyncio
+import time
+
+import pytest
+
+from common.query_cache import QueryCache, normalize_query
+
+
+class Computation:
+    """A coroutine factory counting its runs; each run waits for `delay` seconds."""
+
+    def __init__(self, value="answer", delay=0.0, error=None):
+        self.value = value
+        self.delay = delay
+        self.error = error
+        self.runs = 0
+
+    async def __call__(self):
+        self.runs += 1
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return f"{self.value} {self.runs}"
+
+
+@pytest.mark.parametrize("query, key", [
+    ("Find CompanyABC's deal", "find companyabc's deal"),
+    ("  find   companyabc's deal?! ", "find companyabc's deal"),
+    ("FIND COMPANYABC'S DEAL.", "find companyabc's deal"),
+])
+def test_normalize_query(query, key):
+    assert normalize_query(query) == key
+
+
+def test_disabled_cache_bypasses():
+    cache = QueryCache(enabled=False)
+    compute = Computation()
+
+    async def run():
+        return [await cache.get_or_compute("q", compute) for _ in range(2)]
+
+    assert asyncio.run(run()) == [("answer 1", "bypass"), ("answer 2", "bypass")]
+    assert cache.stats()["entries"] == 0
+
+
+def test_miss_then_hit_for_equivalent_queries():
+    cache = QueryCache(enabled=True, ttl=60)
+    compute = Computation()
+
+    async def run():
+        return [await cache.get_or_compute(query, compute) for query in ("Deal of ABC?", "deal  of abc")]
+
+    assert asyncio.run(run()) == [("answer 1", "miss"), ("answer 1", "hit")]
+    assert compute.runs == 1
+
+
+def test_concurrent_identical_queries_share_one_run():
+    cache = QueryCache(enabled=True, ttl=60)
+    compute = Computation(delay=0.05)
+
+    async def run():
+        return await asyncio.gather(*(cache.get_or_compute("q", compute) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert compute.runs == 1
+    assert sorted(status for _, status in results) == ["coalesced"] * 4 + ["miss"]
+    assert {value for value, _ in results} == {"answer 1"}
+
+
+def test_expired_entry_is_recomputed():
+    cache = QueryCache(enabled=True, ttl=0.01)
+    compute = Computation()
+
+    async def run():
+        first = await cache.get_or_compute("q", compute)
+        time.sleep(0.02)
+        return first, await cache.get_or_compute("q", compute)
+
+    assert asyncio.run(run()) == (("answer 1", "miss"), ("answer 2", "miss"))
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = QueryCache(enabled=True, ttl=60, max_entries=2)
+
+    async def run():
+        for query in ("a", "b", "a", "c"):
+            await cache.get_or_compute(query, Computation(query))
+        return [(await cache.get_or_compute(query, Computation("new")))[1] for query in ("a", "c", "b")]
+
+    assert asyncio.run(run()) == ["hit", "hit", "miss"]
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_errors_are_shared_but_not_cached():
+    cache = QueryCache(enabled=True, ttl=60)
+    failing = Computation(delay=0.02, error=RuntimeError("model overloaded"))
+
+    async def run():
+        results = await asyncio.gather(*(cache.get_or_compute("q", failing) for _ in range(3)), return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        return await cache.get_or_compute("q", Computation("recovered"))
+
+    assert asyncio.run(run()) == ("recovered 1", "miss")
+    assert failing.runs == 1
+
+
+def test_first_caller_leaving_does_not_cancel_the_shared_run():
+    cache = QueryCache(enabled=True, ttl=60)
+    compute = Computation(delay=0.05)
+
+    async def run():
+        first = asyncio.create_task(cache.get_or_compute("q", compute))
+        await asyncio.sleep(0.01)
+        second = asyncio.create_task(cache.get_or_compute("q", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(run()) == ("answer 1", "coalesced")
+    assert compute.runs == 1
+
+
+def test_answer_computed_across_an_invalidation_is_not_stored():
+    cache = QueryCache(enabled=True, ttl=60)
+
+    async def run():
+        task = asyncio.create_task(cache.get_or_compute("q", Computation(delay=0.05)))
+        await asyncio.sleep(0.01)
+        cache.invalidate()
+        assert await task == ("answer 1", "miss")
+        return await cache.get_or_compute("q", Computation("fresh"))
+
+    assert asyncio.run(run()) == ("fresh 1", "miss")
+    assert cache.stats()["invalidations"] == 1
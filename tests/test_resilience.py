@@ -0,0 +1,334 @@
+"""
+Tests for DealAgent/resilience.py: circuit breaker states, retry rules and hedging
+
+The backends talk to httpx.MockTransport handlers instead of real replicas.
+Run with `python -m pytest -q` from the repository root.
+"""
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List
+
+import httpx
+import pytest
+
+from DealAgent import resilience
+from DealAgent.resilience import Backend, BackendUnavailable, CircuitBreaker
+
+Handler = Callable[[httpx.Request], Awaitable[httpx.Response]]
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Route the backends' requests to an async handler; returns the list of requests seen."""
+    seen: List[httpx.Request] = []
+
+    def install(handler: Handler) -> List[httpx.Request]:
+        async def record(request: httpx.Request) -> httpx.Response:
+            seen.append(request)
+            return await handler(request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(record))
+        monkeypatch.setattr(resilience, "get_http_client", lambda: client)
+        return seen
+
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0.01)
+    return install
+
+
+def warm(backend: Backend, latency: float = 0.01, samples: int = resilience.HEDGE_MIN_SAMPLES) -> None:
+    """Give the backend enough recent GET latencies for its quantiles."""
+    for _ in range(samples):
+        backend._record_latency(latency)
+
+
+# -- circuit breaker ----------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failures=3, reset_after=60)
+    assert not breaker.failure()
+    assert not breaker.failure()
+    assert breaker.failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failures=2, reset_after=60)
+    breaker.failure()
+    breaker.success()
+    assert not breaker.failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_open_allows_one_probe():
+    breaker = CircuitBreaker(failures=1, reset_after=0.0)
+    breaker.failure()
+    assert breaker.allow()
+    assert breaker.state == "half_open"
+    assert not breaker.allow()
+    breaker.success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_breaker_failed_probe_reopens():
+    breaker = CircuitBreaker(failures=5, reset_after=0.0)
+    for _ in range(5):
+        breaker.failure()
+    assert breaker.allow()
+    assert breaker.failure()
+    assert breaker.state == "open"
+    assert breaker.opens == 2
+
+
+def test_breaker_released_probe_can_be_retried():
+    breaker = CircuitBreaker(failures=1, reset_after=0.0)
+    breaker.failure()
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_open_circuits_reject_without_sending(serve):
+    async def handler(request):
+        return httpx.Response(500)
+
+    seen = serve(handler)
+    backend = Backend("test", ["http://a"], retries=0)
+    backend.replicas[0].breaker = CircuitBreaker(failures=2, reset_after=60)
+
+    async def run():
+        for _ in range(2):
+            assert (await backend.request("GET", "/", timeout=1)).status_code == 500
+        with pytest.raises(BackendUnavailable):
+            await backend.request("GET", "/", timeout=1)
+
+    asyncio.run(run())
+    assert len(seen) == 2
+    assert backend.replicas[0].breaker.state == "open"
+    assert backend.rejected == 1
+
+
+def test_retry_moves_to_another_replica(serve):
+    async def handler(request):
+        return httpx.Response(502 if request.url.host == "a" else 200)
+
+    seen = serve(handler)
+    backend = Backend("test", ["http://a", "http://b"], hedge=False, retries=2)
+    backend.replicas[1].ewma = 1.0  # a is picked first
+
+    response = asyncio.run(backend.request("GET", "/", timeout=1))
+    assert response.status_code == 200
+    assert [request.url.host for request in seen] == ["a", "b"]
+
+
+# -- retry rules --------------------------------------------------------------
+
+def flaky(first: Callable[[httpx.Request], httpx.Response]) -> Handler:
+    """A handler whose first call runs `first` (which may raise) and later calls answer 200."""
+    calls = {"n": 0}
+
+    async def handler(request):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return first(request)
+        return httpx.Response(200)
+
+    return handler
+
+
+def raise_(error: Exception):
+    def first(request):
+        raise error
+    return first
+
+
+@pytest.mark.parametrize("method", ["GET", "POST"])
+@pytest.mark.parametrize("first", [
+    raise_(httpx.ConnectError("refused")),
+    raise_(httpx.ConnectTimeout("connect timeout")),
+    lambda request: httpx.Response(429),
+    lambda request: httpx.Response(503),
+])
+def test_unprocessed_requests_are_retried(serve, method, first):
+    seen = serve(flaky(first))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    response = asyncio.run(backend.request(method, "/", timeout=2, json={} if method == "POST" else None))
+    assert response.status_code == 200
+    assert len(seen) == 2
+    assert backend.retried == 1
+
+
+@pytest.mark.parametrize("first", [
+    raise_(httpx.ReadTimeout("read timeout")),
+    raise_(httpx.RemoteProtocolError("connection closed")),
+    lambda request: httpx.Response(502),
+    lambda request: httpx.Response(504),
+])
+def test_get_is_retried_after_possible_delivery(serve, first):
+    seen = serve(flaky(first))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    assert asyncio.run(backend.request("GET", "/", timeout=2)).status_code == 200
+    assert len(seen) == 2
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout("read timeout"), httpx.RemoteProtocolError("connection closed")])
+def test_post_is_not_resent_after_possible_delivery(serve, error):
+    seen = serve(flaky(raise_(error)))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    with pytest.raises(type(error)):
+        asyncio.run(backend.request("POST", "/", timeout=2, json={}))
+    assert len(seen) == 1
+    assert backend.retried == 0
+
+
+@pytest.mark.parametrize("status", [500, 502, 504])
+def test_post_is_not_resent_after_a_gateway_error(serve, status):
+    seen = serve(flaky(lambda request: httpx.Response(status)))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    assert asyncio.run(backend.request("POST", "/", timeout=2, json={})).status_code == status
+    assert len(seen) == 1
+
+
+def test_retries_stop_after_the_configured_attempts(serve):
+    async def handler(request):
+        return httpx.Response(503)
+
+    seen = serve(handler)
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    assert asyncio.run(backend.request("GET", "/", timeout=2)).status_code == 503
+    assert len(seen) == 3
+
+
+def test_retry_after_delays_the_retry(serve):
+    seen = serve(flaky(lambda request: httpx.Response(429, headers={"Retry-After": "0.3"})))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    started = time.monotonic()
+    assert asyncio.run(backend.request("POST", "/", timeout=2, json={})).status_code == 200
+    assert time.monotonic() - started >= 0.3
+    assert len(seen) == 2
+
+
+def test_retry_after_past_the_deadline_returns_the_response(serve):
+    seen = serve(flaky(lambda request: httpx.Response(503, headers={"Retry-After": "30"})))
+    backend = Backend("test", ["http://a"], hedge=False, retries=2)
+    started = time.monotonic()
+    response = asyncio.run(backend.request("GET", "/", timeout=1))
+    assert response.status_code == 503
+    assert time.monotonic() - started < 0.5
+    assert len(seen) == 1
+
+
+def test_retry_after_accepts_an_http_date():
+    response = httpx.Response(503, headers={"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})
+    assert resilience.retry_after(response) == 0.0
+    assert resilience.retry_after(httpx.Response(503, headers={"Retry-After": "soon"})) is None
+    assert resilience.retry_after(httpx.Response(503)) is None
+
+
+def test_latency_cutoff_applies_to_get_only():
+    backend = Backend("test", ["http://a"])
+    assert backend.attempt_timeout("GET", 10) == 10
+    warm(backend, latency=0.5)
+    assert backend.attempt_timeout("GET", 10) == pytest.approx(resilience.ATTEMPT_TIMEOUT_FACTOR * 0.5)
+    assert backend.attempt_timeout("POST", 10) == 10
+
+
+def test_post_latencies_do_not_feed_the_quantiles(serve):
+    async def handler(request):
+        return httpx.Response(200)
+
+    serve(handler)
+    backend = Backend("test", ["http://a"], hedge=False)
+
+    async def run():
+        for _ in range(resilience.HEDGE_MIN_SAMPLES):
+            await backend.request("POST", "/", timeout=1, json={})
+
+    asyncio.run(run())
+    assert backend.quantile(0.99) is None
+
+
+# -- hedging --------------------------------------------------------------------
+
+def slow_replica(delays: Dict[str, float], cancelled: List[str]) -> Handler:
+    async def handler(request):
+        host = request.url.host
+        try:
+            await asyncio.sleep(delays.get(host, 0.0))
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return httpx.Response(200, text=host)
+
+    return handler
+
+
+def hedging_backend() -> Backend:
+    backend = Backend("test", ["http://slow", "http://fast"], hedge=True, retries=0)
+    warm(backend)
+    backend.calls = 100  # room under HEDGE_MAX_RATIO
+    backend.replicas[1].ewma = 1.0  # slow is picked first
+    return backend
+
+
+def test_slow_get_is_hedged_and_the_loser_cancelled(serve):
+    cancelled: List[str] = []
+    serve(slow_replica({"slow": 2.0}, cancelled))
+    backend = hedging_backend()
+
+    started = time.monotonic()
+    response = asyncio.run(backend.request("GET", "/", timeout=5))
+    assert response.text == "fast"
+    assert time.monotonic() - started < 1.0
+    assert backend.hedges == 1 and backend.hedge_wins == 1
+    assert cancelled == ["slow"]
+    assert all(replica.outstanding == 0 for replica in backend.replicas)
+
+
+def test_fast_get_is_not_hedged(serve):
+    seen = serve(slow_replica({}, []))
+    backend = hedging_backend()
+    assert asyncio.run(backend.request("GET", "/", timeout=5)).text == "slow"
+    assert backend.hedges == 0
+    assert len(seen) == 1
+
+
+def test_post_is_never_hedged(serve):
+    seen = serve(slow_replica({"slow": 0.2}, []))
+    backend = hedging_backend()
+    assert asyncio.run(backend.request("POST", "/", timeout=5, json={})).text == "slow"
+    assert backend.hedges == 0
+    assert len(seen) == 1
+
+
+def test_hedges_are_capped_by_ratio(serve):
+    seen = serve(slow_replica({"slow": 0.1}, []))
+    backend = hedging_backend()
+    backend.calls, backend.hedges = 9, 1  # one hedge in ten calls already used up the default 0.1
+    assert asyncio.run(backend.request("GET", "/", timeout=5)).text == "slow"
+    assert backend.hedges == 1
+    assert len(seen) == 1
+
+
+@pytest.mark.parametrize("cancel_after", [0.005, 0.1])
+def test_cancelled_caller_cancels_every_attempt(serve, cancel_after):
+    # 0.005 s: still waiting for the p95 before hedging; 0.1 s: both attempts running
+    cancelled: List[str] = []
+    serve(slow_replica({"slow": 2.0, "fast": 2.0}, cancelled))
+    backend = hedging_backend()
+
+    async def run():
+        call = asyncio.create_task(backend.request("GET", "/", timeout=5))
+        await asyncio.sleep(cancel_after)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+        # Let the cancelled attempts unwind; checked before asyncio.run would cancel leftover tasks itself
+        await asyncio.sleep(0.05)
+        assert sorted(cancelled) == (["slow"] if cancel_after < 0.01 else ["fast", "slow"])
+        assert all(replica.outstanding == 0 for replica in backend.replicas)
+
+    asyncio.run(run())
+    assert all(replica.breaker.state == "closed" and not replica.breaker._probing for replica in backend.replicas)
@@ -0,0 +1,117 @@
+"""
+Tests for sales_agent/router.py: intent patterns, templated answers and agent fallback
+"""
+import os
+
+import pytest
+
+from sales_agent.router import IntentRouter, normalize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CUSTOMER_DB = os.path.join(ROOT, "sales_agent", "database", "customer.sqlite")
+
+
+@pytest.fixture
+def router():
+    return IntentRouter(CUSTOMER_DB, enabled=True)
+
+
+@pytest.mark.parametrize("query, text", [
+    ("  Please, could you   list all customers?! ", "list all customers"),
+    ("Hi can you show customer 2.", "show customer 2"),
+    ("OK please get the rebate tiers", "get the rebate tiers"),
+])
+def test_normalize(query, text):
+    assert normalize(query) == text
+
+
+@pytest.mark.parametrize("query, intent, tool", [
+    ("list all customers", "list_customers", "list-customers"),
+    ("customers", "list_customers", "list-customers"),
+    ("Customer list", "list_customers", "list-customers"),
+    ("show customer 2", "customer_by_id", "get-customer-by-id"),
+    ("customer #3", "customer_by_id", "get-customer-by-id"),
+    ("get details for customer id 1", "customer_by_id", "get-customer-by-id"),
+    ("customer 1's profile", "customer_by_id", "get-customer-by-id"),
+    ("get customer id for TechCorp", "customer_id", "get-customer-info"),
+    ("What is CompanyABC's customer id?", "customer_id", "get-customer-info"),
+    ("customer info for CompanyABC", "customer_info", "get-customer-info"),
+    ("show me Global Logistics Inc's details", "customer_info", "get-customer-info"),
+    ("discount tiers", "discount_tiers", "load_discount_data"),
+    ("gold discounts on ground", "discount_tiers", "load_discount_data"),
+    ("What are the discount rates for the Silver tier for next day air?", "discount_tiers", "load_discount_data"),
+    ("rebate tiers for bronze", "rebate_tiers", "load_rebate_data"),
+    ("silver rebate table", "rebate_tiers", "load_rebate_data"),
+])
+def test_structured_queries_are_routed(router, query, intent, tool):
+    answer = router.route(query)
+    assert answer is not None, query
+    assert (answer.intent, answer.tool) == (intent, tool)
+
+
+@pytest.mark.parametrize("query", [
+    "Which customer should get a bigger discount next year?",
+    "list all customers in Texas",
+    "compare CompanyABC and TechCorp Solutions",
+    "What discounts and rebates apply for CompanyABC",
+    "platinum discounts",
+    "discount tiers for gold on freight",
+])
+def test_open_ended_queries_fall_back(router, query):
+    assert router.route(query) is None
+
+
+def test_lookups_that_find_nothing_fall_back(router):
+    assert router.route("customer info for Nonexistent Co") is None
+    assert router.route("show customer 99") is None
+    assert router.stats()["fallbacks"] == 2 and router.stats()["routed"] == {}
+
+
+def test_list_answer(router):
+    answer = router.route("list customers")
+    assert answer.response.splitlines() == [
+        "There are 3 customers:", "- 1: CompanyABC", "- 2: TechCorp Solutions", "- 3: Global Logistics Inc",
+    ]
+    assert len(answer.data) == 3
+
+
+def test_long_lists_are_summarized(router, monkeypatch):
+    from sales_agent import router as router_module
+
+    monkeypatch.setattr(router_module, "ROUTER_MAX_ROWS", 2)
+    assert router.route("list customers").response.splitlines()[-1] == "... and 1 more"
+
+
+def test_customer_answers(router):
+    info = router.route("customer info for companyabc").response
+    assert info.startswith("CompanyABC (Customer ID 1)\n- Annual volume: $104,500")
+    assert router.route("get customer id for techcorp").response == "The customer ID for TechCorp Solutions is 2."
+
+
+def test_ambiguous_customer_id_lists_the_matches(router):
+    answer = router.route("get customer id for o")
+    assert answer.response.startswith('3 customers match "o":')
+    assert [row["Customer_ID"] for row in answer.data] == [1, 2, 3]
+
+
+def test_tier_answers(router):
+    discount = router.route("gold discounts on next day air")
+    assert discount.response.splitlines() == [
+        "Discount tiers (Gold, Next Day Air):",
+        "- Gold, Next Day Air: 50% off from 100,000 annual volume",
+    ]
+    rebate = router.route("rebate tiers for silver")
+    assert rebate.response.splitlines()[0] == "Rebate tiers (Silver):"
+    assert all(row["Tier"] == "Silver" for row in rebate.data)
+
+
+def test_disabled_router_routes_nothing():
+    router = IntentRouter(CUSTOMER_DB, enabled=False)
+    assert router.route("list all customers") is None
+    assert router.stats() == {"enabled": False, "routed": {}, "fallbacks": 0}
+
+
+def test_router_does_not_write_to_the_database(router):
+    router.route("list customers")
+    with pytest.raises(Exception, match="readonly"):
+        router._local.conn.execute("DELETE FROM customer")
@@ -0,0 +1,117 @@
+"""
+Tests for sales_agent/fastapi_server.py: background startup, health probes and Toolbox retries
+
+The agent build is replaced, so neither Gemini nor a Toolbox server is needed.
+"""
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from sales_agent import fastapi_server as server
+
+
+class FakeToolbox:
+    """Fails the first `failures` toolset loads, then returns one tool."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.attempts = 0
+        self.closed = False
+
+    async def aload_toolset(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise ConnectionError("connection refused")
+        return ["search-customers"]
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def startup(monkeypatch):
+    """Replace the agent build; set startup.error to fail it, or startup.ready to an Event to delay it."""
+    state = SimpleNamespace(error=None, ready=None, toolbox=FakeToolbox())
+
+    async def initialize_agent(app):
+        app.state.toolbox = state.toolbox
+        if state.ready is not None:
+            await asyncio.to_thread(state.ready.wait)
+        if state.error:
+            app.state.init_error = state.error
+        else:
+            app.state.agent = object()
+
+    monkeypatch.setattr(server, "initialize_agent", initialize_agent)
+    monkeypatch.setattr(server, "watch_data_sources", lambda: None)
+    monkeypatch.setattr(server.router, "route", lambda query: None)
+    return state
+
+
+def wait_for(client, path, status_code):
+    for _ in range(100):
+        response = client.get(path)
+        if response.status_code == status_code:
+            return response
+        time.sleep(0.01)
+    raise AssertionError(f"{path} never returned {status_code}")
+
+
+def test_ready_once_the_agent_is_built(startup):
+    with TestClient(server.app) as client:
+        assert client.get("/health/live").json()["status"] == "alive"
+        assert wait_for(client, "/health/ready", 200).json()["status"] == "ready"
+    assert startup.toolbox.closed
+    assert server.app.state.agent is None
+
+
+def test_queries_wait_for_startup_with_503(startup):
+    startup.ready = threading.Event()
+    try:
+        with TestClient(server.app) as client:
+            assert client.get("/health/ready").status_code == 503
+            response = client.post("/query", json={"query": "What is CompanyABC's tier?"})
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "1"
+            assert client.get("/health/live").status_code == 200
+            startup.ready.set()
+    finally:
+        startup.ready.set()
+
+
+def test_failed_startup_fails_liveness(startup):
+    startup.error = "GOOGLE_API_KEY not set"
+    with TestClient(server.app) as client:
+        response = wait_for(client, "/health/live", 503)
+        assert response.json() == {"status": "failed", "error": "GOOGLE_API_KEY not set"}
+        assert client.post("/query", json={"query": "What is CompanyABC's tier?"}).status_code == 500
+
+
+def test_missing_api_key_is_an_init_error(monkeypatch):
+    monkeypatch.delenv("GOOGLE_API_KEY", raising=False)
+    app = SimpleNamespace(state=SimpleNamespace(init_error=None, agent=None))
+    asyncio.run(server.initialize_agent(app))
+    assert app.state.init_error == "GOOGLE_API_KEY not set"
+    assert app.state.agent is None
+
+
+# -- Toolbox connection --------------------------------------------------------------
+
+def test_toolbox_load_is_retried(monkeypatch):
+    monkeypatch.setattr(server, "TOOLBOX_RETRY_DELAY", 0.001)
+    toolbox = FakeToolbox(failures=2)
+    assert asyncio.run(server.load_toolbox_tools(toolbox)) == ["search-customers"]
+    assert toolbox.attempts == 3
+
+
+def test_toolbox_load_gives_up(monkeypatch):
+    monkeypatch.setattr(server, "TOOLBOX_RETRY_DELAY", 0.001)
+    monkeypatch.setattr(server, "TOOLBOX_CONNECT_ATTEMPTS", 3)
+    toolbox = FakeToolbox(failures=5)
+    with pytest.raises(ConnectionError):
+        asyncio.run(server.load_toolbox_tools(toolbox))
+    assert toolbox.attempts == 3
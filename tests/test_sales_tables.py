@@ -0,0 +1,66 @@
+"""
+Tests for the discount/rebate table tools in sales_agent/agent.py: parse caching and row filters
+"""
+import os
+import shutil
+import time
+
+import pytest
+
+from sales_agent import agent as sales_agent
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sales_agent", "data")
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """A copy of the sales data directory the loaders read from, with an empty table cache."""
+    for name in ("discount.csv", "rebate.csv"):
+        shutil.copy(os.path.join(DATA_DIR, name), tmp_path / name)
+    monkeypatch.setattr(sales_agent, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(sales_agent, "_table_cache", {})
+    return tmp_path
+
+
+def test_table_is_parsed_once(data_dir):
+    first = sales_agent.load_table("discount.csv")
+    assert sales_agent.load_table("discount.csv") is first
+    assert len(first) == 12
+
+
+def test_table_is_reparsed_when_the_file_changes(data_dir):
+    first = sales_agent.load_table("rebate.csv")
+    time.sleep(0.01)
+    with open(data_dir / "rebate.csv", "a") as f:
+        f.write("\nPlatinum,500000,4,20000\n")
+    second = sales_agent.load_table("rebate.csv")
+    assert second is not first
+    assert "Platinum" in set(second["Tier"])
+
+
+def test_discounts_unfiltered(data_dir):
+    result = sales_agent.load_discount_data()
+    assert result["status"] == "success"
+    assert len(result["data"]) == 12
+
+
+def test_discounts_by_tier_and_service_ignore_case(data_dir):
+    rows = sales_agent.load_discount_data(tier=" gold ", service_type="next day air")["data"]
+    assert rows == [{"Tier": "Gold", "Min_Volume": 100000, "Discount_Rate": 50, "Service_Type": "Next Day Air"}]
+
+
+def test_discounts_reached_by_annual_volume(data_dir):
+    rows = sales_agent.load_discount_data(annual_volume=60000, service_type="Ground")["data"]
+    assert sorted(row["Tier"] for row in rows) == ["Bronze", "Silver"]
+
+
+def test_rebates_by_tier_and_volume(data_dir):
+    rows = sales_agent.load_rebate_data(tier="Silver", annual_volume=60000)["data"]
+    assert [(row["Min_Volume"], row["Rebate_Percentage"]) for row in rows] == [(50000, 1.5)]
+    assert sales_agent.load_rebate_data(annual_volume=10000)["data"] == []
+
+
+def test_unknown_tier_returns_no_rows(data_dir):
+    result = sales_agent.load_rebate_data(tier="Platinum")
+    assert result["data"] == []
+    assert result["message"] == "Loaded 0 rebate tiers"
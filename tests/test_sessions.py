@@ -0,0 +1,194 @@
+"""
+Tests for DealAgent/sessions.py: session expiry and eviction, and the per-conversation tool memory
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from common import data_watch
+from DealAgent import sessions
+from DealAgent.sessions import (
+    CUSTOMERS_KEY, DEALS_KEY, InMemorySessionStore, context_note, recall, remember, trim_history,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions, "time", clock)
+    return clock
+
+
+def hold(session):
+    """Take a session's turn lock, as a running turn does."""
+    asyncio.run(session.lock.acquire())
+
+
+# -- store ---------------------------------------------------------------------------
+
+def test_open_creates_then_reuses(clock):
+    store = InMemorySessionStore(ttl=60, max_sessions=10)
+    session, created = store.open("a")
+    clock.now += 30
+    again, created_again = store.open("a")
+    assert created and not created_again and again is session
+    assert session.last_used == clock.now
+
+
+def test_idle_sessions_expire(clock):
+    store = InMemorySessionStore(ttl=60, max_sessions=10)
+    store.open("a")
+    clock.now += 30
+    store.open("b")
+    clock.now += 31
+    store.open("c")
+    assert store.drain_evicted() == ["a"]
+    assert store.drain_evicted() == []
+    assert store.stats()["expired"] == 1 and store.stats()["active"] == 2
+
+
+def test_least_recently_used_session_is_evicted(clock):
+    store = InMemorySessionStore(ttl=60, max_sessions=2)
+    store.open("a")
+    store.open("b")
+    store.open("a")
+    store.open("c")
+    assert store.drain_evicted() == ["b"]
+    assert store.stats()["evicted"] == 1
+
+
+def test_session_with_a_running_turn_is_not_evicted(clock):
+    store = InMemorySessionStore(ttl=60, max_sessions=1)
+    busy, _ = store.open("a")
+    hold(busy)
+    store.open("b")
+    assert store.drain_evicted() == []
+    assert store.stats()["active"] == 2
+    busy.lock.release()
+    store.open("c")
+    assert store.drain_evicted() == ["a", "b"]
+
+
+def test_expired_session_with_a_running_turn_is_kept(clock):
+    store = InMemorySessionStore(ttl=60, max_sessions=10)
+    busy, _ = store.open("a")
+    hold(busy)
+    clock.now += 120
+    store.open("b")
+    assert store.drain_evicted() == []
+    assert store.open("a") == (busy, False)
+
+
+def test_close(clock):
+    store = InMemorySessionStore()
+    store.open("a")
+    assert store.close("a") and not store.close("a")
+
+
+def test_store_is_abstract():
+    with pytest.raises(TypeError):
+        sessions.SessionStore()
+
+
+# -- tool memory ---------------------------------------------------------------------------
+
+RESOLVED = {"status": "success", "customer_id": 1, "company_name": "CompanyABC", "candidates": []}
+
+
+def deal(customer_id):
+    return {"bidStart": {"bidHead": {"bidNum": f"B{customer_id}"}}}
+
+
+def test_resolved_customer_is_recalled_by_either_name():
+    state = {}
+    remember(state, "resolve_customer", {"company_name": "company abc"}, RESOLVED)
+    for name in ("Company ABC", "companyabc"):
+        recalled = recall(state, "resolve_customer", {"company_name": name})
+        assert recalled["customer_id"] == 1 and recalled["source"] == "session"
+    assert recall(state, "resolve_customer", {"company_name": "TechCorp"}) is None
+
+
+@pytest.mark.parametrize("result", [
+    {"status": "error", "error": "timeout"},
+    {"status": "ambiguous", "candidates": []},
+    {**RESOLVED, "source": "session"},
+    "not a dict",
+])
+def test_errors_and_unresolved_results_are_not_remembered(result):
+    state = {}
+    remember(state, "resolve_customer", {"company_name": "CompanyABC"}, result)
+    assert state == {}
+
+
+def test_deals_are_recalled_per_projection():
+    state = {}
+    remember(state, "get_deal_by_customer_id", {"customer_id": 1, "fields": "summary"}, deal(1))
+    assert recall(state, "get_deal_by_customer_id", {"customer_id": 1, "fields": "summary"}) == deal(1)
+    assert recall(state, "get_deal_by_customer_id", {"customer_id": 1}) is None
+
+
+def test_batch_is_recalled_only_when_every_deal_is_known():
+    state = {}
+    remember(state, "get_deals_by_customer_ids", {"customer_ids": [1, 2]}, {"deals": {"1": deal(1), "2": deal(2)}})
+    assert recall(state, "get_deal_by_customer_id", {"customer_id": 2}) == deal(2)
+    assert recall(state, "get_deals_by_customer_ids", {"customer_ids": [2, 1]})["deals"] == {"2": deal(2), "1": deal(1)}
+    assert recall(state, "get_deals_by_customer_ids", {"customer_ids": [1, 3]}) is None
+    assert recall(state, "get_deals_by_customer_ids", {"customer_ids": []}) is None
+
+
+def test_only_the_most_recent_deals_are_kept(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_MAX_DEALS", 2)
+    state = {}
+    for customer_id in (1, 2, 1, 3):
+        remember(state, "get_deal_by_customer_id", {"customer_id": customer_id}, deal(customer_id))
+    assert list(state[DEALS_KEY]) == ["1", "3"]
+
+
+def test_deals_are_forgotten_when_the_deal_files_change(monkeypatch):
+    monkeypatch.setattr(data_watch, "bus", data_watch.InvalidationBus())
+    state = {}
+    remember(state, "get_deal_by_customer_id", {"customer_id": 1}, deal(1))
+    assert recall(state, "get_deal_by_customer_id", {"customer_id": 1}) == deal(1)
+    data_watch.bus.publish("deals")
+    assert recall(state, "get_deal_by_customer_id", {"customer_id": 1}) is None
+    assert context_note(state) is None
+    remember(state, "get_deal_by_customer_id", {"customer_id": 2}, deal(2))
+    assert list(state[DEALS_KEY]) == ["2"]
+
+
+def test_context_note_lists_known_customers_and_deals():
+    state = {}
+    assert context_note(state) is None
+    remember(state, "resolve_customer", {"company_name": "CompanyABC"}, RESOLVED)
+    remember(state, "get_deal_by_customer_id", {"customer_id": 1, "fields": "summary"}, deal(1))
+    note = context_note(state)
+    assert "- CompanyABC: customer_id 1" in note
+    assert "- deal for customer_id 1 already fetched (fields: summary)" in note
+    assert len(state[CUSTOMERS_KEY]) == 1
+
+
+# -- history ---------------------------------------------------------------------------
+
+def content(role, text=None):
+    part = SimpleNamespace(text=text)
+    return SimpleNamespace(role=role, parts=[part])
+
+
+def test_trim_history_keeps_whole_recent_turns():
+    history = [
+        content("user", "q1"), content("model", "a1"),
+        content("user", "q2"), content("model"), content("user"), content("model", "a2"),
+        content("user", "q3"),
+    ]
+    assert trim_history(history, max_turns=2) == history[2:]
+    assert trim_history(history, max_turns=3) == history
+    assert trim_history(history, max_turns=0) == history
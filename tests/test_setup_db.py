@@ -0,0 +1,153 @@
+"""
+Tests for sales_agent/database/setup_db.py: normalized customer schema and structure parsing
+"""
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from sales_agent.database import setup_db
+
+HEADER = "Customer_ID,Company_Name,Annual_Volume,Discount_Structure,Rebate_Structure\n"
+ROWS = [
+    '1,"CompanyABC","$104,500","Ground: 40% off published rates, 2nd Day Air: 45% off","2% of total annual spend if they hit $100K, 3% if they hit $150K"\n',
+    '2,"TechCorp Solutions","$87,200","Next Day Air: 45% off","1.5% of total annual spend if they hit $75K"\n',
+    '3,"Global Logistics Inc","n/a",,\n',
+]
+
+
+def write_csv(path, rows):
+    path.write_text(HEADER + "".join(rows))
+    return str(path)
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A customer database built from ROWS; returns an open connection to it."""
+    db_path = str(tmp_path / "customer.sqlite")
+    setup_db.csv_to_sqlite(write_csv(tmp_path / "customer.csv", ROWS), db_path)
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.mark.parametrize("value, amount", [
+    ("$104,500", 104500.0),
+    ("$100K", 100000.0),
+    ("$1.5M", 1500000.0),
+    (87200, 87200.0),
+    ("n/a", None),
+    (None, None),
+])
+def test_parse_money(value, amount):
+    assert setup_db.parse_money(value) == amount
+
+
+def test_parse_volumes_matches_parse_money():
+    values = pd.Series(["$104,500", "$100K", "n/a"])
+    parsed = setup_db.parse_volumes(values)
+    assert parsed.tolist()[:2] == [104500.0, 100000.0]
+    assert pd.isna(parsed[2])
+
+
+def test_parse_discount_structure():
+    parsed = setup_db.parse_discount_structure("Ground: 40% off published rates, 2nd Day Air: 45.5% off")
+    assert parsed == (("Ground", 40.0), ("2nd Day Air", 45.5))
+    assert setup_db.parse_discount_structure(float("nan")) == ()
+
+
+def test_parse_rebate_structure():
+    parsed = setup_db.parse_rebate_structure("2% of total annual spend if they hit $100K, 3% if they hit $150K")
+    assert parsed == ((100000.0, 2.0), (150000.0, 3.0))
+    assert setup_db.parse_rebate_structure(None) == ()
+
+
+def test_split_statements_keeps_trigger_bodies():
+    statements = setup_db.split_statements(setup_db.INDEX_SCHEMA)
+    triggers = [statement for statement in statements if statement.startswith("CREATE TRIGGER")]
+    assert len(triggers) == 3
+    assert all(statement.endswith("END;") for statement in triggers)
+
+
+# -- loaded database ----------------------------------------------------------------
+
+def test_customer_volumes_are_numeric(db):
+    rows = db.execute("SELECT Customer_ID, Annual_Volume FROM customer ORDER BY Customer_ID").fetchall()
+    assert rows == [(1, 104500.0), (2, 87200.0), (3, None)]
+
+
+def test_discount_and_rebate_rows_are_normalized(db):
+    discounts = db.execute("SELECT * FROM customer_discount ORDER BY Customer_ID, Service_Type").fetchall()
+    assert discounts == [(1, "2nd Day Air", 45.0), (1, "Ground", 40.0), (2, "Next Day Air", 45.0)]
+    rebates = db.execute("SELECT * FROM customer_rebate ORDER BY Customer_ID, Min_Spend").fetchall()
+    assert rebates == [(1, 100000.0, 2.0), (1, 150000.0, 3.0), (2, 75000.0, 1.5)]
+
+
+def test_indexes_exist(db):
+    names = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_customer_company_name", "idx_customer_annual_volume", "idx_customer_discount_service"} <= names
+
+
+def test_full_text_index_serves_substring_search(db):
+    rows = db.execute("SELECT rowid FROM customer_fts WHERE customer_fts MATCH ?", ('"logist"',)).fetchall()
+    assert rows == [(3,)]
+    plan = " ".join(row[-1] for row in db.execute(
+        "EXPLAIN QUERY PLAN SELECT rowid FROM customer_fts WHERE customer_fts MATCH 'corp'"))
+    assert "VIRTUAL TABLE INDEX" in plan
+
+
+# -- chunked load, atomic swap and upsert ----------------------------------------------
+
+def customers(conn):
+    return conn.execute("SELECT Customer_ID, Company_Name FROM customer ORDER BY Customer_ID").fetchall()
+
+
+def test_load_reports_rows_and_throughput(tmp_path):
+    stats = setup_db.csv_to_sqlite(write_csv(tmp_path / "customer.csv", ROWS), str(tmp_path / "db.sqlite"))
+    assert stats["rows"] == 3
+    assert stats["seconds"] > 0 and stats["rows_per_second"] > 0
+
+
+def test_small_chunks_load_the_same_rows(tmp_path, db):
+    db_path = str(tmp_path / "chunked.sqlite")
+    setup_db.csv_to_sqlite(str(tmp_path / "customer.csv"), db_path, chunk_size=1)
+    with sqlite3.connect(db_path) as chunked:
+        assert customers(chunked) == customers(db)
+        assert chunked.execute("SELECT COUNT(*) FROM customer_rebate").fetchone() == (3,)
+
+
+def test_replace_swaps_in_the_new_rows(tmp_path, db):
+    db_path = str(tmp_path / "customer.sqlite")
+    setup_db.csv_to_sqlite(write_csv(tmp_path / "new.csv", ['7,"Zenith Freight LLC",$50K,,\n']), db_path)
+    assert customers(db) == [(7, "Zenith Freight LLC")]
+    assert db.execute("SELECT COUNT(*) FROM customer_discount").fetchone() == (0,)
+    assert db.execute("SELECT rowid FROM customer_fts WHERE customer_fts MATCH 'zenith'").fetchall() == [(7,)]
+    tables = {row[0] for row in db.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert not any(name.endswith("_staging") for name in tables)
+
+
+def test_failed_replace_leaves_the_live_tables_untouched(tmp_path, db):
+    bad = write_csv(tmp_path / "bad.csv", ['7,"Zenith Freight LLC",$50K,,\n', 'x,"Broken",$1K,,\n'])
+    with pytest.raises(ValueError):
+        setup_db.csv_to_sqlite(bad, str(tmp_path / "customer.sqlite"), chunk_size=1)
+    assert [name for _, name in customers(db)] == ["CompanyABC", "TechCorp Solutions", "Global Logistics Inc"]
+
+
+def test_upsert_updates_by_id_and_keeps_other_rows(tmp_path, db):
+    update = write_csv(tmp_path / "update.csv", [
+        '2,"TechCorp Freight","$90,000","Ground: 30% off",\n',
+        '4,"Acme Corp","$20,000",,\n',
+    ])
+    setup_db.csv_to_sqlite(update, str(tmp_path / "customer.sqlite"), mode="upsert")
+    assert customers(db) == [(1, "CompanyABC"), (2, "TechCorp Freight"), (3, "Global Logistics Inc"), (4, "Acme Corp")]
+    assert db.execute("SELECT Service_Type, Discount_Rate FROM customer_discount WHERE Customer_ID = 2").fetchall() \
+        == [("Ground", 30.0)]
+    assert db.execute("SELECT COUNT(*) FROM customer_rebate WHERE Customer_ID = 2").fetchone() == (0,)
+    assert db.execute("SELECT COUNT(*) FROM customer_discount WHERE Customer_ID = 1").fetchone() == (2,)
+
+
+def test_upsert_keeps_the_full_text_index_in_sync(tmp_path, db):
+    update = write_csv(tmp_path / "update.csv", ['2,"TechCorp Freight","$90,000",,\n'])
+    setup_db.csv_to_sqlite(update, str(tmp_path / "customer.sqlite"), mode="upsert")
+    assert db.execute("SELECT rowid FROM customer_fts WHERE customer_fts MATCH 'solutions'").fetchall() == []
+    assert db.execute("SELECT rowid FROM customer_fts WHERE customer_fts MATCH 'freight'").fetchall() == [(2,)]
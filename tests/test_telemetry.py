@@ -0,0 +1,143 @@
+"""
+Tests for common/telemetry.py: spans, traceparent propagation and the Prometheus exposition
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from common import telemetry
+from common.telemetry import Counter, Histogram
+
+
+# -- metrics ---------------------------------------------------------------------
+
+def test_counter_exposition():
+    counter = Counter("errors_total", "Failures", ("kind", "error"))
+    counter.inc("tool", "Timeout")
+    counter.inc("tool", "Timeout", amount=2)
+    counter.inc("llm", 'say "503"\n')
+    assert counter.render() == [
+        "# HELP errors_total Failures",
+        "# TYPE errors_total counter",
+        'errors_total{kind="llm",error="say \\"503\\"\\n"} 1',
+        'errors_total{kind="tool",error="Timeout"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency", ("name",), (0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "q")
+    assert histogram.render()[2:] == [
+        'latency_seconds_bucket{name="q",le="0.1"} 1',
+        'latency_seconds_bucket{name="q",le="1"} 2',
+        'latency_seconds_bucket{name="q",le="+Inf"} 3',
+        'latency_seconds_count{name="q"} 3',
+        'latency_seconds_sum{name="q"} 5.550000',
+    ]
+
+
+# -- spans ------------------------------------------------------------------------
+
+def test_nested_spans_share_a_trace():
+    with telemetry.span("server", "outer") as outer:
+        with telemetry.span("tool", "inner") as inner:
+            assert telemetry.current_span() is inner
+        assert telemetry.current_span() is outer
+    assert telemetry.current_span() is None
+    assert inner.trace_id == outer.trace_id and inner.parent_id == outer.span_id
+    assert [span["name"] for span in telemetry.trace(outer.trace_id)] == ["outer", "inner"]
+
+
+def test_failed_span_is_recorded_as_an_error():
+    with pytest.raises(KeyError):
+        with telemetry.span("tool", "test_failed_span") as failed:
+            raise KeyError("x")
+    [record] = telemetry.trace(failed.trace_id)
+    assert (record["status"], record["error"]) == ("error", "KeyError")
+    assert 'span_errors_total{kind="tool",name="test_failed_span",error="KeyError"} 1' in telemetry.render_metrics()
+
+
+def test_end_is_idempotent():
+    active = telemetry.start_span("llm", "test_end_is_idempotent")
+    active.end()
+    active.end("late")
+    assert len(telemetry.trace(active.trace_id)) == 1
+
+
+def test_traced_wraps_sync_and_async_functions():
+    @telemetry.traced("tool")
+    def lookup():
+        return telemetry.current_span().name
+
+    @telemetry.traced("tool", "pricing")
+    async def price():
+        return telemetry.current_span().name
+
+    assert lookup() == "lookup" and lookup.__name__ == "lookup"
+    assert asyncio.run(price()) == "pricing"
+
+
+@pytest.mark.parametrize("header, parsed", [
+    ("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01", ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")),
+    (" 00-0AF7651916CD43DD8448EB211C80319C-B7AD6B7169203331-00 ", ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")),
+    ("00-00000000000000000000000000000000-b7ad6b7169203331-01", None),
+    ("00-0af7651916cd43dd8448eb211c80319c-0000000000000000-01", None),
+    ("01-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331", None),
+    ("garbage", None),
+    (None, None),
+])
+def test_extract(header, parsed):
+    assert telemetry.extract(header) == parsed
+
+
+def test_inject_uses_the_current_span():
+    headers = {}
+    telemetry.inject(headers)
+    assert headers == {}
+    with telemetry.span("tool", "inject") as active:
+        telemetry.inject(headers)
+    assert telemetry.extract(headers["traceparent"]) == active.context
+
+
+# -- FastAPI integration ----------------------------------------------------------
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/deal/{customer_id}")
+    async def deal(customer_id: int):
+        if customer_id > 3:
+            raise HTTPException(status_code=503, detail="unavailable")
+        return {"customer_id": customer_id, "trace_id": telemetry.current_span().trace_id}
+
+    telemetry.install(app)
+    return TestClient(app)
+
+
+def test_request_continues_the_incoming_trace(client):
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    response = client.get("/deal/1", headers={"traceparent": f"00-{trace_id}-b7ad6b7169203331-01"})
+    assert response.headers["X-Trace-Id"] == trace_id == response.json()["trace_id"]
+    spans = client.get(f"/traces/{trace_id}").json()["spans"]
+    assert [(span["kind"], span["name"], span["parent_id"]) for span in spans] == [
+        ("server", "GET /deal/{customer_id}", "b7ad6b7169203331"),
+    ]
+    assert spans[0]["attributes"]["status_code"] == 200
+
+
+def test_unknown_trace_is_404(client):
+    assert client.get("/traces/" + "f" * 32).status_code == 404
+
+
+def test_metrics_endpoint(client):
+    client.get("/deal/9")
+    response = client.get("/metrics")
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'span_errors_total{kind="server",name="GET /deal/{customer_id}",error="503"}' in response.text
+    assert 'span_duration_seconds_count{kind="server",name="GET /deal/{customer_id}",status="error"}' in response.text
+    assert 'payload_bytes_count{kind="server",name="GET /deal/{customer_id}",direction="response"}' in response.text
+    assert "/metrics" not in response.text
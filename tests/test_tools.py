@@ -0,0 +1,108 @@
+"""
+Tests for DealAgent/tools.py: the deal tools against a mock deal server
+"""
+import asyncio
+from typing import Dict, List
+
+import httpx
+import pytest
+
+from DealAgent import resilience, tools
+from DealAgent.deal_cache import DealCache
+from DealAgent.resilience import Backend
+
+
+def deal(customer_id: int) -> Dict:
+    return {
+        "bidStart": {
+            "bidHead": {"bidNum": f"B{customer_id}", "dealStatus": "P", "bidName": None},
+            "bidAcct": [{"acet": f"A{customer_id}", "payTerm": 30}],
+        }
+    }
+
+
+class MockDealServer:
+    """Serves deals for customers 1-3 and 404 for the rest, recording the customer IDs requested."""
+
+    def __init__(self):
+        self.requested: List[int] = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        customer_id = int(request.url.path.rsplit("/", 1)[-1])
+        self.requested.append(customer_id)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.in_flight -= 1
+        if customer_id > 3:
+            return httpx.Response(404, json={"error": "Deal not found"})
+        return httpx.Response(200, json=deal(customer_id))
+
+
+@pytest.fixture
+def deal_server(monkeypatch):
+    server = MockDealServer()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(server.handle))
+    monkeypatch.setattr(resilience, "get_http_client", lambda: client)
+    monkeypatch.setattr(tools, "deal_server_backend", Backend("deal_server", ["http://deals"], hedge=False))
+    monkeypatch.setattr(tools, "deal_cache", DealCache(ttl=0))
+    return server
+
+
+def test_batch_fetch_returns_deals_and_errors(deal_server):
+    result = asyncio.run(tools.get_deals_by_customer_ids([2, 9, 1]))
+    assert result["status"] == "partial"
+    assert list(result["deals"]) == ["2", "1"]
+    assert result["deals"]["1"]["bidStart"]["bidHead"]["bidNum"] == "B1"
+    assert list(result["errors"]) == ["9"]
+    assert result["errors"]["9"].startswith("HTTP 404")
+
+
+def test_batch_fetch_requests_each_id_once(deal_server):
+    result = asyncio.run(tools.get_deals_by_customer_ids([1, 2, 1, 2, 1]))
+    assert result["status"] == "success"
+    assert sorted(deal_server.requested) == [1, 2]
+
+
+def test_batch_fetch_is_bounded(deal_server, monkeypatch):
+    monkeypatch.setattr(tools, "DEAL_FETCH_CONCURRENCY", 2)
+    asyncio.run(tools.get_deals_by_customer_ids([1, 2, 3, 4, 5, 6]))
+    assert deal_server.peak == 2
+
+
+def test_batch_fetch_with_only_errors(deal_server):
+    result = asyncio.run(tools.get_deals_by_customer_ids([7, 8]))
+    assert result["status"] == "error"
+    assert result["deals"] == {}
+    assert set(result["errors"]) == {"7", "8"}
+
+
+def test_batch_fetch_with_no_ids(deal_server):
+    assert asyncio.run(tools.get_deals_by_customer_ids([])) == {"status": "success", "deals": {}, "errors": {}}
+    assert deal_server.requested == []
+
+
+# -- field projection ---------------------------------------------------------------
+
+def test_deal_is_projected_and_stripped(deal_server):
+    result = asyncio.run(tools.get_deal_by_customer_id(1, fields="bidHead"))
+    assert result == {"bidStart": {"bidHead": {"bidNum": "B1", "dealStatus": "P"}}}
+
+
+def test_invalid_fields_are_an_error_without_a_fetch(deal_server):
+    result = asyncio.run(tools.get_deal_by_customer_id(1, fields="bidHead..bidNum"))
+    assert result["status"] == "error"
+    assert "Invalid field path" in result["error"]
+    assert deal_server.requested == []
+
+
+def test_batch_fetch_applies_the_projection_to_every_deal(deal_server):
+    result = asyncio.run(tools.get_deals_by_customer_ids([1, 2], fields="bidHead.bidNum"))
+    assert result["deals"] == {
+        "1": {"bidStart": {"bidHead": {"bidNum": "B1"}}},
+        "2": {"bidStart": {"bidHead": {"bidNum": "B2"}}},
+    }
@@ -0,0 +1,87 @@
+"""
+Tests for common/usage.py: per-request token and tool-result accounting, and the agent hooks that feed it
+"""
+from types import SimpleNamespace
+
+import pytest
+
+from common import usage
+from DealAgent import agent
+
+
+@pytest.fixture(autouse=True)
+def aggregate(monkeypatch):
+    fresh = usage.UsageAggregate()
+    monkeypatch.setattr(usage, "aggregate", fresh)
+    return fresh
+
+
+@pytest.mark.parametrize("result, size", [
+    (None, 0),
+    ("héllo", 6),
+    ({"a": 1}, 8),
+    ([1, 2], 6),
+])
+def test_result_size(result, size):
+    assert usage.result_size(result) == size
+
+
+def test_estimated_tokens_round_up():
+    assert [usage.estimate_tokens(size) for size in (0, 1, 4, 5)] == [0, 1, 1, 2]
+
+
+def test_request_totals():
+    with usage.track("/query") as request_usage:
+        usage.record_llm(400, 20)
+        usage.record_llm(None, 40)
+        usage.record_tool("resolve_customer", {"status": "success"})
+        usage.record_tool("resolve_customer", "x" * 10)
+    assert usage.current() is None
+    totals = request_usage.as_dict()
+    assert (totals["llm_calls"], totals["prompt_tokens"], totals["completion_tokens"], totals["total_tokens"]) \
+        == (2, 400, 60, 460)
+    assert totals["tools"]["resolve_customer"] == {"calls": 2, "bytes": 31, "est_tokens": 9, "max_bytes": 21}
+    assert (totals["tool_result_bytes"], totals["tool_result_est_tokens"]) == (31, 9)
+
+
+def test_recording_outside_a_request_is_ignored(aggregate):
+    usage.record_llm(10, 10)
+    usage.record_tool("t", "x")
+    assert aggregate.stats() == {}
+
+
+def test_aggregate_averages_per_request_and_sorts_tools_by_bytes(aggregate):
+    for prompt in (100, 300):
+        with usage.track("/query"):
+            usage.record_llm(prompt, 10)
+            usage.record_tool("small", "x")
+    with usage.track("/query"):
+        usage.record_tool("large", "x" * 100)
+    stats = aggregate.stats()["/query"]
+    assert (stats["requests"], stats["llm_calls"], stats["avg_llm_calls"], stats["avg_prompt_tokens"]) \
+        == (3, 2, 0.67, 133.3)
+    assert list(stats["tools"]) == ["large", "small"]
+    assert stats["tools"]["small"]["avg_bytes"] == 1
+
+
+def test_usage_counters_are_on_metrics():
+    with usage.track("/test-metrics"):
+        usage.record_llm(5, 7)
+        usage.record_tool("lookup", "abcd")
+    metrics = usage.telemetry.render_metrics()
+    assert 'llm_tokens_total{endpoint="/test-metrics",type="completion"} 7' in metrics
+    assert 'tool_result_est_tokens_total{endpoint="/test-metrics",tool="lookup"} 1' in metrics
+
+
+# -- DealAgent hooks ----------------------------------------------------------------
+
+def test_agent_hooks_record_model_and_tool_usage():
+    metadata = SimpleNamespace(prompt_token_count=300, candidates_token_count=12)
+    context = SimpleNamespace(state={})
+    with usage.track("/query") as request_usage:
+        agent.after_model(context, SimpleNamespace(partial=True, usage_metadata=metadata, error_code=None))
+        agent.after_model(context, SimpleNamespace(partial=False, usage_metadata=metadata, error_code=None))
+        agent.after_tool(SimpleNamespace(name="find_deal"), {}, context, {"bidNum": "B1"})
+    totals = request_usage.as_dict()
+    assert (totals["llm_calls"], totals["prompt_tokens"]) == (1, 300)
+    assert totals["tools"]["find_deal"]["bytes"] == len('{"bidNum": "B1"}')